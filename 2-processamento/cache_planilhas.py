@@ -0,0 +1,102 @@
+"""
+DataOps Local - Cache de Planilhas Processadas
+Autor: Sistema DataOps
+Descrição: Guarda cada planilha já lida e normalizada em Parquet (dados/cache/),
+identificada pelo hash do arquivo de origem, para não reler o Excel
+"""
+
+import os
+import uuid
+
+from leitura_arquivos import ler_parquet, tem_pyarrow
+
+# Incrementar quando a preparação (normalização/validação) mudar,
+# para que entradas antigas deixem de ser usadas
+VERSAO_CACHE = 3
+
+# Tamanho máximo do diretório de cache antes de remover as entradas mais antigas
+LIMITE_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class CachePlanilhas:
+    """Cache em disco de DataFrames preparados, chaveado pelo hash do arquivo de origem"""
+
+    def __init__(self, diretorio='dados/cache', limite_bytes=LIMITE_CACHE_BYTES):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        # Parquet depende do pyarrow; sem ele o cache fica desativado
+        self.ativo = tem_pyarrow()
+
+    def caminho(self, hash_arquivo, tipo_dados):
+        """Arquivo do cache para a planilha de um tipo com o conteúdo informado"""
+        return os.path.join(self.diretorio, f"{tipo_dados}_v{VERSAO_CACHE}_{hash_arquivo[:32]}.parquet")
+
+    def carregar(self, hash_arquivo, tipo_dados, tamanho_lote=None):
+        """Retorna um gerador de DataFrames se houver entrada no cache, senão None"""
+        if not self.ativo:
+            return None
+        caminho = self.caminho(hash_arquivo, tipo_dados)
+        if not os.path.exists(caminho):
+            return None
+        # Marca a entrada como usada recentemente (a remoção é pela mais antiga)
+        os.utime(caminho, None)
+        return ler_parquet(caminho, tamanho_lote)
+
+    def qtd_linhas(self, hash_arquivo, tipo_dados):
+        """Número de linhas gravadas na entrada do cache (lido dos metadados do Parquet)"""
+        import pyarrow.parquet as pq
+        return pq.read_metadata(self.caminho(hash_arquivo, tipo_dados)).num_rows
+
+    def salvar(self, hash_arquivo, tipo_dados, df, qtd_linhas_lidas=None):
+        """Grava o DataFrame preparado no cache (escrita atômica) e aplica o limite de tamanho"""
+        if not self.ativo:
+            return False
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self.caminho(hash_arquivo, tipo_dados)
+        temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+
+        df = df.copy()
+        df.attrs['qtd_linhas_lidas'] = int(qtd_linhas_lidas if qtd_linhas_lidas is not None else len(df))
+        try:
+            df.to_parquet(temporario)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+        self.remover_excedente()
+        return True
+
+    def remover_excedente(self):
+        """Remove as entradas usadas há mais tempo até o cache caber no limite"""
+        try:
+            entradas = [os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio)
+                        if nome.endswith('.parquet')]
+        except FileNotFoundError:
+            return 0
+
+        info = []
+        for caminho in entradas:
+            try:
+                stat = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            info.append((stat.st_mtime, stat.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in info)
+        removidas = 0
+        for _, tamanho, caminho in sorted(info):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+                removidas += 1
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        return removidas
+
+
+def qtd_linhas_lidas(df):
+    """Linhas lidas do arquivo original (antes de descartar datas inválidas)"""
+    return df.attrs.get('qtd_linhas_lidas', len(df))
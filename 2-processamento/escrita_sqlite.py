@@ -0,0 +1,125 @@
+"""
+DataOps Local - Escrita em Lote no SQLite
+Autor: Sistema DataOps
+Descrição: Conexão ajustada para importação, transação única por execução,
+savepoints por planilha e inserção em lote com executemany
+"""
+
+import sqlite3
+
+import pandas as pd
+
+# PRAGMAs aplicados à conexão de importação
+PRAGMAS_IMPORTACAO = {
+    'journal_mode': 'WAL',      # leitores (dashboard) não bloqueiam a escrita
+    'synchronous': 'NORMAL',    # seguro em WAL, sem fsync a cada commit
+    'temp_store': 'MEMORY',     # tabelas temporárias (staging do upsert) em memória
+    'cache_size': -65536,       # ~64 MB de cache de páginas
+}
+
+
+# Formato canônico das datas gravadas: texto ISO, que ordena como data e
+# permite filtros por período (data BETWEEN ? AND ?) direto no índice
+FORMATO_DATA_SQL = '%Y-%m-%d'
+
+
+def valores_para_sql(df):
+    """Converte o DataFrame em tuplas prontas para executemany (datas como 'YYYY-MM-DD', NaN como NULL)"""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime(FORMATO_DATA_SQL)
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+class EscritorSQLite:
+    """Controla transações e escrita em lote de uma conexão de importação
+
+    A conexão é aberta em modo autocommit (isolation_level=None) para que as
+    transações sejam explícitas: uma transação por execução (iniciar_execucao /
+    finalizar_execucao) e um savepoint por planilha, de forma que a falha de
+    uma planilha desfaça só o que ela gravou.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.em_execucao = False
+        self.savepoints = []
+
+    def configurar_importacao(self):
+        """Aplica os PRAGMAs de importação (antes de qualquer transação)"""
+        for pragma, valor in PRAGMAS_IMPORTACAO.items():
+            self.conn.execute(f"PRAGMA {pragma} = {valor}")
+
+    def iniciar_execucao(self):
+        """Abre a transação que engloba toda a execução"""
+        if not self.em_execucao:
+            self.conn.execute("BEGIN")
+            self.em_execucao = True
+
+    def finalizar_execucao(self):
+        """Confirma a transação da execução"""
+        if self.em_execucao:
+            self.conn.execute("COMMIT")
+            self.em_execucao = False
+
+    def abortar_execucao(self):
+        """Desfaz a transação da execução inteira"""
+        if self.em_execucao:
+            self.conn.execute("ROLLBACK")
+            self.em_execucao = False
+            self.savepoints = []
+
+    def commit(self):
+        """Confirma fora de uma execução; dentro dela, o commit fica para o final"""
+        if not self.em_execucao and self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+
+    def abrir_savepoint(self, nome):
+        """Abre um savepoint (uma planilha/etapa da execução)"""
+        self.conn.execute(f"SAVEPOINT {nome}")
+        self.savepoints.append(nome)
+
+    def liberar_savepoint(self, nome):
+        """Incorpora o savepoint à transação da execução"""
+        if nome in self.savepoints:
+            self.conn.execute(f"RELEASE SAVEPOINT {nome}")
+            self.savepoints = self.savepoints[:self.savepoints.index(nome)]
+
+    def desfazer_savepoint(self, nome):
+        """Desfaz apenas o que foi gravado desde o savepoint"""
+        if nome in self.savepoints:
+            self.conn.execute(f"ROLLBACK TO SAVEPOINT {nome}")
+            self.liberar_savepoint(nome)
+
+    def inserir_lote(self, tabela, df):
+        """Insere todas as linhas do DataFrame com um único INSERT preparado"""
+        colunas = list(df.columns)
+        self.conn.executemany(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            valores_para_sql(df)
+        )
+        return len(df)
+
+    def colunas_tabela(self, tabela):
+        """Lista as colunas existentes na tabela"""
+        return [row[1] for row in self.conn.execute(f"PRAGMA table_info({tabela})")]
+
+    def substituir_tabela(self, tabela, df):
+        """Substitui todo o conteúdo da tabela pelo DataFrame (cadastros)
+
+        Mantém o esquema criado em criar_tabelas (restrições UNIQUE, chaves),
+        ao contrário de to_sql(if_exists='replace'), que recria a tabela.
+        Retorna as colunas do DataFrame que não existem na tabela.
+        """
+        existentes = self.colunas_tabela(tabela)
+        ignoradas = [col for col in df.columns if col not in existentes]
+        self.conn.execute(f"DELETE FROM {tabela}")
+        self.inserir_lote(tabela, df[[col for col in df.columns if col in existentes]])
+        return ignoradas
+
+    def fechar(self):
+        """Fecha a conexão (desfazendo uma execução não finalizada)"""
+        self.abortar_execucao()
+        self.conn.close()
@@ -0,0 +1,189 @@
+"""
+DataOps Local - Leitura de Arquivos de Entrada
+Autor: Sistema DataOps
+Descrição: Localiza o arquivo de cada entidade em 1-coleta/ e lê planilhas
+Excel, CSV (.csv/.csv.gz) e Parquet, inteiros ou em lotes
+"""
+
+import os
+
+import pandas as pd
+
+# Extensões aceitas além do template Excel, em ordem de preferência
+EXTENSOES_RAPIDAS = ['.parquet', '.csv.gz', '.csv']
+
+# Tipos das colunas conhecidas (nomes já normalizados) para leitura de CSV.
+# Datas ficam como texto: a conversão é feita por converter_coluna_data.
+TIPOS_COLUNAS = {
+    'receitas': {
+        'data': 'str', 'tipo_servico': 'str', 'profissional': 'str', 'cliente': 'str',
+        'valor_servico': 'float64', 'forma_pagamento': 'str', 'observacoes': 'str',
+    },
+    'despesas': {
+        'data': 'str', 'categoria': 'str', 'descricao': 'str', 'valor': 'float64',
+        'forma_pagamento': 'str', 'fornecedor': 'str', 'observacoes': 'str',
+    },
+    'profissionais': {
+        'nome_profissional': 'str', 'funcao': 'str', 'tipo_contrato': 'str',
+        'percentual_comissao': 'float64', 'salario_fixo': 'float64', 'status': 'str',
+        'data_admissao': 'str',
+    },
+    'servicos': {
+        'nome_servico': 'str', 'preco_base': 'float64', 'tempo_medio_minutos': 'float64',
+        'categoria': 'str', 'status': 'str',
+    },
+}
+
+
+def normalizar_nome_coluna(nome):
+    """Mesmo padrão usado nos DataFrames: minúsculas, sem espaços nas pontas, '_' no lugar de ' '"""
+    return str(nome).lower().strip().replace(' ', '_')
+
+
+def tem_pyarrow():
+    """Verifica se o pyarrow está instalado (vem junto com o Streamlit)"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def localizar_arquivo(base_path, tipo_dados, arquivo_excel):
+    """Retorna o arquivo de entrada da entidade em base_path
+
+    Um export em Parquet/CSV (Template_Receitas.csv, receitas.csv.gz,
+    Receitas.parquet...) tem prioridade sobre o template Excel.
+    """
+    template = os.path.splitext(arquivo_excel)[0]
+    nomes = {template.lower(), tipo_dados.lower(), template.lower().replace('template_', '')}
+
+    try:
+        existentes = {nome.lower(): nome for nome in os.listdir(base_path)}
+    except FileNotFoundError:
+        existentes = {}
+
+    for extensao in EXTENSOES_RAPIDAS:
+        for nome in sorted(nomes):
+            encontrado = existentes.get(nome + extensao)
+            if encontrado:
+                return os.path.join(base_path, encontrado)
+
+    return os.path.join(base_path, arquivo_excel)
+
+
+def tipo_arquivo(caminho):
+    """Classifica o arquivo pela extensão: 'parquet', 'csv' ou 'excel'"""
+    nome = caminho.lower()
+    if nome.endswith('.parquet'):
+        return 'parquet'
+    if nome.endswith('.csv') or nome.endswith('.csv.gz'):
+        return 'csv'
+    return 'excel'
+
+
+def ler_excel(caminho, aba, tamanho_lote=None):
+    """Lê uma aba da planilha, inteira ou em lotes de tamanho fixo
+
+    Sem tamanho_lote, devolve um único DataFrame (pd.read_excel). Com
+    tamanho_lote, usa o modo read-only do openpyxl e produz DataFrames de
+    até tamanho_lote linhas, mantendo a memória constante. O índice de cada
+    lote é a posição da linha na planilha (linha = índice + 2).
+    """
+    if not tamanho_lote:
+        yield pd.read_excel(caminho, sheet_name=aba)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = wb[aba].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = [str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(cabecalho)]
+
+        lote, indices = [], []
+        for posicao, linha in enumerate(linhas):
+            if all(valor is None for valor in linha):
+                continue
+            lote.append(linha[:len(colunas)])
+            indices.append(posicao)
+            if len(lote) >= tamanho_lote:
+                yield pd.DataFrame(lote, columns=colunas, index=indices).infer_objects()
+                lote, indices = [], []
+        if lote:
+            yield pd.DataFrame(lote, columns=colunas, index=indices).infer_objects()
+    finally:
+        wb.close()
+
+
+def _opcoes_csv(caminho, tipo_dados):
+    """Detecta separador/decimal/encoding pelo cabeçalho e monta os dtypes explícitos"""
+    opcoes = {'encoding': 'utf-8-sig'}
+    try:
+        cabecalho = pd.read_csv(caminho, nrows=0, encoding='utf-8-sig')
+    except UnicodeDecodeError:
+        opcoes['encoding'] = 'latin-1'
+        cabecalho = pd.read_csv(caminho, nrows=0, encoding='latin-1')
+
+    # Exports brasileiros costumam usar ';' como separador e ',' como decimal
+    if len(cabecalho.columns) == 1 and ';' in cabecalho.columns[0]:
+        opcoes['sep'] = ';'
+        opcoes['decimal'] = ','
+        colunas = cabecalho.columns[0].split(';')
+    else:
+        opcoes['sep'] = ','
+        colunas = list(cabecalho.columns)
+
+    tipos = TIPOS_COLUNAS.get(tipo_dados, {})
+    opcoes['dtype'] = {
+        col: tipos[normalizar_nome_coluna(col)]
+        for col in colunas if normalizar_nome_coluna(col) in tipos
+    }
+    return opcoes
+
+
+def ler_csv(caminho, tipo_dados=None, tamanho_lote=None):
+    """Lê CSV (ou .csv.gz) com tipos explícitos; usa o engine pyarrow quando disponível"""
+    opcoes = _opcoes_csv(caminho, tipo_dados)
+
+    if tamanho_lote:
+        # O engine pyarrow não lê em blocos; o engine C mantém a memória constante
+        with pd.read_csv(caminho, chunksize=tamanho_lote, **opcoes) as leitor:
+            for lote in leitor:
+                yield lote
+        return
+
+    # O engine pyarrow não aceita decimal=','
+    if tem_pyarrow() and 'decimal' not in opcoes:
+        yield pd.read_csv(caminho, engine='pyarrow', **opcoes)
+    else:
+        yield pd.read_csv(caminho, **opcoes)
+
+
+def ler_parquet(caminho, tamanho_lote=None):
+    """Lê Parquet inteiro ou em lotes de linhas (requer pyarrow)"""
+    if not tamanho_lote:
+        yield pd.read_parquet(caminho)
+        return
+
+    import pyarrow.parquet as pq
+
+    inicio = 0
+    for batch in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_lote):
+        lote = batch.to_pandas()
+        lote.index = pd.RangeIndex(inicio, inicio + len(lote))
+        inicio += len(lote)
+        yield lote
+
+
+def ler_arquivo(caminho, aba, tipo_dados=None, tamanho_lote=None):
+    """Lê o arquivo de entrada de acordo com o formato, inteiro ou em lotes"""
+    formato = tipo_arquivo(caminho)
+    if formato == 'parquet':
+        return ler_parquet(caminho, tamanho_lote)
+    if formato == 'csv':
+        return ler_csv(caminho, tipo_dados, tamanho_lote)
+    return ler_excel(caminho, aba, tamanho_lote)
@@ -0,0 +1,153 @@
+"""
+DataOps Local - Log Estruturado
+Autor: Sistema DataOps
+Descrição: Log de execução em JSON lines (run_id, etapa, nível, tempos),
+gravado por uma thread em segundo plano, com rotação e compressão por tamanho
+"""
+
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+from datetime import datetime
+
+ARQUIVO_LOG = 'logs/importacao.jsonl'
+
+# Rotação: ao passar do limite o arquivo vira importacao.jsonl.1.gz, .2.gz, ...
+LIMITE_LOG_BYTES = 5 * 1024 * 1024
+QTD_BACKUPS = 5
+
+NOME_LOGGER = 'dataops'
+
+# Nível próprio para as mensagens de sucesso (entre INFO e WARNING)
+SUCCESS = 25
+logging.addLevelName(SUCCESS, 'SUCCESS')
+
+NIVEIS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'SUCCESS': SUCCESS,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+}
+
+_listener = None
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por mensagem; exceções vão estruturadas em 'excecao'"""
+
+    def format(self, record):
+        registro = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'run_id': getattr(record, 'run_id', None),
+            'etapa': getattr(record, 'etapa', None),
+            'mensagem': record.getMessage(),
+        }
+        registro.update(getattr(record, 'campos', None) or {})
+        if record.exc_info:
+            registro['excecao'] = {
+                'tipo': record.exc_info[0].__name__,
+                'mensagem': str(record.exc_info[1]),
+                'traceback': self.formatException(record.exc_info).splitlines(),
+            }
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class FormatadorConsole(logging.Formatter):
+    """Formato de sempre no terminal: [data hora] [TIPO] mensagem"""
+
+    def __init__(self):
+        super().__init__('[%(asctime)s] [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S')
+
+
+class FilaSemFormatar(logging.handlers.QueueHandler):
+    """QueueHandler que entrega o registro original à thread do arquivo
+
+    O prepare() padrão formata a mensagem e descarta exc_info; aqui a
+    formatação (JSON, com o traceback estruturado) fica para a thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _nome_comprimido(nome):
+    return f"{nome}.gz"
+
+
+def _comprimir(origem, destino):
+    with open(origem, 'rb') as f_in, gzip.open(destino, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(origem)
+
+
+def configurar_log(arquivo_log=ARQUIVO_LOG, verbosidade='INFO'):
+    """(Re)configura o logger do DataOps
+
+    Terminal: mensagens a partir de `verbosidade`. Arquivo: todas as
+    mensagens em JSON lines, escritas por uma QueueListener em segundo
+    plano (arquivo_log=None desativa o arquivo).
+    """
+    global _listener
+    encerrar_log()
+
+    logger = logging.getLogger(NOME_LOGGER)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(NIVEIS[verbosidade])
+    console.setFormatter(FormatadorConsole())
+    # Mensagens já exibidas por um processo filho só vão para o arquivo
+    console.addFilter(lambda record: not getattr(record, 'so_arquivo', False))
+    logger.addHandler(console)
+
+    if arquivo_log:
+        os.makedirs(os.path.dirname(arquivo_log) or '.', exist_ok=True)
+        arquivo = logging.handlers.RotatingFileHandler(
+            arquivo_log, maxBytes=LIMITE_LOG_BYTES, backupCount=QTD_BACKUPS, encoding='utf-8'
+        )
+        arquivo.namer = _nome_comprimido
+        arquivo.rotator = _comprimir
+        arquivo.setFormatter(FormatadorJSON())
+
+        fila = queue.SimpleQueue()
+        logger.addHandler(FilaSemFormatar(fila))
+        _listener = logging.handlers.QueueListener(fila, arquivo)
+        _listener.start()
+
+    return logger
+
+
+def obter_logger():
+    """Logger do DataOps; sem configuração prévia, só o terminal"""
+    logger = logging.getLogger(NOME_LOGGER)
+    if not logger.handlers:
+        configurar_log(arquivo_log=None)
+    return logger
+
+
+def verbosidade_atual():
+    """Nível configurado para o terminal (repassado aos processos filhos)"""
+    for handler in obter_logger().handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            return logging.getLevelName(handler.level)
+    return 'INFO'
+
+
+def encerrar_log():
+    """Grava o que ainda está na fila e encerra a thread do arquivo"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
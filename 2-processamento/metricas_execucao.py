@@ -0,0 +1,295 @@
+"""
+DataOps Local - Métricas de Execução
+Autor: Sistema DataOps
+Descrição: Mede cada etapa do processamento (tempo, CPU, linhas, memória),
+grava as medições em pipeline_runs/pipeline_stage_metrics e, com --profile,
+salva um arquivo do cProfile por etapa
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # Linux/macOS
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+# Intervalo (segundos) entre as amostras de memória durante uma etapa
+INTERVALO_AMOSTRA_RSS = 0.05
+
+
+def pico_rss_mb():
+    """Maior memória residente (RSS) do processo até agora, em MB (None se indisponível)
+
+    Nunca diminui: serve para o total da execução, não para comparar etapas.
+    """
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return round(pico / (MB if sys.platform == 'darwin' else 1024), 1)
+    try:
+        import psutil
+        # Windows: pico do working set
+        return round(psutil.Process().memory_info().peak_wset / MB, 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def rss_atual_mb():
+    """Memória residente (RSS) atual do processo, em MB (None se indisponível)"""
+    try:
+        # Linux: segundo campo = páginas residentes
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB, 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / MB, 1)
+    except ImportError:
+        return None
+
+
+def criar_tabelas_metricas(conn):
+    """Cria as tabelas de métricas (uma linha por execução e uma por etapa)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT UNIQUE NOT NULL,
+            inicio TIMESTAMP NOT NULL,
+            fim TIMESTAMP NOT NULL,
+            duracao_s REAL,
+            cpu_s REAL,
+            pico_rss_mb REAL,
+            pico_tracemalloc_mb REAL,
+            linhas_importadas INTEGER,
+            erros INTEGER,
+            sucesso INTEGER,
+            parametros TEXT,
+            dir_perfil TEXT
+        )
+    ''')
+    # etapa: 'receitas', 'comissoes'... e subetapas como 'receitas.leitura'
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_stage_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            ordem INTEGER NOT NULL,
+            etapa TEXT NOT NULL,
+            chamadas INTEGER,
+            tempo_s REAL,
+            cpu_s REAL,
+            linhas_entrada INTEGER,
+            linhas_saida INTEGER,
+            pico_rss_mb REAL,
+            pico_tracemalloc_mb REAL,
+            UNIQUE (run_id, etapa)
+        )
+    ''')
+
+
+class MetricasExecucao:
+    """Acumula tempo, CPU, linhas e memória por etapa de uma execução
+
+    As etapas principais são sequenciais (iniciar() fecha a anterior); dentro
+    delas, medir() cronometra subetapas, que podem ser aninhadas
+    ('receitas.preparacao.datas'). Uma etapa repetida acumula nas mesmas
+    métricas. Com perfil=True cada etapa principal tem o seu cProfile; com
+    rastrear_memoria=True o tracemalloc registra o pico de alocação Python.
+
+    pico_rss_mb de cada etapa é a maior RSS vista enquanto ela estava
+    aberta: amostrada no início e no fim de cada etapa e subetapa (cada lote
+    de medir_lotes) e, durante a etapa principal, por uma thread a cada
+    INTERVALO_AMOSTRA_RSS segundos.
+    """
+
+    def __init__(self, dir_perfil=None, rastrear_memoria=False):
+        self.dir_perfil = dir_perfil
+        self.rastrear_memoria = rastrear_memoria
+        self.etapas = {}
+        self.perfis = {}
+        self.atual = None
+        self._pilha = []
+        self._inicio_etapa = None
+        # Registros das etapas/subetapas abertas: recebem as amostras de RSS
+        self._abertos = []
+        self._trava_rss = threading.Lock()
+        self._parar_amostragem = None
+        self.inicio = datetime.now()
+        self._relogio = (time.perf_counter(), time.process_time())
+        if rastrear_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _registro(self, nome):
+        return self.etapas.setdefault(nome, {
+            'chamadas': 0, 'tempo_s': 0.0, 'cpu_s': 0.0, 'linhas_entrada': 0, 'linhas_saida': 0,
+            'pico_rss_mb': None, 'pico_tracemalloc_mb': None,
+        })
+
+    def _acumular(self, registro, inicio, inicio_cpu):
+        registro['tempo_s'] += time.perf_counter() - inicio
+        registro['cpu_s'] += time.process_time() - inicio_cpu
+
+    def _amostrar_rss(self):
+        """Atualiza o pico de RSS das etapas abertas com a RSS atual"""
+        rss = rss_atual_mb()
+        if rss is None:
+            return
+        with self._trava_rss:
+            for registro in self._abertos:
+                registro['pico_rss_mb'] = max(registro['pico_rss_mb'] or 0, rss)
+
+    def _amostrar_continuamente(self, parar):
+        while not parar.wait(INTERVALO_AMOSTRA_RSS):
+            self._amostrar_rss()
+
+    def _nome(self, subetapa=None):
+        partes = [self.atual] + self._pilha + ([subetapa] if subetapa else [])
+        return '.'.join(parte for parte in partes if parte)
+
+    def iniciar(self, etapa):
+        """Fecha a etapa principal aberta e começa a medir `etapa`"""
+        if etapa == self.atual:
+            return
+        self.finalizar()
+        self.atual = etapa
+        registro = self._registro(etapa)
+        registro['chamadas'] += 1
+        with self._trava_rss:
+            self._abertos = [registro]
+        self._amostrar_rss()
+        self._parar_amostragem = threading.Event()
+        if rss_atual_mb() is not None:
+            threading.Thread(target=self._amostrar_continuamente, args=(self._parar_amostragem,),
+                             name='amostragem-rss', daemon=True).start()
+        self._inicio_etapa = (time.perf_counter(), time.process_time())
+        if self.rastrear_memoria:
+            tracemalloc.reset_peak()
+        if self.dir_perfil:
+            self.perfis.setdefault(etapa, cProfile.Profile()).enable()
+
+    def finalizar(self):
+        """Fecha a etapa principal aberta (se houver)"""
+        if self.atual is None:
+            return
+        registro = self.etapas[self.atual]
+        if self.dir_perfil:
+            self.perfis[self.atual].disable()
+        self._parar_amostragem.set()
+        self._amostrar_rss()
+        self._acumular(registro, *self._inicio_etapa)
+        if self.rastrear_memoria:
+            pico = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+            registro['pico_tracemalloc_mb'] = max(registro['pico_tracemalloc_mb'] or 0, pico)
+        self.atual = None
+        self._pilha = []
+        with self._trava_rss:
+            self._abertos = []
+
+    @contextmanager
+    def medir(self, subetapa):
+        """Cronometra um trecho da etapa atual como subetapa"""
+        registro = self._registro(self._nome(subetapa))
+        registro['chamadas'] += 1
+        self._pilha.append(subetapa)
+        with self._trava_rss:
+            self._abertos.append(registro)
+        self._amostrar_rss()
+        inicio = (time.perf_counter(), time.process_time())
+        try:
+            yield
+        finally:
+            self._pilha.pop()
+            self._amostrar_rss()
+            with self._trava_rss:
+                self._abertos = [aberto for aberto in self._abertos if aberto is not registro]
+            self._acumular(registro, *inicio)
+
+    def medir_lotes(self, lotes, subetapa):
+        """Repassa os DataFrames de um gerador cronometrando cada leitura como subetapa"""
+        lotes = iter(lotes)
+        while True:
+            with self.medir(subetapa):
+                df = next(lotes, None)
+            if df is None:
+                # A última chamada só detecta o fim do gerador
+                self._registro(self._nome(subetapa))['chamadas'] -= 1
+                return
+            self.contar_linhas(saida=len(df), subetapa=subetapa)
+            yield df
+
+    def contar_linhas(self, entrada=0, saida=0, subetapa=None):
+        """Soma linhas de entrada/saída à etapa atual (ou a uma subetapa dela)"""
+        registro = self._registro(self._nome(subetapa))
+        registro['linhas_entrada'] += int(entrada)
+        registro['linhas_saida'] += int(saida)
+
+    def incorporar(self, etapas):
+        """Soma as subetapas medidas em outro processo (leitura em paralelo)"""
+        for nome, medicao in etapas.items():
+            if '.' not in nome:
+                continue
+            registro = self._registro(nome)
+            for campo in ('chamadas', 'tempo_s', 'cpu_s', 'linhas_entrada', 'linhas_saida'):
+                registro[campo] += medicao[campo]
+            for campo in ('pico_rss_mb', 'pico_tracemalloc_mb'):
+                if medicao[campo] is not None:
+                    registro[campo] = max(registro[campo] or 0, medicao[campo])
+
+    def salvar_perfis(self, run_id, prefixo=''):
+        """Grava um .prof por etapa em dir_perfil/run_id/ (abrir com pstats ou snakeviz)"""
+        if not self.dir_perfil or not self.perfis:
+            return None
+        destino = os.path.join(self.dir_perfil, run_id)
+        os.makedirs(destino, exist_ok=True)
+        for etapa, perfil in self.perfis.items():
+            perfil.dump_stats(os.path.join(destino, f"{prefixo}{etapa}.prof"))
+        return destino
+
+    def gravar(self, conn, run_id, sucesso, erros, linhas_importadas, parametros=None):
+        """Grava a execução e suas etapas (fora da transação da execução, que já terminou)"""
+        self.finalizar()
+        inicio, inicio_cpu = self._relogio
+        picos_tracemalloc = [m['pico_tracemalloc_mb'] for m in self.etapas.values()
+                             if m['pico_tracemalloc_mb'] is not None]
+        dir_perfil = os.path.join(self.dir_perfil, run_id) if self.dir_perfil and self.perfis else None
+
+        criar_tabelas_metricas(conn)
+        conn.execute("BEGIN")
+        try:
+            conn.execute('''
+                INSERT INTO pipeline_runs (
+                    run_id, inicio, fim, duracao_s, cpu_s, pico_rss_mb, pico_tracemalloc_mb,
+                    linhas_importadas, erros, sucesso, parametros, dir_perfil
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                run_id, self.inicio.isoformat(sep=' ', timespec='seconds'),
+                datetime.now().isoformat(sep=' ', timespec='seconds'),
+                round(time.perf_counter() - inicio, 3), round(time.process_time() - inicio_cpu, 3),
+                pico_rss_mb(), max(picos_tracemalloc) if picos_tracemalloc else None,
+                int(linhas_importadas), int(erros), int(bool(sucesso)),
+                json.dumps(parametros or {}, ensure_ascii=False, default=str), dir_perfil,
+            ))
+            conn.executemany('''
+                INSERT INTO pipeline_stage_metrics (
+                    run_id, ordem, etapa, chamadas, tempo_s, cpu_s, linhas_entrada, linhas_saida,
+                    pico_rss_mb, pico_tracemalloc_mb
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (run_id, ordem, etapa, m['chamadas'], round(m['tempo_s'], 3), round(m['cpu_s'], 3),
+                 m['linhas_entrada'], m['linhas_saida'], m['pico_rss_mb'], m['pico_tracemalloc_mb'])
+                for ordem, (etapa, m) in enumerate(self.etapas.items(), start=1)
+            ])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
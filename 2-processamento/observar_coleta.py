@@ -0,0 +1,153 @@
+"""
+DataOps Local - Modo Observação (--watch)
+Autor: Sistema DataOps
+Descrição: Observa a pasta 1-coleta/ e reprocessa cada planilha assim que
+ela é salva, sem precisar rodar 1_PROCESSAR_DADOS manualmente
+"""
+
+import os
+import time
+import zipfile
+from datetime import datetime
+
+from leitura_arquivos import localizar_arquivo, tipo_arquivo
+from processar_dados import PLANILHAS, executar_processamento
+
+# Tempo (segundos) que o arquivo precisa ficar sem mudar antes de ser lido.
+# Evita ler uma planilha no meio do salvamento.
+ESPERA_ESTABILIDADE = 2.0
+
+# Nova tentativa (segundos) depois de uma importação que falhou (arquivo
+# bloqueado, banco ocupado...); dobra a cada falha seguida, até o máximo
+RETENTATIVA_INICIAL = 5.0
+RETENTATIVA_MAXIMA = 300.0
+
+
+def assinatura_arquivo(caminho):
+    """(caminho, tamanho, mtime) do arquivo ou None se ele não existir"""
+    try:
+        stat = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (caminho, stat.st_size, stat.st_mtime_ns)
+
+
+def arquivo_completo(caminho):
+    """Verifica se o arquivo já pode ser lido
+
+    .xlsx e .parquet são gravados por inteiro no final do salvamento; um
+    .xlsx incompleto não é um zip válido. O Excel também cria arquivos
+    temporários e de bloqueio (~$Template_Receitas.xlsx), que não são
+    entradas e por isso nunca são localizados aqui.
+    """
+    if tipo_arquivo(caminho) == 'excel':
+        return zipfile.is_zipfile(caminho)
+    return os.path.getsize(caminho) > 0
+
+
+def assinaturas_coleta(base_path):
+    """Assinatura atual do arquivo de entrada de cada planilha"""
+    return {
+        tipo: assinatura_arquivo(localizar_arquivo(base_path, tipo, planilha['arquivo']))
+        for tipo, planilha in PLANILHAS.items()
+    }
+
+
+def agendar_retentativa(retentativas, tipos):
+    """Marca a próxima tentativa das planilhas que falharam; retorna a espera em segundos"""
+    for tipo in tipos:
+        anterior = retentativas.get(tipo, (None, None))[1]
+        atraso = min(anterior * 2, RETENTATIVA_MAXIMA) if anterior else RETENTATIVA_INICIAL
+        retentativas[tipo] = (time.monotonic() + atraso, atraso)
+    return max(retentativas[tipo][1] for tipo in tipos)
+
+
+def processar_alteracoes(raiz, tipos=None, **opcoes):
+    """Executa o processamento e diz se ele terminou sem erros
+
+    Uma planilha que falhou não entra no manifesto, e uma exceção (banco
+    bloqueado no COMMIT, por exemplo) desfaz a execução: nos dois casos as
+    planilhas precisam ser processadas de novo. O modo observação continua
+    rodando mesmo com a exceção.
+    """
+    try:
+        resumo = executar_processamento(raiz, tipos=tipos, **opcoes)
+    except Exception as e:
+        print(f"❌ Erro no processamento: {e}")
+        return False
+    return resumo['sucesso'] and not resumo['erros']
+
+
+def observar_coleta(raiz='.', intervalo=1.0, espera=ESPERA_ESTABILIDADE, force=False,
+                    tamanho_lote=None, usar_cache=True, verbosidade='INFO'):
+    """Loop do modo --watch: verifica 1-coleta/ a cada intervalo e processa o que mudou
+
+    Ao iniciar, processa o que ficou pendente (o manifesto pula as planilhas
+    já importadas). Depois, cada planilha alterada é processada sozinha, em
+    sua própria transação, quando fica estável por `espera` segundos.
+    Uma planilha cuja importação falhou continua pendente e é tentada de
+    novo após RETENTATIVA_INICIAL segundos (o intervalo dobra a cada falha,
+    até RETENTATIVA_MAXIMA); salvar o arquivo de novo reinicia a espera.
+    Encerrar com Ctrl+C.
+    """
+    base_path = os.path.normpath(os.path.join(raiz, '1-coleta'))
+
+    opcoes = {'tamanho_lote': tamanho_lote, 'usar_cache': usar_cache, 'verbosidade': verbosidade}
+
+    # tipo -> (assinatura vista, momento em que foi vista pela primeira vez)
+    pendentes = {}
+    # tipo -> (momento da próxima tentativa, intervalo usado) das planilhas que falharam
+    retentativas = {}
+
+    print(f"👀 Observando {base_path} (Ctrl+C para encerrar)\n")
+    # Assinaturas de antes da primeira execução: um arquivo salvo durante
+    # ela fica diferente do registrado e é processado no loop
+    processadas = assinaturas_coleta(base_path)
+    if processar_alteracoes(raiz, force=force, **opcoes):
+        force = False
+    else:
+        # Nada foi confirmado como importado: tudo volta a ficar pendente
+        # (com --force, a nova tentativa também ignora o manifesto)
+        falhas = [tipo for tipo, assinatura in processadas.items() if assinatura is not None]
+        agora = time.monotonic()
+        pendentes = {tipo: (processadas[tipo], agora - espera) for tipo in falhas}
+        processadas = {}
+        if falhas:
+            atraso = agendar_retentativa(retentativas, falhas)
+            print(f"❌ Falha no processamento inicial (ver logs/importacao.jsonl) — nova tentativa em {atraso:.0f}s")
+
+    try:
+        while True:
+            time.sleep(intervalo)
+            agora = time.monotonic()
+
+            for tipo, assinatura in assinaturas_coleta(base_path).items():
+                if assinatura is None or assinatura == processadas.get(tipo):
+                    pendentes.pop(tipo, None)
+                    retentativas.pop(tipo, None)
+                    continue
+                if tipo not in pendentes or pendentes[tipo][0] != assinatura:
+                    # Mudou (de novo): reinicia a contagem da espera e as retentativas
+                    pendentes[tipo] = (assinatura, agora)
+                    retentativas.pop(tipo, None)
+
+            prontas = [tipo for tipo, (assinatura, desde) in pendentes.items()
+                       if agora - desde >= espera and agora >= retentativas.get(tipo, (0, None))[0]
+                       and arquivo_completo(assinatura[0])]
+            if not prontas:
+                continue
+
+            hora = datetime.now().strftime('%H:%M:%S')
+            print(f"\n🔄 [{hora}] Alteração detectada: {', '.join(prontas)}")
+            if processar_alteracoes(raiz, force=force, tipos=prontas, **opcoes):
+                force = False
+                for tipo in prontas:
+                    processadas[tipo] = pendentes.pop(tipo)[0]
+                    retentativas.pop(tipo, None)
+                print(f"✅ Atualizado: {', '.join(prontas)} — aguardando novas alterações...")
+            else:
+                # Continuam pendentes: nova tentativa depois do intervalo
+                atraso = agendar_retentativa(retentativas, prontas)
+                print(f"❌ Falha no processamento (ver logs/importacao.jsonl) — nova tentativa em {atraso:.0f}s")
+    except KeyboardInterrupt:
+        print("\n👋 Modo observação encerrado")
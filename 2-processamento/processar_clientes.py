@@ -0,0 +1,124 @@
+"""
+DataOps Local - Processamento em Lote de Vários Clientes
+Autor: Sistema DataOps
+Descrição: Encontra as pastas DataOps-* de uma pasta principal e processa
+cada cliente (seu 1-coleta/ e seu dados/dataops.db) em um pool de processos
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from processar_dados import PLANILHAS, executar_processamento
+
+PREFIXO_CLIENTE = 'DataOps-'
+
+
+def localizar_clientes(pasta_principal):
+    """Lista as pastas DataOps-* que têm uma pasta 1-coleta/"""
+    clientes = []
+    for nome in sorted(os.listdir(pasta_principal)):
+        caminho = os.path.join(pasta_principal, nome)
+        if (nome.startswith(PREFIXO_CLIENTE) and os.path.isdir(caminho)
+                and os.path.isdir(os.path.join(caminho, '1-coleta'))):
+            clientes.append(caminho)
+    return clientes
+
+
+def processar_cliente(pasta_cliente, force=False, tamanho_lote=None, usar_cache=True):
+    """Processa um cliente em um processo do pool
+
+    Cada cliente usa apenas o próprio banco (dados/dataops.db da sua pasta).
+    As mensagens vão só para o log do cliente (logs/importacao.jsonl); o
+    terminal fica com a tabela de resumo, sem misturar os clientes.
+    """
+    inicio = time.perf_counter()
+    saida = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(saida):
+            resumo = executar_processamento(pasta_cliente, force=force, tamanho_lote=tamanho_lote,
+                                            usar_cache=usar_cache, verbosidade='ERROR')
+    except Exception as e:
+        resumo = {'sucesso': False, 'linhas': {}, 'erros': 1, 'mensagem': str(e)}
+    resumo['tempo'] = time.perf_counter() - inicio
+    return resumo
+
+
+def imprimir_resumo(resultados):
+    """Tabela com tempo, linhas importadas e falhas de cada cliente"""
+    largura = max([len('Cliente')] + [len(nome) for nome in resultados])
+    colunas = list(PLANILHAS)
+    cabecalho = f"{'Cliente':<{largura}}  {'Tempo':>8}  " + "  ".join(f"{col:>13}" for col in colunas) + "  Status"
+
+    print("\n" + "="*len(cabecalho))
+    print("RESUMO POR CLIENTE")
+    print("="*len(cabecalho))
+    print(cabecalho)
+    print("-"*len(cabecalho))
+    for nome, resumo in resultados.items():
+        linhas = "  ".join(f"{resumo['linhas'].get(col, 0) or 0:>13}" for col in colunas)
+        if not resumo['sucesso']:
+            status = f"❌ Falhou {resumo.get('mensagem', '')}".strip()
+        elif resumo['erros']:
+            status = f"⚠️ {resumo['erros']} erros (ver logs/importacao.jsonl)"
+        else:
+            status = "✅ OK"
+        print(f"{nome:<{largura}}  {resumo['tempo']:>7.1f}s  {linhas}  {status}")
+    print("="*len(cabecalho) + "\n")
+
+
+def main(argv=None):
+    """Processa todos os clientes da pasta principal"""
+    parser = argparse.ArgumentParser(description="DataOps Local - Processamento de Vários Clientes")
+    parser.add_argument('pasta_principal',
+                        help="Pasta que contém as pastas DataOps-* dos clientes (ex.: MeusClientes)")
+    parser.add_argument('--processos', type=int, default=None, metavar='N',
+                        help="Número de clientes processados ao mesmo tempo (padrão: nº de CPUs)")
+    parser.add_argument('--force', action='store_true',
+                        help="Reprocessa todas as planilhas, ignorando o manifesto de ingestão")
+    parser.add_argument('--tamanho-lote', type=int, default=None, metavar='N',
+                        help="Lê receitas e despesas em lotes de N linhas")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Não usa o cache de planilhas já lidas")
+    args = parser.parse_args(argv)
+
+    print("\n🚀 DATAOPS LOCAL - PROCESSAMENTO DE VÁRIOS CLIENTES")
+    print("="*60 + "\n")
+
+    clientes = localizar_clientes(args.pasta_principal)
+    if not clientes:
+        print(f"❌ Nenhuma pasta {PREFIXO_CLIENTE}* com 1-coleta/ encontrada em: {args.pasta_principal}")
+        sys.exit(1)
+
+    max_processos = args.processos or min(len(clientes), os.cpu_count() or 1)
+    print(f"📂 {len(clientes)} clientes encontrados ({max_processos} processos)\n")
+
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=max_processos) as pool:
+        futuros = {
+            pool.submit(processar_cliente, pasta, args.force, args.tamanho_lote, not args.sem_cache):
+                os.path.basename(pasta)
+            for pasta in clientes
+        }
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                resultados[nome] = {'sucesso': False, 'linhas': {}, 'erros': 1,
+                                    'tempo': 0.0, 'mensagem': str(e)}
+            simbolo = "✅" if resultados[nome]['sucesso'] else "❌"
+            print(f"{simbolo} {nome} concluído em {resultados[nome]['tempo']:.1f}s")
+
+    imprimir_resumo(dict(sorted(resultados.items())))
+
+    if not all(resumo['sucesso'] for resumo in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
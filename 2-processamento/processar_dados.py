@@ -7,30 +7,181 @@ Versão: 2.0 (Corrigida)
 MELHORIAS NESTA VERSÃO:
 - ✅ Validação robusta de dados
 - ✅ Tratamento de erros melhorado
-- ✅ Log detalhado de importação
+- ✅ Log detalhado de importação (JSON lines com rotação em logs/importacao.jsonl)
 - ✅ Suporte a múltiplos formatos de data
 - ✅ Verificação de dados duplicados
 - ✅ Cálculo automático de comissões como despesa
+- ✅ Ingestão incremental (manifesto de planilhas já importadas)
+- ✅ Entrada também em CSV (.csv/.csv.gz) e Parquet
+- ✅ Validação linha a linha com quarentena (linhas inválidas não bloqueiam o arquivo)
+- ✅ Ledger de comissões (comissoes_calculadas): reprocessar não duplica a folha
+- ✅ Métricas por etapa (tempo, CPU, linhas, memória) em pipeline_runs/pipeline_stage_metrics
 """
 
 import pandas as pd
-import sqlite3
 from datetime import datetime
+import argparse
+import hashlib
 import os
 import sys
+import time
+import uuid
+from collections import deque
+
+from cache_planilhas import CachePlanilhas, qtd_linhas_lidas
+from escrita_sqlite import FORMATO_DATA_SQL, EscritorSQLite
+from leitura_arquivos import ler_arquivo, localizar_arquivo
+from log_estruturado import (ARQUIVO_LOG, NIVEIS, configurar_log, encerrar_log, obter_logger,
+                             verbosidade_atual)
+from metricas_execucao import MetricasExecucao, criar_tabelas_metricas
+
+# Planilhas de entrada em 1-coleta/, na ordem de processamento.
+# arquivo: template Excel (um export .csv/.csv.gz/.parquet da entidade tem prioridade).
+# lotes: aceita leitura em lotes (tamanho_lote) e upsert incremental.
+PLANILHAS = {
+    'profissionais': {'arquivo': 'Template_Profissionais.xlsx', 'aba': 'Profissionais', 'lotes': False},
+    'servicos': {'arquivo': 'Template_Servicos.xlsx', 'aba': 'Servicos', 'lotes': False},
+    'receitas': {'arquivo': 'Template_Receitas.xlsx', 'aba': 'Receitas', 'lotes': True},
+    'despesas': {'arquivo': 'Template_Despesas.xlsx', 'aba': 'Despesas', 'lotes': True},
+}
+
+# Mensagens mantidas em memória (as mais recentes); o histórico completo fica no arquivo de log
+LIMITE_LOG_MEMORIA = 1000
 
 class DataProcessor:
-    def __init__(self, db_path='dados/dataops.db'):
+    # Colunas que identificam uma linha (chave natural) em cada tabela de movimento.
+    # Linhas idênticas na mesma planilha são diferenciadas pela ordem de ocorrência.
+    # Cada linha guarda a planilha de origem (arquivo): quando a chave muda (cliente
+    # corrigido, por exemplo), a versão antiga é removida ao fim da importação.
+    CHAVES_NATURAIS = {
+        'receitas': ['data', 'profissional', 'tipo_servico', 'cliente'],
+        'despesas': ['data', 'categoria', 'descricao', 'fornecedor'],
+    }
+    
+    # Colunas que precisam existir na planilha e estar preenchidas em cada linha
+    COLUNAS_OBRIGATORIAS = {
+        'receitas': ['data', 'tipo_servico', 'profissional', 'valor_servico'],
+        'despesas': ['data', 'categoria', 'descricao', 'valor'],
+    }
+    
+    # Coluna de valor (precisa ser numérica e maior que zero)
+    COLUNA_VALOR = {
+        'receitas': 'valor_servico',
+        'despesas': 'valor',
+    }
+    
+    # Colunas de texto repetitivo gravadas como código inteiro de uma tabela de
+    # dimensão (id, nome). As linhas ficam em fato_receitas/fato_despesas e as
+    # views receitas/despesas devolvem os nomes, com as colunas de sempre.
+    TABELAS_FATO = {
+        'receitas': 'fato_receitas',
+        'despesas': 'fato_despesas',
+    }
+    DIMENSOES = {
+        'receitas': {
+            'tipo_servico': 'dim_servico',
+            'profissional': 'dim_profissional',
+            'forma_pagamento': 'dim_forma_pagamento',
+        },
+        'despesas': {
+            'categoria': 'dim_categoria',
+            'tipo_despesa': 'dim_tipo_despesa',
+            'forma_pagamento': 'dim_forma_pagamento',
+        },
+    }
+    
+    # Resumos diários (um por tabela de movimento): soma e quantidade por dia e
+    # pelos códigos das dimensões. Mantidos só para os dias alterados em cada
+    # execução; o dashboard e os relatórios agregam a partir deles.
+    RESUMOS_DIARIOS = {
+        'receitas': 'receitas_por_dia',
+        'despesas': 'despesas_por_dia',
+    }
+    
+    # Índices das consultas frequentes: filtros por período do dashboard e dos
+    # relatórios, agrupamentos por profissional/categoria e o join por período
+    # das comissões e a planilha de origem de cada linha (remover_linhas_ausentes).
+    # Bancos criados por versões antigas têm profissionais sem
+    # a restrição UNIQUE (e sem o sqlite_autoindex_profissionais_1): a busca
+    # por nome_profissional precisa do seu próprio índice.
+    INDICES = {
+        'idx_receitas_data': ('fato_receitas', ['data']),
+        'idx_receitas_profissional_data': ('fato_receitas', ['profissional_id', 'data']),
+        'idx_despesas_data_tipo': ('fato_despesas', ['data', 'tipo_despesa_id']),
+        'idx_despesas_categoria_data': ('fato_despesas', ['categoria_id', 'data']),
+        'idx_profissionais_nome': ('profissionais', ['nome_profissional']),
+        'idx_receitas_arquivo': ('fato_receitas', ['arquivo']),
+        'idx_despesas_arquivo': ('fato_despesas', ['arquivo']),
+    }
+    
+    # Colunas de data de cada tabela, gravadas como texto 'YYYY-MM-DD'
+    COLUNAS_DATA = {
+        'fato_receitas': ['data'],
+        'fato_despesas': ['data'],
+        'profissionais': ['data_admissao'],
+        'profissionais_historico': ['data_admissao', 'valid_from', 'valid_to'],
+        'receitas_quarentena': ['data'],
+        'despesas_quarentena': ['data'],
+    }
+    
+    # Versão do formato dos dados gravados (PRAGMA user_version do banco).
+    # 1: datas no formato canônico 'YYYY-MM-DD'
+    VERSAO_ESQUEMA = 1
+    
+    # Tabelas cujas estatísticas (ANALYZE) o planejador de consultas usa
+    TABELAS_ESTATISTICAS = ['fato_receitas', 'fato_despesas', 'dim_servico', 'dim_profissional',
+                            'dim_forma_pagamento', 'dim_categoria', 'dim_tipo_despesa',
+                            'receitas_por_dia', 'despesas_por_dia',
+                            'profissionais', 'profissionais_historico', 'servicos',
+                            'comissoes_calculadas']
+    
+    def __init__(self, db_path='dados/dataops.db', force=False, usar_cache=True, metricas=None):
         self.db_path = db_path
         self.conn = None
-        self.log_importacao = []
+        self.escritor = None
+        self.log_importacao = deque(maxlen=LIMITE_LOG_MEMORIA)
+        self.qtd_erros = 0
+        self.logger = obter_logger()
+        self.etapa = None
+        self._inicio_execucao = self._inicio_etapa = time.perf_counter()
+        self.force = force
+        # Cache das planilhas já lidas, ao lado do banco (dados/cache/)
+        self.cache = CachePlanilhas(os.path.join(os.path.dirname(db_path), 'cache')) if usar_cache else None
+        self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self._fingerprints = {}
+        # Tempo, CPU, linhas e memória de cada etapa (pipeline_stage_metrics)
+        self.metricas = metricas if metricas is not None else MetricasExecucao()
         
-    def log(self, mensagem, tipo="INFO"):
-        """Adiciona mensagem ao log"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] [{tipo}] {mensagem}"
-        self.log_importacao.append(log_entry)
-        print(log_entry)
+    def log(self, mensagem, tipo="INFO", excecao=None, so_arquivo=False, **campos):
+        """Registra uma mensagem no log estruturado (terminal + arquivo JSON lines)
+        
+        excecao: exceção capturada; o traceback vai estruturado para o arquivo.
+        so_arquivo: mensagem já exibida (processo filho), só grava no arquivo.
+        campos: dados extras da linha JSON (linhas, arquivo...).
+        """
+        if tipo == "ERROR":
+            self.qtd_erros += 1
+        self.log_importacao.append((tipo, mensagem))
+        
+        agora = time.perf_counter()
+        campos = {
+            'decorrido_s': round(agora - self._inicio_execucao, 3),
+            'etapa_s': round(agora - self._inicio_etapa, 3),
+            **campos,
+        }
+        self.logger.log(
+            NIVEIS.get(tipo, NIVEIS['INFO']), mensagem, exc_info=excecao,
+            extra={'run_id': self.run_id, 'etapa': self.etapa, 'campos': campos, 'so_arquivo': so_arquivo}
+        )
+    
+    def iniciar_etapa(self, etapa):
+        """Marca o início de uma etapa (campo 'etapa' e tempo 'etapa_s' do log)
+        
+        A etapa anterior é encerrada também nas métricas da execução.
+        """
+        self.etapa = etapa
+        self._inicio_etapa = time.perf_counter()
+        self.metricas.iniciar(etapa)
         
     def conectar_banco(self):
         """Conecta ao banco de dados SQLite"""
@@ -38,49 +189,92 @@ class DataProcessor:
             # Criar diretório se não existir
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             
-            self.conn = sqlite3.connect(self.db_path)
+            # Conexão de importação: WAL, synchronous/cache ajustados e transações explícitas
+            self.escritor = EscritorSQLite(self.db_path)
+            self.escritor.configurar_importacao()
+            self.conn = self.escritor.conn
             self.log("✅ Conexão com banco de dados estabelecida", "SUCCESS")
             return True
         except Exception as e:
-            self.log(f"❌ Erro ao conectar ao banco: {e}", "ERROR")
+            self.log(f"❌ Erro ao conectar ao banco: {e}", "ERROR", excecao=e)
             return False
     
     def criar_tabelas(self):
         """Cria as tabelas necessárias no banco"""
+        self.iniciar_etapa('esquema')
         try:
             cursor = self.conn.cursor()
             
-            # Tabela de Receitas
+            # Dimensões: um código inteiro por nome (profissional, serviço...)
+            for dimensao in sorted({d for dims in self.DIMENSOES.values() for d in dims.values()}):
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {dimensao} (
+                        id INTEGER PRIMARY KEY,
+                        nome TEXT UNIQUE NOT NULL
+                    )
+                ''')
+            
+            # Tabela de Receitas (códigos das dimensões; a view receitas traz os nomes)
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS receitas (
+                CREATE TABLE IF NOT EXISTS fato_receitas (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     data DATE NOT NULL,
-                    tipo_servico TEXT NOT NULL,
-                    profissional TEXT NOT NULL,
+                    tipo_servico_id INTEGER NOT NULL REFERENCES dim_servico(id),
+                    profissional_id INTEGER NOT NULL REFERENCES dim_profissional(id),
                     cliente TEXT,
                     valor_servico REAL NOT NULL,
-                    forma_pagamento TEXT,
+                    forma_pagamento_id INTEGER REFERENCES dim_forma_pagamento(id),
                     observacoes TEXT,
+                    chave_linha INTEGER,
+                    hash_conteudo INTEGER,
+                    arquivo TEXT,
                     data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
-            # Tabela de Despesas
+            # Tabela de Despesas (códigos das dimensões; a view despesas traz os nomes)
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS despesas (
+                CREATE TABLE IF NOT EXISTS fato_despesas (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     data DATE NOT NULL,
-                    categoria TEXT NOT NULL,
+                    categoria_id INTEGER NOT NULL REFERENCES dim_categoria(id),
                     descricao TEXT NOT NULL,
                     valor REAL NOT NULL,
-                    forma_pagamento TEXT,
+                    forma_pagamento_id INTEGER REFERENCES dim_forma_pagamento(id),
                     fornecedor TEXT,
                     observacoes TEXT,
-                    tipo_despesa TEXT DEFAULT 'Manual',
+                    tipo_despesa_id INTEGER REFERENCES dim_tipo_despesa(id),
+                    chave_linha INTEGER,
+                    hash_conteudo INTEGER,
+                    comissao_id INTEGER,
+                    arquivo TEXT,
                     data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
+            # Bancos antigos: receitas/despesas com texto passam para as tabelas fato
+            for tabela, fato in self.TABELAS_FATO.items():
+                if 'arquivo' not in self.escritor.colunas_tabela(fato):
+                    cursor.execute(f"ALTER TABLE {fato} ADD COLUMN arquivo TEXT")
+                self.migrar_para_dimensoes(tabela)
+                self.criar_view_compatibilidade(tabela)
+            
+            # Resumos diários (dia x códigos das dimensões)
+            resumos_novos = []
+            for tabela, resumo in self.RESUMOS_DIARIOS.items():
+                if not self.escritor.colunas_tabela(resumo):
+                    resumos_novos.append(tabela)
+                codigos = ', '.join(f"{coluna}_id INTEGER" for coluna in self.DIMENSOES[tabela])
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {resumo} (
+                        dia DATE NOT NULL,
+                        {codigos},
+                        qtd INTEGER NOT NULL,
+                        total REAL NOT NULL
+                    )
+                ''')
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{resumo}_dia ON {resumo}(dia)")
+            
             # Tabela de Profissionais
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS profissionais (
@@ -96,6 +290,34 @@ class DataProcessor:
                 )
             ''')
             
+            # Histórico de profissionais (uma versão por período de vigência).
+            # valid_from inclusivo, valid_to exclusivo; valid_to NULL = versão atual
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS profissionais_historico (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome_profissional TEXT NOT NULL,
+                    funcao TEXT,
+                    tipo_contrato TEXT,
+                    percentual_comissao REAL,
+                    salario_fixo REAL,
+                    status TEXT,
+                    data_admissao DATE,
+                    valid_from DATE NOT NULL,
+                    valid_to DATE,
+                    data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_profissionais_historico_vigencia
+                ON profissionais_historico(nome_profissional, valid_from, valid_to)
+            ''')
+            # No máximo uma versão aberta (valid_to NULL) por profissional; o índice
+            # acima não impede isso, pois no UNIQUE do SQLite NULLs são distintos
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_profissionais_historico_atual
+                ON profissionais_historico(nome_profissional) WHERE valid_to IS NULL
+            ''')
+
             # Tabela de Serviços
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS servicos (
@@ -125,237 +347,1271 @@ class DataProcessor:
                 )
             ''')
             
-            self.conn.commit()
+            # Manifesto de ingestão (impressão digital de cada planilha já importada)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS manifesto_ingestao (
+                    arquivo TEXT NOT NULL,
+                    aba TEXT NOT NULL,
+                    tamanho_bytes INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    hash_conteudo TEXT NOT NULL,
+                    qtd_linhas INTEGER,
+                    run_id TEXT,
+                    data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (arquivo, aba)
+                )
+            ''')
+            
+            # Quarentena: linhas rejeitadas na validação, com número da linha e motivo
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS receitas_quarentena (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    arquivo TEXT NOT NULL,
+                    linha INTEGER NOT NULL,
+                    motivo TEXT NOT NULL,
+                    data DATE,
+                    tipo_servico TEXT,
+                    profissional TEXT,
+                    cliente TEXT,
+                    valor_servico REAL,
+                    forma_pagamento TEXT,
+                    observacoes TEXT,
+                    run_id TEXT,
+                    data_quarentena TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS despesas_quarentena (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    arquivo TEXT NOT NULL,
+                    linha INTEGER NOT NULL,
+                    motivo TEXT NOT NULL,
+                    data DATE,
+                    categoria TEXT,
+                    descricao TEXT,
+                    valor REAL,
+                    forma_pagamento TEXT,
+                    fornecedor TEXT,
+                    observacoes TEXT,
+                    tipo_despesa TEXT,
+                    run_id TEXT,
+                    data_quarentena TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Métricas de cada execução e de suas etapas
+            criar_tabelas_metricas(self.conn)
+            
+            # Bancos antigos: datas gravadas com hora passam a 'YYYY-MM-DD'
+            self.migrar_datas()
+            
+            # Registrar (profissional, dia) das receitas alteradas a partir daqui
+            self.rastrear_receitas_alteradas()
+            
+            # Registrar os dias alterados em receitas/despesas (resumos diários)
+            self.rastrear_dias_alterados()
+            
+            # Bancos antigos: primeira versão do histórico a partir do cadastro atual
+            self.atualizar_historico_profissionais()
+            
+            # Chave natural única para upsert idempotente de receitas e despesas
+            for tabela in self.CHAVES_NATURAIS:
+                self.migrar_chave_linha(tabela)
+                cursor.execute(f'''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_{tabela}_chave_linha
+                    ON {self.TABELAS_FATO[tabela]}(chave_linha)
+                ''')
+            
+            # Ledger de comissões: uma linha por (profissional, período), e a
+            # despesa de comissão aponta para a sua linha do ledger
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_comissoes_calculadas_periodo
+                ON comissoes_calculadas(profissional, periodo_inicio, periodo_fim)
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_despesas_comissao_id
+                ON fato_despesas(comissao_id)
+            ''')
+            
+            # Índices das consultas por período, profissional e categoria
+            self.criar_indices()
+            
+            # Bancos antigos: linhas gravadas antes da coluna arquivo
+            for tabela in self.CHAVES_NATURAIS:
+                self.migrar_arquivo_origem(tabela)
+            
+            # Resumos criados agora: montados com todo o histórico
+            for tabela in resumos_novos:
+                self.reconstruir_resumo_diario(tabela)
+            
+            self.escritor.commit()
             self.log("✅ Tabelas criadas/verificadas com sucesso", "SUCCESS")
             return True
             
         except Exception as e:
-            self.log(f"❌ Erro ao criar tabelas: {e}", "ERROR")
+            self.log(f"❌ Erro ao criar tabelas: {e}", "ERROR", excecao=e)
             return False
     
-    def converter_data(self, data_str):
-        """Converte data para formato adequado, tentando múltiplos formatos"""
-        if pd.isna(data_str):
-            return None
-            
-        # Formatos possíveis
-        formatos = [
-            '%d/%m/%Y',
-            '%Y-%m-%d',
-            '%d-%m-%Y',
-            '%Y/%m/%d',
-            '%d.%m.%Y'
-        ]
+    def calcular_hash_arquivo(self, caminho, tamanho_bloco=1024 * 1024):
+        """Calcula o SHA-256 do conteúdo do arquivo lendo em blocos"""
+        sha = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+                sha.update(bloco)
+        return sha.hexdigest()
+    
+    def arquivo_inalterado(self, arquivo, aba):
+        """Verifica no manifesto se a aba já foi importada com o mesmo conteúdo
         
-        for formato in formatos:
-            try:
-                return pd.to_datetime(data_str, format=formato)
-            except:
+        Compara primeiro tamanho e mtime (barato); só calcula o hash quando
+        eles divergem, para detectar arquivos apenas re-salvos ou copiados.
+        """
+        caminho = os.path.abspath(arquivo)
+        stat = os.stat(caminho)
+        fingerprint = {'tamanho_bytes': stat.st_size, 'mtime': stat.st_mtime, 'hash_conteudo': None}
+        self._fingerprints[(caminho, aba)] = fingerprint
+        
+        if self.force:
+            return False
+        
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT tamanho_bytes, mtime, hash_conteudo FROM manifesto_ingestao WHERE arquivo = ? AND aba = ?",
+            (caminho, aba)
+        )
+        registro = cursor.fetchone()
+        if registro is None:
+            return False
+        
+        tamanho, mtime, hash_anterior = registro
+        if tamanho == stat.st_size and mtime == stat.st_mtime:
+            fingerprint['hash_conteudo'] = hash_anterior
+        else:
+            fingerprint['hash_conteudo'] = self.calcular_hash_arquivo(caminho)
+            if fingerprint['hash_conteudo'] != hash_anterior:
+                return False
+            # Mesmo conteúdo com mtime diferente: só atualiza o manifesto
+            cursor.execute(
+                "UPDATE manifesto_ingestao SET tamanho_bytes = ?, mtime = ? WHERE arquivo = ? AND aba = ?",
+                (stat.st_size, stat.st_mtime, caminho, aba)
+            )
+            self.escritor.commit()
+        
+        self.log(f"⏭️ {os.path.basename(arquivo)} [{aba}] sem alterações desde a última importação (use --force para reprocessar)")
+        return True
+    
+    def hash_arquivo(self, arquivo, aba):
+        """Hash do conteúdo do arquivo, reaproveitando o calculado na verificação do manifesto"""
+        caminho = os.path.abspath(arquivo)
+        fingerprint = self._fingerprints.get((caminho, aba))
+        if fingerprint is None:
+            stat = os.stat(caminho)
+            fingerprint = {'tamanho_bytes': stat.st_size, 'mtime': stat.st_mtime, 'hash_conteudo': None}
+            self._fingerprints[(caminho, aba)] = fingerprint
+        if fingerprint['hash_conteudo'] is None:
+            fingerprint['hash_conteudo'] = self.calcular_hash_arquivo(caminho)
+        return fingerprint['hash_conteudo']
+    
+    def registrar_manifesto(self, arquivo, aba, qtd_linhas):
+        """Registra a impressão digital da aba importada com sucesso"""
+        caminho = os.path.abspath(arquivo)
+        fingerprint = self._fingerprints.pop((caminho, aba), None)
+        if fingerprint is None:
+            stat = os.stat(caminho)
+            fingerprint = {'tamanho_bytes': stat.st_size, 'mtime': stat.st_mtime, 'hash_conteudo': None}
+        if fingerprint['hash_conteudo'] is None:
+            fingerprint['hash_conteudo'] = self.calcular_hash_arquivo(caminho)
+        
+        self.conn.execute('''
+            INSERT OR REPLACE INTO manifesto_ingestao
+                (arquivo, aba, tamanho_bytes, mtime, hash_conteudo, qtd_linhas, run_id, data_importacao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (caminho, aba, fingerprint['tamanho_bytes'], fingerprint['mtime'],
+              fingerprint['hash_conteudo'], qtd_linhas, self.run_id))
+        self.escritor.commit()
+    
+    @staticmethod
+    def _normalizar_para_hash(serie):
+        """Converte a coluna em texto canônico para que o hash não dependa do dtype lido"""
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.dt.strftime('%Y-%m-%d').fillna('')
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            return serie.astype(float).round(2).astype(str).where(serie.notna(), '')
+        return serie.astype(str).str.strip().where(serie.notna(), '')
+    
+    def _hash_colunas(self, df, colunas):
+        """Hash vetorizado (int64) das colunas informadas, linha a linha"""
+        normalizado = pd.DataFrame(
+            {col: self._normalizar_para_hash(df[col]) for col in colunas},
+            index=df.index
+        )
+        return pd.Series(
+            pd.util.hash_pandas_object(normalizado, index=False).values.view('int64'),
+            index=df.index
+        )
+    
+    def calcular_chaves_linha(self, df, tabela, grupo=None, ocorrencias=None):
+        """Calcula chave natural (com ordem de ocorrência) e hash de conteúdo
+        
+        grupo: coluna adicional que reinicia a contagem de ocorrências
+        (usada na migração, onde cada importação antiga é um grupo).
+        ocorrencias: dicionário {chave base: ocorrências já vistas}, para que a
+        contagem continue entre lotes de uma mesma planilha.
+        """
+        colunas_chave = [col for col in self.CHAVES_NATURAIS[tabela] if col in df.columns]
+        colunas_conteudo = sorted(col for col in df.columns
+                                  if col not in ('id', 'chave_linha', 'hash_conteudo', 'arquivo',
+                                                 'data_importacao', grupo))
+        
+        base = self._hash_colunas(df, colunas_chave)
+        agrupadores = [base] if grupo is None else [base, df[grupo]]
+        ocorrencia = base.groupby(agrupadores).cumcount()
+        if ocorrencias is not None:
+            ocorrencia = ocorrencia + base.map(ocorrencias).fillna(0).astype('int64')
+            for valor, qtd in base.value_counts().items():
+                ocorrencias[valor] = ocorrencias.get(valor, 0) + qtd
+        chave = pd.util.hash_pandas_object(
+            pd.DataFrame({'base': base, 'ocorrencia': ocorrencia}), index=False
+        ).values.view('int64')
+        
+        return pd.Series(chave, index=df.index), self._hash_colunas(df, colunas_conteudo)
+    
+    def codigo_dimensao(self, dimensao, nome):
+        """Código de um nome na tabela de dimensão (cadastra o nome se for novo)"""
+        self.conn.execute(f"INSERT OR IGNORE INTO {dimensao} (nome) VALUES (?)", (nome,))
+        return self.conn.execute(f"SELECT id FROM {dimensao} WHERE nome = ?", (nome,)).fetchone()[0]
+    
+    def migrar_para_dimensoes(self, tabela):
+        """Passa a tabela antiga (nomes em texto) para a tabela fato com códigos
+        
+        Cadastra os nomes distintos nas dimensões, copia as linhas mantendo os
+        ids e remove a tabela antiga; criar_view_compatibilidade recria
+        `tabela` como view. Não faz nada se `tabela` já for uma view.
+        Retorna a quantidade de linhas migradas.
+        """
+        tipo = self.conn.execute(
+            "SELECT type FROM sqlite_master WHERE name = ?", (tabela,)
+        ).fetchone()
+        if tipo is None or tipo[0] != 'table':
+            return 0
+        
+        fato = self.TABELAS_FATO[tabela]
+        dimensoes = self.DIMENSOES[tabela]
+        antigas = self.escritor.colunas_tabela(tabela)
+        cursor = self.conn.cursor()
+        
+        for coluna, dimensao in dimensoes.items():
+            if coluna in antigas:
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO {dimensao} (nome)
+                    SELECT DISTINCT {coluna} FROM {tabela} WHERE {coluna} IS NOT NULL
+                """)
+        
+        destino, origem = [], []
+        for coluna in self.escritor.colunas_tabela(fato):
+            nome = coluna[:-len('_id')]
+            if nome in dimensoes:
+                if nome in antigas:
+                    destino.append(coluna)
+                    origem.append(f"(SELECT id FROM {dimensoes[nome]} WHERE nome = t.{nome})")
+            elif coluna in antigas:
+                destino.append(coluna)
+                origem.append(f"t.{coluna}")
+        cursor.execute(f"""
+            INSERT INTO {fato} ({', '.join(destino)})
+            SELECT {', '.join(origem)} FROM {tabela} t ORDER BY t.id
+        """)
+        migradas = cursor.rowcount
+        
+        if tabela == 'despesas':
+            # Bancos anteriores a tipo_despesa: todas as despesas eram manuais
+            cursor.execute("UPDATE fato_despesas SET tipo_despesa_id = ? WHERE tipo_despesa_id IS NULL",
+                           (self.codigo_dimensao('dim_tipo_despesa', 'Manual'),))
+        
+        cursor.execute(f"DROP TABLE {tabela}")
+        self.log(f"🗜️ {migradas} linhas de {tabela} migradas para {fato} (nomes gravados como códigos)")
+        return migradas
+    
+    def criar_view_compatibilidade(self, tabela):
+        """Cria a view `tabela` com as colunas de sempre (nomes) sobre a tabela fato
+        
+        As colunas de código (profissional_id...) vêm no final da view, para
+        quem quiser agrupar pelo inteiro em vez do texto. Uma view criada antes
+        de uma coluna nova da tabela fato é recriada.
+        """
+        fato = self.TABELAS_FATO[tabela]
+        dimensoes = self.DIMENSOES[tabela]
+        colunas_fato = self.escritor.colunas_tabela(fato)
+        # A view traz todas as colunas da tabela fato (as de código no final)
+        if set(colunas_fato) <= set(self.escritor.colunas_tabela(tabela)):
+            return
+        
+        colunas, codigos, juncoes = [], [], []
+        for coluna in colunas_fato:
+            nome = coluna[:-len('_id')]
+            if nome in dimensoes:
+                colunas.append(f"{nome}.nome AS {nome}")
+                codigos.append(f"f.{coluna}")
+                juncoes.append(f"LEFT JOIN {dimensoes[nome]} {nome} ON {nome}.id = f.{coluna}")
+            else:
+                colunas.append(f"f.{coluna}")
+        self.conn.execute(f"DROP VIEW IF EXISTS {tabela}")
+        self.conn.execute(f"""
+            CREATE VIEW {tabela} AS
+            SELECT {', '.join(colunas + codigos)}
+            FROM {fato} f
+            {' '.join(juncoes)}
+        """)
+    
+    def migrar_datas(self):
+        """Converte as datas gravadas com hora ('2026-01-05 00:00:00') para 'YYYY-MM-DD'
+        
+        Roda uma única vez por banco (PRAGMA user_version < 1); a partir daí
+        valores_para_sql já grava as datas no formato canônico. Valores que
+        não são datas reconhecíveis ficam como estão.
+        Retorna a quantidade de valores convertidos.
+        """
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return 0
+        
+        cursor = self.conn.cursor()
+        convertidos = 0
+        for tabela, colunas in self.COLUNAS_DATA.items():
+            existentes = self.escritor.colunas_tabela(tabela)
+            for coluna in colunas:
+                if coluna not in existentes:
+                    continue
+                cursor.execute(f"""
+                    UPDATE {tabela} SET {coluna} = date({coluna})
+                    WHERE date({coluna}) IS NOT NULL AND {coluna} IS NOT date({coluna})
+                """)
+                convertidos += cursor.rowcount
+        
+        cursor.execute(f"PRAGMA user_version = {self.VERSAO_ESQUEMA}")
+        if convertidos:
+            self.log(f"📅 {convertidos} datas convertidas para o formato AAAA-MM-DD")
+        return convertidos
+    
+    def criar_indices(self):
+        """Cria os índices de INDICES que ainda não existem
+        
+        Retorna a quantidade de índices criados.
+        """
+        existentes = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )}
+        criados = 0
+        for nome, (tabela, colunas) in self.INDICES.items():
+            if nome in existentes:
                 continue
+            self.conn.execute(f"CREATE INDEX {nome} ON {tabela}({', '.join(colunas)})")
+            criados += 1
+        if criados:
+            self.log(f"🗂️ {criados} índices criados")
+        return criados
+    
+    def atualizar_estatisticas(self, tabelas=None):
+        """Roda ANALYZE nas tabelas informadas (padrão: TABELAS_ESTATISTICAS)
         
-        # Tentativa genérica
+        Sem estatísticas (sqlite_stat1) o planejador não sabe a seletividade
+        dos índices; depois de cargas grandes elas ficam desatualizadas. Em
+        tabelas grandes o analysis_limit faz o ANALYZE usar uma amostra.
+        Num banco ainda sem estatísticas todas as tabelas são analisadas.
+        Retorna a quantidade de tabelas analisadas.
+        """
         try:
-            return pd.to_datetime(data_str)
-        except:
-            self.log(f"⚠️ Não foi possível converter data: {data_str}", "WARNING")
-            return None
+            sem_estatisticas = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone() is None
+            if tabelas is None or sem_estatisticas:
+                tabelas = self.TABELAS_ESTATISTICAS
+            if not tabelas:
+                return 0
+            
+            # receitas/despesas são views: analisa a tabela fato, o resumo e as dimensões
+            fisicas = []
+            for tabela in tabelas:
+                if tabela in self.TABELAS_FATO:
+                    fisicas += ([self.TABELAS_FATO[tabela], self.RESUMOS_DIARIOS[tabela]]
+                                + list(self.DIMENSOES[tabela].values()))
+                else:
+                    fisicas.append(tabela)
+            tabelas = list(dict.fromkeys(fisicas))
+            
+            self.conn.execute("PRAGMA analysis_limit = 1000")
+            for tabela in tabelas:
+                self.conn.execute(f"ANALYZE {tabela}")
+            self.log(f"📈 Estatísticas atualizadas (ANALYZE): {', '.join(tabelas)}")
+            return len(tabelas)
+            
+        except Exception as e:
+            self.log(f"⚠️ Não foi possível atualizar as estatísticas: {e}", "WARNING", excecao=e)
+            return 0
+    
+    def migrar_chave_linha(self, tabela):
+        """Preenche chave_linha/hash_conteudo das linhas de bancos antigos e remove duplicatas de reimportação
+        
+        Linhas idênticas vindas de execuções diferentes (data_importacao distinta) são
+        duplicatas do append antigo; mantém-se apenas a da primeira importação.
+        """
+        cursor = self.conn.cursor()
+        fato = self.TABELAS_FATO[tabela]
+        # Lê pela view (nomes, como no upsert), só com as colunas que vêm da planilha
+        ignoradas = {f"{coluna}_id" for coluna in self.DIMENSOES[tabela]} | {'comissao_id'}
+        colunas = [col for col in self.escritor.colunas_tabela(tabela) if col not in ignoradas]
+        
+        filtro = "chave_linha IS NULL"
+        if tabela == 'despesas':
+            filtro += " AND tipo_despesa IS NOT 'Comissão Calculada'"
+        df = pd.read_sql_query(f"SELECT {', '.join(colunas)} FROM {tabela} WHERE {filtro} ORDER BY id",
+                               self.conn)
+        if len(df) == 0:
+            return
+        
+        df['data'] = pd.to_datetime(df['data'], format='mixed', errors='coerce')
+        df['lote'] = df['data_importacao'].fillna('')
+        df['chave_linha'], df['hash_conteudo'] = self.calcular_chaves_linha(
+            df.drop(columns=['chave_linha', 'hash_conteudo']), tabela, grupo='lote'
+        )
+        
+        duplicadas = df[df.duplicated('chave_linha', keep='first')]
+        if len(duplicadas) > 0:
+            cursor.executemany(f"DELETE FROM {fato} WHERE id = ?",
+                               [(int(i),) for i in duplicadas['id']])
+            self.log(f"🧹 {len(duplicadas)} linhas duplicadas por reimportação removidas de {tabela}", "WARNING")
+        
+        restantes = df.drop(duplicadas.index)
+        cursor.executemany(
+            f"UPDATE {fato} SET chave_linha = ?, hash_conteudo = ? WHERE id = ?",
+            zip(restantes['chave_linha'].tolist(), restantes['hash_conteudo'].tolist(),
+                restantes['id'].astype(int).tolist())
+        )
+    
+    def migrar_arquivo_origem(self, tabela):
+        """Preenche a planilha de origem das linhas importadas antes da coluna arquivo
+        
+        Só quando o manifesto tem uma única planilha para a aba (o caso comum):
+        foi dela que essas linhas vieram. Com mais de uma, as linhas ficam sem
+        origem e remover_linhas_ausentes não as toca.
+        Retorna a quantidade de linhas preenchidas.
+        """
+        arquivos = self.conn.execute(
+            "SELECT arquivo FROM manifesto_ingestao WHERE aba = ?", (PLANILHAS[tabela]['aba'],)
+        ).fetchall()
+        if len(arquivos) != 1:
+            return 0
+        # Despesas de comissão (sem chave_linha) não vêm de planilha
+        cursor = self.conn.execute(f"""
+            UPDATE {self.TABELAS_FATO[tabela]} SET arquivo = ?
+            WHERE arquivo IS NULL AND chave_linha IS NOT NULL
+        """, arquivos[0])
+        return cursor.rowcount
+    
+    def upsert_linhas(self, df, tabela, ocorrencias=None, commit=True, arquivo=None):
+        """Grava linhas de forma idempotente usando a chave natural
+        
+        Insere linhas novas, atualiza as que mudaram de conteúdo e ignora as
+        idênticas. Os nomes das colunas de DIMENSOES são cadastrados na
+        dimensão e gravados na tabela fato como código. Se o df já traz
+        chave_linha/hash_conteudo (calcular_chaves_linha), elas são usadas.
+        arquivo: planilha de origem, gravada em cada linha; as chaves gravadas
+        ficam anotadas para remover_linhas_ausentes.
+        Retorna um dicionário com as contagens de cada caso.
+        """
+        df = df.copy()
+        if 'chave_linha' not in df.columns:
+            df['chave_linha'], df['hash_conteudo'] = self.calcular_chaves_linha(df, tabela, ocorrencias=ocorrencias)
+        if arquivo is not None:
+            df['arquivo'] = os.path.abspath(arquivo)
+        # Mesma chave repetida no lote não deve acontecer, mas protege o ON CONFLICT
+        df = df.drop_duplicates('chave_linha', keep='last')
+        
+        colunas = list(df.columns)
+        fato = self.TABELAS_FATO[tabela]
+        dimensoes = {col: dim for col, dim in self.DIMENSOES[tabela].items() if col in colunas}
+        cursor = self.conn.cursor()
+        
+        cursor.execute(f"DROP TABLE IF EXISTS temp._stage_{tabela}")
+        cursor.execute(f"CREATE TEMP TABLE _stage_{tabela} AS SELECT {', '.join(colunas)} FROM {tabela} WHERE 0")
+        self.escritor.inserir_lote(f"temp._stage_{tabela}", df)
+        
+        for coluna, dimensao in dimensoes.items():
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO {dimensao} (nome)
+                SELECT DISTINCT {coluna} FROM temp._stage_{tabela} WHERE {coluna} IS NOT NULL
+            """)
+        
+        cursor.execute(f'''
+            SELECT
+                SUM(t.chave_linha IS NULL),
+                SUM(t.chave_linha IS NOT NULL AND t.hash_conteudo IS NOT s.hash_conteudo)
+            FROM temp._stage_{tabela} s
+            LEFT JOIN {fato} t ON t.chave_linha = s.chave_linha
+        ''')
+        inseridas, atualizadas = [int(v or 0) for v in cursor.fetchone()]
+        
+        colunas_fato = [f"{col}_id" if col in dimensoes else col for col in colunas]
+        valores = [f"(SELECT id FROM {dimensoes[col]} WHERE nome = s.{col})" if col in dimensoes
+                   else f"s.{col}" for col in colunas]
+        atualizacoes = ', '.join(f"{col} = excluded.{col}" for col in colunas_fato if col != 'chave_linha')
+        cursor.execute(f'''
+            INSERT INTO {fato} ({', '.join(colunas_fato)})
+            SELECT {', '.join(valores)} FROM temp._stage_{tabela} s WHERE true
+            ON CONFLICT(chave_linha) DO UPDATE SET
+                {atualizacoes},
+                data_importacao = CURRENT_TIMESTAMP
+            WHERE {fato}.hash_conteudo IS NOT excluded.hash_conteudo
+            {f"OR {fato}.arquivo IS NOT excluded.arquivo" if arquivo is not None else ""}
+        ''')
+        if arquivo is not None:
+            self._criar_chaves_vistas(tabela)
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO _chaves_vistas_{tabela}
+                SELECT chave_linha FROM temp._stage_{tabela}
+            """)
+        cursor.execute(f"DROP TABLE temp._stage_{tabela}")
+        if commit:
+            self.escritor.commit()
+        
+        return {
+            'inseridas': inseridas,
+            'atualizadas': atualizadas,
+            'inalteradas': len(df) - inseridas - atualizadas
+        }
+    
+    def _criar_chaves_vistas(self, tabela):
+        """Tabela temporária com as chaves gravadas na importação atual da planilha"""
+        self.conn.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS _chaves_vistas_{tabela} (
+                chave_linha INTEGER PRIMARY KEY
+            )
+        """)
+    
+    def remover_linhas_ausentes(self, tabela, arquivo):
+        """Remove as linhas gravadas a partir de `arquivo` que não vieram nesta importação
+        
+        Chamado depois que a planilha inteira foi gravada (upsert_linhas com
+        arquivo): a versão antiga de uma linha cuja chave natural mudou, ou que
+        saiu da planilha, deixa de existir no banco. Linhas sem origem (gravadas
+        antes da coluna arquivo) não são tocadas.
+        Retorna a quantidade de linhas removidas.
+        """
+        self._criar_chaves_vistas(tabela)
+        cursor = self.conn.execute(f"""
+            DELETE FROM {self.TABELAS_FATO[tabela]}
+            WHERE arquivo = ?
+            AND chave_linha NOT IN (SELECT chave_linha FROM _chaves_vistas_{tabela})
+        """, (os.path.abspath(arquivo),))
+        removidas = cursor.rowcount
+        self.conn.execute(f"DROP TABLE temp._chaves_vistas_{tabela}")
+        return removidas
+    
+    def remover_linhas_em_quarentena(self, tabela, df_quarentena, arquivo):
+        """Remove da tabela fato a versão já gravada das linhas que foram para a quarentena
+        
+        Cobre também as linhas sem planilha de origem, que remover_linhas_ausentes
+        não toca. df_quarentena: linhas rejeitadas, com chave_linha já calculada.
+        Retorna a quantidade de linhas removidas.
+        """
+        if len(df_quarentena) == 0:
+            return 0
+        caminho = os.path.abspath(arquivo)
+        cursor = self.conn.executemany(f"""
+            DELETE FROM {self.TABELAS_FATO[tabela]}
+            WHERE chave_linha = ? AND (arquivo = ? OR arquivo IS NULL)
+        """, [(int(chave), caminho) for chave in df_quarentena['chave_linha']])
+        return cursor.rowcount
+    
+    def log_upsert(self, contagens, tipo_dados):
+        """Registra no log o resultado de um upsert"""
+        mensagem = (f"✅ {tipo_dados}: {contagens['inseridas']} inseridas | "
+                    f"{contagens['atualizadas']} atualizadas | "
+                    f"{contagens['inalteradas']} inalteradas")
+        if contagens.get('removidas'):
+            mensagem += f" | {contagens['removidas']} removidas"
+        self.log(mensagem, "SUCCESS")
+    
+    # Formatos de data aceitos nas planilhas, em ordem de preferência
+    FORMATOS_DATA = [
+        '%d/%m/%Y',
+        '%Y-%m-%d',
+        '%d-%m-%Y',
+        '%Y/%m/%d',
+        '%d.%m.%Y'
+    ]
+    
+    def converter_coluna_data(self, serie, nome_coluna='data', tamanho_amostra=200):
+        """Converte uma coluna inteira de datas, detectando o formato por amostragem
+        
+        O formato que mais converte na amostra é aplicado à coluna toda em uma
+        única chamada vetorizada; os demais formatos (e a conversão genérica)
+        só são tentados nas linhas que sobraram sem converter.
+        
+        Retorna a série convertida e o índice das linhas não convertidas.
+        """
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie, serie.index[[]]
+        
+        preenchidas = serie.notna()
+        amostra = serie[preenchidas]
+        if len(amostra) > tamanho_amostra:
+            amostra = amostra.iloc[::len(amostra) // tamanho_amostra]
+        
+        acertos = {
+            formato: pd.to_datetime(amostra, format=formato, errors='coerce').notna().sum()
+            for formato in self.FORMATOS_DATA
+        }
+        formato_principal = max(self.FORMATOS_DATA, key=lambda f: acertos[f])
+        convertida = pd.to_datetime(serie, format=formato_principal, errors='coerce')
+        
+        # Fallback apenas para o resíduo não convertido
+        for formato in [f for f in self.FORMATOS_DATA if f != formato_principal] + ['mixed']:
+            residuo = preenchidas & convertida.isna()
+            if not residuo.any():
+                break
+            convertida[residuo] = pd.to_datetime(serie[residuo], format=formato, errors='coerce')
+        
+        linhas_invalidas = serie.index[preenchidas & convertida.isna()]
+        if len(linhas_invalidas) > 0:
+            # Linha da planilha = índice + 2 (cabeçalho na linha 1)
+            linhas = ', '.join(str(i + 2) for i in linhas_invalidas[:10])
+            sufixo = '...' if len(linhas_invalidas) > 10 else ''
+            self.log(f"⚠️ {len(linhas_invalidas)} valores de '{nome_coluna}' não convertidos "
+                     f"(linhas da planilha: {linhas}{sufixo})", "WARNING")
+        
+        return convertida, linhas_invalidas
     
     def validar_dados(self, df, tipo_dados):
-        """Valida dados antes da importação"""
+        """Valida a estrutura da planilha antes da importação
+        
+        Só erros que impedem a importação do arquivo inteiro (colunas
+        obrigatórias ausentes). Problemas em linhas individuais são tratados
+        por validar_linhas e vão para a quarentena.
+        """
         erros = []
         
-        if tipo_dados == 'receitas':
-            # Verificar colunas obrigatórias
-            colunas_obrigatorias = ['data', 'tipo_servico', 'profissional', 'valor_servico']
-            for col in colunas_obrigatorias:
-                if col not in df.columns:
-                    erros.append(f"Coluna obrigatória ausente: {col}")
-                elif df[col].isna().any():
-                    qtd_nulos = df[col].isna().sum()
-                    erros.append(f"Coluna '{col}' possui {qtd_nulos} valores nulos")
-            
-            # Validar valores numéricos
-            if 'valor_servico' in df.columns:
-                if (df['valor_servico'] <= 0).any():
-                    erros.append("Existem valores de serviço menores ou iguais a zero")
-        
-        elif tipo_dados == 'despesas':
-            colunas_obrigatorias = ['data', 'categoria', 'descricao', 'valor']
-            for col in colunas_obrigatorias:
-                if col not in df.columns:
-                    erros.append(f"Coluna obrigatória ausente: {col}")
-                elif df[col].isna().any():
-                    qtd_nulos = df[col].isna().sum()
-                    erros.append(f"Coluna '{col}' possui {qtd_nulos} valores nulos")
-            
-            if 'valor' in df.columns:
-                if (df['valor'] <= 0).any():
-                    erros.append("Existem valores de despesa menores ou iguais a zero")
+        for col in self.COLUNAS_OBRIGATORIAS.get(tipo_dados, []):
+            if col not in df.columns:
+                erros.append(f"Coluna obrigatória ausente: {col}")
         
         return erros
     
-    def processar_receitas(self, arquivo_excel):
-        """Processa e importa dados de receitas"""
+    def validar_linhas(self, df, tipo_dados, datas_invalidas=None):
+        """Valida linha a linha (de forma vetorizada) e retorna o motivo de rejeição
+        
+        Retorna uma Series alinhada ao df com o(s) motivo(s) separados por '; '
+        ou NaN para linhas válidas. datas_invalidas: índice das linhas cuja data
+        estava preenchida mas não pôde ser convertida.
+        """
+        regras = []
+        
+        for col in self.COLUNAS_OBRIGATORIAS.get(tipo_dados, []):
+            if col not in df.columns:
+                continue
+            vazias = df[col].isna()
+            if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+                vazias |= df[col].astype(str).str.strip().eq('')
+            if col == 'data' and datas_invalidas is not None and len(datas_invalidas) > 0:
+                invalidas = df.index.isin(datas_invalidas)
+                regras.append((invalidas, "data inválida"))
+                vazias &= ~invalidas
+            regras.append((vazias, f"{col} vazio"))
+        
+        col_valor = self.COLUNA_VALOR.get(tipo_dados)
+        if col_valor in df.columns:
+            valores = pd.to_numeric(df[col_valor], errors='coerce')
+            regras.append((df[col_valor].notna() & valores.isna(), f"{col_valor} não numérico"))
+            regras.append((valores <= 0, f"{col_valor} menor ou igual a zero"))
+        
+        motivo = pd.Series('', index=df.index)
+        for mascara, texto in regras:
+            mascara = pd.Series(mascara, index=df.index).fillna(False).astype(bool)
+            motivo = motivo.where(~mascara, motivo + '; ' + texto)
+        
+        motivo = motivo.str.lstrip('; ')
+        return motivo.where(motivo != '', None)
+    
+    def colunas_quarentena(self, tipo_dados):
+        """Colunas auxiliares que preparar_* acrescenta para a quarentena"""
+        return ['motivo_quarentena'] + [f"{coluna}_original" for coluna in ('data', self.COLUNA_VALOR[tipo_dados])]
+    
+    def guardar_texto_original(self, df, originais):
+        """Guarda em <coluna>_original o texto das células que não puderam ser convertidas
+        
+        originais: {coluna: valores lidos da planilha, antes da conversão}.
+        """
+        for coluna, serie in originais.items():
+            nao_convertidas = serie.notna() & df[coluna].isna()
+            df[f"{coluna}_original"] = serie.astype(str).where(nao_convertidas, None)
+    
+    def gravar_quarentena(self, df, tipo_dados, arquivo_excel):
+        """Substitui a quarentena do arquivo pelas linhas rejeitadas nesta importação
+        
+        Datas e valores que não puderam ser convertidos são gravados com o texto
+        da planilha ('31/02/2026', 'abc'), ao lado do motivo.
+        Retorna (linhas em quarentena agora, linhas que estavam em quarentena antes).
+        """
+        tabela = f"{tipo_dados}_quarentena"
+        caminho = os.path.abspath(arquivo_excel)
+        
+        anteriores = self.conn.execute(
+            f"SELECT COUNT(*) FROM {tabela} WHERE arquivo = ?", (caminho,)
+        ).fetchone()[0]
+        self.conn.execute(f"DELETE FROM {tabela} WHERE arquivo = ?", (caminho,))
+        
+        if len(df) > 0:
+            df = df.copy()
+            for coluna in ('data', self.COLUNA_VALOR[tipo_dados]):
+                texto = df.pop(f"{coluna}_original")
+                if pd.api.types.is_datetime64_any_dtype(df[coluna]):
+                    df[coluna] = df[coluna].dt.strftime(FORMATO_DATA_SQL)
+                df[coluna] = df[coluna].astype(object).where(texto.isna(), texto)
+            df = df.rename(columns={'motivo_quarentena': 'motivo'})
+            df.insert(0, 'linha', df.index + 2)
+            df.insert(0, 'arquivo', caminho)
+            df['run_id'] = self.run_id
+            existentes = self.escritor.colunas_tabela(tabela)
+            self.escritor.inserir_lote(tabela, df[[col for col in df.columns if col in existentes]])
+        
+        return len(df), anteriores
+    
+    def log_quarentena(self, df_quarentena, tipo_dados, anteriores):
+        """Resume no log as linhas enviadas para a quarentena"""
+        tabela = f"{tipo_dados}_quarentena"
+        if len(df_quarentena) > 0:
+            self.log(f"🚫 {len(df_quarentena)} linhas de {tipo_dados} em quarentena ({tabela})", "WARNING")
+            for motivo, qtd in df_quarentena['motivo_quarentena'].value_counts().head(5).items():
+                self.log(f"  - {motivo}: {qtd} linhas", "WARNING")
+            linhas = ', '.join(str(i + 2) for i in df_quarentena.index[:10])
+            sufixo = '...' if len(df_quarentena) > 10 else ''
+            self.log(f"  Linhas da planilha: {linhas}{sufixo}", "WARNING")
+        if anteriores > len(df_quarentena):
+            self.log(f"✅ {anteriores - len(df_quarentena)} linhas de {tipo_dados} saíram da quarentena", "SUCCESS")
+    
+    def ler_aba(self, arquivo_excel, aba, tamanho_lote=None, tipo_dados=None):
+        """Lê o arquivo de entrada (Excel, CSV ou Parquet), inteiro ou em lotes
+        
+        Com tamanho_lote, produz DataFrames de até tamanho_lote linhas,
+        mantendo a memória constante. O índice de cada lote é a posição da
+        linha nos dados (linha da planilha = índice + 2).
+        """
+        return ler_arquivo(arquivo_excel, aba, tipo_dados=tipo_dados, tamanho_lote=tamanho_lote)
+    
+    def _soma_contagens(self, total, parcial):
+        """Acumula as contagens de upsert de um lote no total do arquivo"""
+        for chave, valor in parcial.items():
+            total[chave] = total.get(chave, 0) + valor
+        return total
+    
+    def preparar_receitas(self, df):
+        """Normaliza colunas, converte datas e valida um lote de receitas
+        
+        Retorna o DataFrame com a coluna motivo_quarentena (NaN nas linhas
+        válidas) ou None se a estrutura da planilha for inválida.
+        Não acessa o banco, podendo rodar em outro processo.
+        """
+        # Renomear colunas para match com banco
+        df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
+        
+        # Validar estrutura
+        erros = self.validar_dados(df, 'receitas')
+        if erros:
+            self.log("⚠️ Erros encontrados na validação:", "WARNING")
+            for erro in erros:
+                self.log(f"  - {erro}", "WARNING")
+            return None
+        
+        # Converter data e valor (o texto do que não converter vai para a quarentena)
+        originais = {'data': df['data'], 'valor_servico': df['valor_servico']}
+        with self.metricas.medir('datas'):
+            df['data'], datas_invalidas = self.converter_coluna_data(df['data'])
+        with self.metricas.medir('validacao'):
+            motivo = self.validar_linhas(df, 'receitas', datas_invalidas)
+        df['valor_servico'] = pd.to_numeric(df['valor_servico'], errors='coerce')
+        df['motivo_quarentena'] = motivo
+        self.guardar_texto_original(df, originais)
+        
+        return df
+    
+    def preparar_despesas(self, df):
+        """Normaliza colunas, converte datas e valida um lote de despesas
+        
+        Retorna o DataFrame com a coluna motivo_quarentena (NaN nas linhas
+        válidas) ou None se a estrutura da planilha for inválida.
+        Não acessa o banco, podendo rodar em outro processo.
+        """
+        # Renomear colunas
+        df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
+        
+        # Validar estrutura
+        erros = self.validar_dados(df, 'despesas')
+        if erros:
+            self.log("⚠️ Erros encontrados na validação:", "WARNING")
+            for erro in erros:
+                self.log(f"  - {erro}", "WARNING")
+            return None
+        
+        # Adicionar tipo de despesa
+        df['tipo_despesa'] = 'Manual'
+        
+        # Converter data e valor (o texto do que não converter vai para a quarentena)
+        originais = {'data': df['data'], 'valor': df['valor']}
+        with self.metricas.medir('datas'):
+            df['data'], datas_invalidas = self.converter_coluna_data(df['data'])
+        with self.metricas.medir('validacao'):
+            motivo = self.validar_linhas(df, 'despesas', datas_invalidas)
+        df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
+        df['motivo_quarentena'] = motivo
+        self.guardar_texto_original(df, originais)
+        
+        return df
+    
+    def preparar_profissionais(self, df):
+        """Normaliza colunas e converte a data de admissão dos profissionais"""
+        df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
+        
+        if 'data_admissao' in df.columns:
+            df['data_admissao'], _ = self.converter_coluna_data(df['data_admissao'], 'data_admissao')
+        
+        return df
+    
+    def preparar_servicos(self, df):
+        """Normaliza colunas do catálogo de serviços"""
+        df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
+        return df
+    
+    def preparar_planilha(self, tipo_dados, arquivo_excel, tamanho_lote=None):
+        """Lê e prepara uma planilha inteira sem tocar no banco
+        
+        Retorna a lista de lotes preparados como tuplas (df, linhas lidas);
+        df é None no lote que falhou na validação (e a leitura para ali).
+        """
+        lotes = []
+        for df, qtd_lidas in self._lotes_preparados(tipo_dados, arquivo_excel, tamanho_lote):
+            lotes.append((df, qtd_lidas))
+            if df is None:
+                break
+        return lotes
+    
+    def carregar_planilha(self, tipo_dados, arquivo_excel):
+        """Retorna a planilha lida, normalizada e validada (usa o cache de dados/cache/)
+        
+        Não precisa de conexão com o banco; útil também para análises avulsas.
+        Retorna None se a planilha não passar na validação.
+        """
+        lotes = self.preparar_planilha(tipo_dados, arquivo_excel)
+        if not lotes or lotes[-1][0] is None:
+            return None
+        return pd.concat([df for df, _ in lotes])
+    
+    def _lotes_preparados(self, tipo_dados, arquivo_excel, tamanho_lote=None):
+        """Gera (df preparado, linhas lidas) lote a lote, lendo sob demanda
+        
+        Com o cache ativo, uma planilha cujo conteúdo já foi preparado antes é
+        lida do Parquet em dados/cache/ em vez do arquivo original. Leituras
+        completas (sem tamanho_lote) que passam na validação alimentam o cache.
+        """
+        aba = PLANILHAS[tipo_dados]['aba']
+        preparar = getattr(self, f'preparar_{tipo_dados}')
+        
+        usar_cache = self.cache is not None and self.cache.ativo
+        if usar_cache:
+            hash_arquivo = self.hash_arquivo(arquivo_excel, aba)
+            lotes_cache = self.cache.carregar(hash_arquivo, tipo_dados, tamanho_lote)
+            if lotes_cache is not None:
+                self.log(f"⚡ {os.path.basename(arquivo_excel)} [{aba}] carregado do cache")
+                # Linhas descartadas na preparação entram na contagem do primeiro lote
+                descartadas = None
+                for df in self.metricas.medir_lotes(lotes_cache, 'leitura'):
+                    if descartadas is None:
+                        descartadas = qtd_linhas_lidas(df) - self.cache.qtd_linhas(hash_arquivo, tipo_dados)
+                        yield df, len(df) + descartadas
+                    else:
+                        yield df, len(df)
+                return
+        
+        preparados = []
+        qtd_total = 0
+        for df in self.metricas.medir_lotes(self.ler_aba(arquivo_excel, aba, tamanho_lote, tipo_dados),
+                                            'leitura'):
+            qtd_lidas = len(df)
+            with self.metricas.medir('preparacao'):
+                df = preparar(df)
+            self.metricas.contar_linhas(entrada=qtd_lidas, saida=0 if df is None else len(df),
+                                        subetapa='preparacao')
+            yield df, qtd_lidas
+            if df is None:
+                return
+            qtd_total += qtd_lidas
+            if usar_cache and not tamanho_lote:
+                preparados.append(df)
+        
+        if preparados:
+            try:
+                with self.metricas.medir('cache'):
+                    self.cache.salvar(hash_arquivo, tipo_dados, pd.concat(preparados), qtd_total)
+            except Exception as e:
+                self.log(f"⚠️ Não foi possível gravar o cache de {arquivo_excel}: {e}", "WARNING")
+    
+    def processar_receitas(self, arquivo_excel, tamanho_lote=None, lotes_preparados=None):
+        """Processa e importa dados de receitas
+        
+        tamanho_lote: se informado, lê, valida e grava a planilha em lotes
+        desse número de linhas (modo streaming para planilhas muito grandes).
+        lotes_preparados: lotes já lidos e validados (pipeline paralelo); nesse
+        caso a planilha não é lida de novo e o manifesto já foi verificado.
+        """
         try:
             self.log(f"📂 Processando receitas de: {arquivo_excel}")
             
-            # Verificar se arquivo existe
-            if not os.path.exists(arquivo_excel):
-                self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
-                return 0
+            if lotes_preparados is None:
+                # Verificar se arquivo existe
+                if not os.path.exists(arquivo_excel):
+                    self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
+                    return 0
+                
+                if self.arquivo_inalterado(arquivo_excel, 'Receitas'):
+                    return 0
+                
+                lotes_preparados = self._lotes_preparados('receitas', arquivo_excel, tamanho_lote)
             
-            df = pd.read_excel(arquivo_excel, sheet_name='Receitas')
-            self.log(f"📊 {len(df)} receitas encontradas no arquivo")
-            
-            # Renomear colunas para match com banco
-            df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
-            
-            # Converter data
-            if 'data' in df.columns:
-                df['data'] = df['data'].apply(self.converter_data)
-                # Remover linhas com datas inválidas
-                linhas_antes = len(df)
-                df = df.dropna(subset=['data'])
-                if len(df) < linhas_antes:
-                    self.log(f"⚠️ {linhas_antes - len(df)} receitas removidas por data inválida", "WARNING")
-            
-            # Validar dados
-            erros = self.validar_dados(df, 'receitas')
-            if erros:
-                self.log("⚠️ Erros encontrados na validação:", "WARNING")
-                for erro in erros:
-                    self.log(f"  - {erro}", "WARNING")
-                return 0
+            self.escritor.abrir_savepoint('receitas')
+            contagens = {}
+            ocorrencias = {}
+            quarentena = []
+            qtd_linhas_planilha = 0
+            qtd_importadas = 0
+            
+            for df, qtd_lidas in lotes_preparados:
+                qtd_linhas_planilha += qtd_lidas
+                if df is None:
+                    self.escritor.desfazer_savepoint('receitas')
+                    return 0
+                
+                # Chaves calculadas com todas as linhas, inclusive as rejeitadas: uma
+                # linha repetida que vai para a quarentena não muda a ocorrência das outras
+                df['chave_linha'], df['hash_conteudo'] = self.calcular_chaves_linha(
+                    df.drop(columns=self.colunas_quarentena('receitas')), 'receitas', ocorrencias=ocorrencias
+                )
+                
+                # Linhas inválidas vão para a quarentena; as demais seguem para o banco
+                rejeitadas = df['motivo_quarentena'].notna()
+                if rejeitadas.any():
+                    quarentena.append(df[rejeitadas])
+                df = df[~rejeitadas].drop(columns=self.colunas_quarentena('receitas'))
+                
+                # Importar para o banco (upsert pela chave natural)
+                with self.metricas.medir('gravacao'):
+                    parcial = self.upsert_linhas(df, 'receitas', commit=False, arquivo=arquivo_excel)
+                self.metricas.contar_linhas(entrada=len(df), saida=len(df), subetapa='gravacao')
+                self._soma_contagens(contagens, parcial)
+                qtd_importadas += len(df)
             
-            # Importar para o banco
-            df.to_sql('receitas', self.conn, if_exists='append', index=False)
+            self.log(f"📊 {qtd_linhas_planilha} receitas encontradas no arquivo")
+            # Planilha lida por inteiro: linhas que saíram dela (ou mudaram de chave) saem do banco
+            contagens['removidas'] = self.remover_linhas_ausentes('receitas', arquivo_excel)
+            df_quarentena = pd.concat(quarentena) if quarentena else pd.DataFrame(columns=['motivo_quarentena'])
+            contagens['removidas'] += self.remover_linhas_em_quarentena('receitas', df_quarentena, arquivo_excel)
+            _, anteriores = self.gravar_quarentena(df_quarentena, 'receitas', arquivo_excel)
+            self.registrar_manifesto(arquivo_excel, 'Receitas', qtd_linhas_planilha)
+            self.escritor.liberar_savepoint('receitas')
+            self.metricas.contar_linhas(entrada=qtd_linhas_planilha, saida=qtd_importadas)
             
-            self.log(f"✅ {len(df)} receitas importadas com sucesso", "SUCCESS")
-            return len(df)
+            if contagens:
+                self.log_upsert(contagens, 'Receitas')
+            self.log_quarentena(df_quarentena, 'receitas', anteriores)
+            return qtd_importadas
             
         except Exception as e:
-            self.log(f"❌ Erro ao processar receitas: {e}", "ERROR")
-            import traceback
-            self.log(traceback.format_exc(), "ERROR")
+            self.escritor.desfazer_savepoint('receitas')
+            self.log(f"❌ Erro ao processar receitas: {e}", "ERROR", excecao=e)
             return 0
     
-    def processar_despesas(self, arquivo_excel):
-        """Processa e importa dados de despesas"""
+    def processar_despesas(self, arquivo_excel, tamanho_lote=None, lotes_preparados=None):
+        """Processa e importa dados de despesas
+        
+        tamanho_lote: se informado, lê, valida e grava a planilha em lotes
+        desse número de linhas (modo streaming para planilhas muito grandes).
+        lotes_preparados: lotes já lidos e validados (pipeline paralelo); nesse
+        caso a planilha não é lida de novo e o manifesto já foi verificado.
+        """
         try:
             self.log(f"📂 Processando despesas de: {arquivo_excel}")
             
-            if not os.path.exists(arquivo_excel):
-                self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
-                return 0
+            if lotes_preparados is None:
+                if not os.path.exists(arquivo_excel):
+                    self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
+                    return 0
+                
+                if self.arquivo_inalterado(arquivo_excel, 'Despesas'):
+                    return 0
+                
+                lotes_preparados = self._lotes_preparados('despesas', arquivo_excel, tamanho_lote)
             
-            df = pd.read_excel(arquivo_excel, sheet_name='Despesas')
-            self.log(f"📊 {len(df)} despesas encontradas no arquivo")
-            
-            # Renomear colunas
-            df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
-            
-            # Converter data
-            if 'data' in df.columns:
-                df['data'] = df['data'].apply(self.converter_data)
-                linhas_antes = len(df)
-                df = df.dropna(subset=['data'])
-                if len(df) < linhas_antes:
-                    self.log(f"⚠️ {linhas_antes - len(df)} despesas removidas por data inválida", "WARNING")
-            
-            # Adicionar tipo de despesa
-            df['tipo_despesa'] = 'Manual'
-            
-            # Validar dados
-            erros = self.validar_dados(df, 'despesas')
-            if erros:
-                self.log("⚠️ Erros encontrados na validação:", "WARNING")
-                for erro in erros:
-                    self.log(f"  - {erro}", "WARNING")
-                return 0
+            self.escritor.abrir_savepoint('despesas')
+            contagens = {}
+            ocorrencias = {}
+            quarentena = []
+            resumos_pagto = []
+            qtd_linhas_planilha = 0
+            qtd_importadas = 0
+            
+            for df, qtd_lidas in lotes_preparados:
+                qtd_linhas_planilha += qtd_lidas
+                if df is None:
+                    self.escritor.desfazer_savepoint('despesas')
+                    return 0
+                
+                # Chaves calculadas com todas as linhas, inclusive as rejeitadas: uma
+                # linha repetida que vai para a quarentena não muda a ocorrência das outras
+                df['chave_linha'], df['hash_conteudo'] = self.calcular_chaves_linha(
+                    df.drop(columns=self.colunas_quarentena('despesas')), 'despesas', ocorrencias=ocorrencias
+                )
+                
+                # Linhas inválidas vão para a quarentena; as demais seguem para o banco
+                rejeitadas = df['motivo_quarentena'].notna()
+                if rejeitadas.any():
+                    quarentena.append(df[rejeitadas])
+                df = df[~rejeitadas].drop(columns=self.colunas_quarentena('despesas'))
+                
+                # Importar para o banco (upsert pela chave natural)
+                with self.metricas.medir('gravacao'):
+                    parcial = self.upsert_linhas(df, 'despesas', commit=False, arquivo=arquivo_excel)
+                self.metricas.contar_linhas(entrada=len(df), saida=len(df), subetapa='gravacao')
+                self._soma_contagens(contagens, parcial)
+                qtd_importadas += len(df)
+                
+                if 'forma_pagamento' in df.columns:
+                    resumos_pagto.append(df.groupby('forma_pagamento')['valor'].agg(['count', 'sum']))
             
-            # Importar para o banco
-            df.to_sql('despesas', self.conn, if_exists='append', index=False)
+            self.log(f"📊 {qtd_linhas_planilha} despesas encontradas no arquivo")
+            # Planilha lida por inteiro: linhas que saíram dela (ou mudaram de chave) saem do banco
+            contagens['removidas'] = self.remover_linhas_ausentes('despesas', arquivo_excel)
+            df_quarentena = pd.concat(quarentena) if quarentena else pd.DataFrame(columns=['motivo_quarentena'])
+            contagens['removidas'] += self.remover_linhas_em_quarentena('despesas', df_quarentena, arquivo_excel)
+            _, anteriores = self.gravar_quarentena(df_quarentena, 'despesas', arquivo_excel)
+            self.registrar_manifesto(arquivo_excel, 'Despesas', qtd_linhas_planilha)
+            self.escritor.liberar_savepoint('despesas')
+            self.metricas.contar_linhas(entrada=qtd_linhas_planilha, saida=qtd_importadas)
             
-            self.log(f"✅ {len(df)} despesas importadas com sucesso", "SUCCESS")
+            if contagens:
+                self.log_upsert(contagens, 'Despesas')
+            self.log_quarentena(df_quarentena, 'despesas', anteriores)
             
             # Mostrar despesas por forma de pagamento
-            if 'forma_pagamento' in df.columns:
+            if resumos_pagto:
                 self.log("📋 Despesas por forma de pagamento:")
-                resumo_pagto = df.groupby('forma_pagamento')['valor'].agg(['count', 'sum'])
+                resumo_pagto = pd.concat(resumos_pagto).groupby(level=0).sum()
                 for forma, (qtd, total) in resumo_pagto.iterrows():
-                    self.log(f"  - {forma}: {qtd} despesas, Total: R$ {total:,.2f}")
+                    self.log(f"  - {forma}: {int(qtd)} despesas, Total: R$ {total:,.2f}")
             
-            return len(df)
+            return qtd_importadas
             
         except Exception as e:
-            self.log(f"❌ Erro ao processar despesas: {e}", "ERROR")
-            import traceback
-            self.log(traceback.format_exc(), "ERROR")
+            self.escritor.desfazer_savepoint('despesas')
+            self.log(f"❌ Erro ao processar despesas: {e}", "ERROR", excecao=e)
             return 0
     
-    def processar_profissionais(self, arquivo_excel):
+    def processar_profissionais(self, arquivo_excel, lotes_preparados=None):
         """Processa e importa dados de profissionais"""
         try:
             self.log(f"📂 Processando profissionais de: {arquivo_excel}")
             
-            if not os.path.exists(arquivo_excel):
-                self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
-                return 0
+            if lotes_preparados is None:
+                if not os.path.exists(arquivo_excel):
+                    self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
+                    return 0
+                
+                if self.arquivo_inalterado(arquivo_excel, 'Profissionais'):
+                    return 0
+                
+                lotes_preparados = self.preparar_planilha('profissionais', arquivo_excel)
             
-            df = pd.read_excel(arquivo_excel, sheet_name='Profissionais')
+            self.escritor.abrir_savepoint('profissionais')
+            df = pd.concat([lote for lote, _ in lotes_preparados], ignore_index=True)
+            qtd_linhas_planilha = len(df)
             self.log(f"📊 {len(df)} profissionais encontrados no arquivo")
             
-            # Renomear colunas
-            df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
-            
-            # Converter data
-            if 'data_admissao' in df.columns:
-                df['data_admissao'] = df['data_admissao'].apply(self.converter_data)
-            
             # Importar para o banco (substituindo dados antigos)
-            df.to_sql('profissionais', self.conn, if_exists='replace', index=False)
+            with self.metricas.medir('gravacao'):
+                ignoradas = self.escritor.substituir_tabela('profissionais', df)
+            if ignoradas:
+                self.log(f"⚠️ Colunas ignoradas (não existem na tabela): {', '.join(ignoradas)}", "WARNING")
+            with self.metricas.medir('historico'):
+                self.atualizar_historico_profissionais()
+            self.registrar_manifesto(arquivo_excel, 'Profissionais', qtd_linhas_planilha)
+            self.escritor.liberar_savepoint('profissionais')
+            self.metricas.contar_linhas(entrada=qtd_linhas_planilha, saida=len(df))
             
             self.log(f"✅ {len(df)} profissionais importados com sucesso", "SUCCESS")
             return len(df)
             
         except Exception as e:
-            self.log(f"❌ Erro ao processar profissionais: {e}", "ERROR")
-            import traceback
-            self.log(traceback.format_exc(), "ERROR")
+            self.escritor.desfazer_savepoint('profissionais')
+            self.log(f"❌ Erro ao processar profissionais: {e}", "ERROR", excecao=e)
             return 0
     
-    def processar_servicos(self, arquivo_excel):
+    # Campos do cadastro cuja mudança abre uma nova versão no histórico
+    CAMPOS_HISTORICO_PROFISSIONAIS = ['funcao', 'tipo_contrato', 'percentual_comissao',
+                                      'salario_fixo', 'status', 'data_admissao']
+    
+    # Início da primeira versão de cada profissional: cobre todas as vendas anteriores
+    INICIO_HISTORICO = '1900-01-01'
+    
+    def atualizar_historico_profissionais(self, vigencia=None):
+        """Versiona o cadastro atual de profissionais em profissionais_historico
+        
+        Quem mudou (comissão, contrato, status...) ou saiu da planilha tem a versão
+        aberta encerrada em `vigencia` (padrão: hoje), e a nova versão vale a partir
+        dela. A primeira versão de um profissional vale desde INICIO_HISTORICO.
+        Retorna o número de versões novas.
+        """
+        vigencia = vigencia or datetime.now().strftime('%Y-%m-%d')
+        cursor = self.conn.cursor()
+        
+        iguais = ' AND '.join(f"p.{campo} IS h.{campo}" for campo in self.CAMPOS_HISTORICO_PROFISSIONAIS)
+        alterada = f"""
+            NOT EXISTS (
+                SELECT 1 FROM profissionais p
+                WHERE p.nome_profissional = h.nome_profissional AND {iguais}
+            )
+        """
+        
+        # Versão aberta hoje e alterada de novo no mesmo dia: é substituída
+        cursor.execute(f"""
+            DELETE FROM profissionais_historico AS h
+            WHERE h.valid_to IS NULL AND h.valid_from = ? AND {alterada}
+        """, (vigencia,))
+        cursor.execute(f"""
+            UPDATE profissionais_historico AS h SET valid_to = ?
+            WHERE h.valid_to IS NULL AND {alterada}
+        """, (vigencia,))
+        
+        campos = ', '.join(self.CAMPOS_HISTORICO_PROFISSIONAIS)
+        cursor.execute(f"""
+            INSERT INTO profissionais_historico (nome_profissional, {campos}, valid_from)
+            SELECT p.nome_profissional, {', '.join(f'p.{campo}' for campo in self.CAMPOS_HISTORICO_PROFISSIONAIS)},
+                   CASE WHEN EXISTS (
+                       SELECT 1 FROM profissionais_historico h WHERE h.nome_profissional = p.nome_profissional
+                   ) THEN ? ELSE ? END
+            FROM profissionais p
+            WHERE NOT EXISTS (
+                SELECT 1 FROM profissionais_historico h
+                WHERE h.nome_profissional = p.nome_profissional AND h.valid_to IS NULL
+            )
+        """, (vigencia, self.INICIO_HISTORICO))
+        
+        novas = cursor.rowcount
+        if novas:
+            self.log(f"🕒 {novas} versões novas no histórico de profissionais")
+        return novas
+    
+    def processar_servicos(self, arquivo_excel, lotes_preparados=None):
         """Processa e importa dados de serviços"""
         try:
             self.log(f"📂 Processando serviços de: {arquivo_excel}")
             
-            if not os.path.exists(arquivo_excel):
-                self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
-                return 0
+            if lotes_preparados is None:
+                if not os.path.exists(arquivo_excel):
+                    self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
+                    return 0
+                
+                if self.arquivo_inalterado(arquivo_excel, 'Servicos'):
+                    return 0
+                
+                lotes_preparados = self.preparar_planilha('servicos', arquivo_excel)
             
-            df = pd.read_excel(arquivo_excel, sheet_name='Servicos')
+            self.escritor.abrir_savepoint('servicos')
+            df = pd.concat([lote for lote, _ in lotes_preparados], ignore_index=True)
+            qtd_linhas_planilha = len(df)
             self.log(f"📊 {len(df)} serviços encontrados no arquivo")
             
-            # Renomear colunas
-            df.columns = df.columns.str.lower().str.strip().str.replace(' ', '_')
-            
             # Importar para o banco (substituindo dados antigos)
-            df.to_sql('servicos', self.conn, if_exists='replace', index=False)
+            with self.metricas.medir('gravacao'):
+                ignoradas = self.escritor.substituir_tabela('servicos', df)
+            if ignoradas:
+                self.log(f"⚠️ Colunas ignoradas (não existem na tabela): {', '.join(ignoradas)}", "WARNING")
+            self.registrar_manifesto(arquivo_excel, 'Servicos', qtd_linhas_planilha)
+            self.escritor.liberar_savepoint('servicos')
+            self.metricas.contar_linhas(entrada=qtd_linhas_planilha, saida=len(df))
             
             self.log(f"✅ {len(df)} serviços importados com sucesso", "SUCCESS")
             return len(df)
             
         except Exception as e:
-            self.log(f"❌ Erro ao processar serviços: {e}", "ERROR")
-            import traceback
-            self.log(traceback.format_exc(), "ERROR")
+            self.escritor.desfazer_savepoint('servicos')
+            self.log(f"❌ Erro ao processar serviços: {e}", "ERROR", excecao=e)
             return 0
     
+    def processar_planilha(self, tipo_dados, arquivo_excel, tamanho_lote=None, lotes_preparados=None):
+        """Despacha para o processar_* do tipo de dados informado"""
+        self.iniciar_etapa(tipo_dados)
+        processar = getattr(self, f'processar_{tipo_dados}')
+        if PLANILHAS[tipo_dados]['lotes']:
+            return processar(arquivo_excel, tamanho_lote=tamanho_lote, lotes_preparados=lotes_preparados)
+        return processar(arquivo_excel, lotes_preparados=lotes_preparados)
+    
+    def processar_em_paralelo(self, arquivos, tamanho_lote=None, max_processos=None):
+        """Lê e valida as planilhas em paralelo e grava tudo por esta conexão
+        
+        A leitura do Excel (CPU) de cada planilha alterada roda em um processo
+        do pool; a gravação continua serializada nesta conexão, na ordem em que
+        as planilhas ficam prontas. arquivos: {tipo_dados: caminho}.
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        
+        pendentes = {}
+        for tipo_dados, arquivo_excel in arquivos.items():
+            if not os.path.exists(arquivo_excel):
+                self.log(f"❌ Arquivo não encontrado: {arquivo_excel}", "ERROR")
+            elif not self.arquivo_inalterado(arquivo_excel, PLANILHAS[tipo_dados]['aba']):
+                pendentes[tipo_dados] = arquivo_excel
+        
+        if not pendentes:
+            return {}
+        
+        self.iniciar_etapa('leitura_paralela')
+        resultados = {}
+        max_processos = max_processos or min(len(pendentes), os.cpu_count() or 1)
+        self.log(f"⚡ Lendo {len(pendentes)} planilhas em paralelo ({max_processos} processos)")
+        
+        with ProcessPoolExecutor(max_workers=max_processos) as pool:
+            futuros = {
+                pool.submit(_preparar_planilha_em_processo, tipo_dados, arquivo_excel, tamanho_lote,
+                            self.db_path, self.cache is not None, verbosidade_atual(), self.run_id,
+                            self.metricas.dir_perfil, self.metricas.rastrear_memoria): tipo_dados
+                for tipo_dados, arquivo_excel in pendentes.items()
+            }
+            for futuro in as_completed(futuros):
+                tipo_dados = futuros[futuro]
+                try:
+                    lotes, log_processo, metricas_processo = futuro.result()
+                except Exception as e:
+                    self.log(f"❌ Erro ao ler {pendentes[tipo_dados]}: {e}", "ERROR", excecao=e)
+                    resultados[tipo_dados] = 0
+                    continue
+                # Mensagens do processo filho já foram exibidas; só entram no log do arquivo
+                self.iniciar_etapa(tipo_dados)
+                for tipo, mensagem in log_processo:
+                    self.log(mensagem, tipo, so_arquivo=True)
+                self.metricas.incorporar(metricas_processo)
+                resultados[tipo_dados] = self.processar_planilha(
+                    tipo_dados, pendentes[tipo_dados], lotes_preparados=lotes
+                )
+        
+        return resultados
+    
     def calcular_comissoes_periodo(self, data_inicio=None, data_fim=None):
-        """Calcula e registra comissões de profissionais como despesas"""
+        """Calcula as comissões do período no ledger e as registra como despesas
+        
+        Reexecutar o mesmo período não duplica nada: o ledger é atualizado
+        por (profissional, período) e as despesas são derivadas dele.
+        Retorna a quantidade de comissões do período, ou None se o cálculo falhou.
+        """
+        self.iniciar_etapa('comissoes')
         try:
             import calendar
-            cursor = self.conn.cursor()
             
             # Se não especificado, calcular para o mês atual
             if not data_inicio or not data_fim:
@@ -367,79 +1623,447 @@ class DataProcessor:
             
             self.log(f"💰 Calculando comissões do período: {data_inicio} a {data_fim}")
             
-            # Buscar receitas por profissional no período
-            query = """
-                SELECT 
-                    r.profissional,
-                    SUM(r.valor_servico) as total_vendas,
-                    p.percentual_comissao,
-                    p.salario_fixo,
-                    p.tipo_contrato
-                FROM receitas r
-                LEFT JOIN profissionais p ON r.profissional = p.nome_profissional
-                WHERE r.data BETWEEN ? AND ?
-                AND p.status = 'Ativo'
-                GROUP BY r.profissional
-            """
-            
-            df_comissoes = pd.read_sql_query(query, self.conn, params=(data_inicio, data_fim))
+            self.escritor.abrir_savepoint('comissoes')
+            contagens = self.atualizar_comissoes([(data_inicio, data_fim)])
+            self.escritor.liberar_savepoint('comissoes')
+            
+            df_comissoes = pd.read_sql_query("""
+                SELECT profissional, total_vendas, percentual_comissao, valor_comissao,
+                       salario_fixo, total_pagar
+                FROM comissoes_calculadas
+                WHERE periodo_inicio = ? AND periodo_fim = ?
+                ORDER BY profissional
+            """, self.conn, params=(data_inicio, data_fim))
             
             if len(df_comissoes) == 0:
                 self.log("⚠️ Nenhuma receita encontrada para calcular comissões", "WARNING")
                 return 0
             
-            total_comissoes = 0
-            despesas_comissao = []
+            for row in df_comissoes.itertuples(index=False):
+                self.log(f"  💵 {row.profissional}: Vendas R$ {row.total_vendas:,.2f} | "
+                       f"Comissão ({row.percentual_comissao}%) R$ {row.valor_comissao:,.2f} | "
+                       f"Fixo R$ {row.salario_fixo:,.2f} | Total R$ {row.total_pagar:,.2f}")
             
-            for _, row in df_comissoes.iterrows():
-                profissional = row['profissional']
-                total_vendas = row['total_vendas']
-                percentual = row['percentual_comissao'] or 0
-                salario_fixo = row['salario_fixo'] or 0
-                tipo_contrato = row['tipo_contrato']
-                
-                valor_comissao = 0
-                total_pagar = salario_fixo
-                
-                if tipo_contrato == 'Percentual' and percentual > 0:
-                    valor_comissao = total_vendas * (percentual / 100)
-                    total_pagar += valor_comissao
+            self.log(f"✅ {len(df_comissoes)} comissões no ledger ({contagens['inseridas']} novas, "
+                     f"{contagens['atualizadas']} atualizadas, {contagens['inalteradas']} inalteradas). "
+                     f"Total: R$ {df_comissoes['total_pagar'].sum():,.2f}", "SUCCESS")
+            
+            return len(df_comissoes)
+            
+        except Exception as e:
+            self.escritor.desfazer_savepoint('comissoes')
+            self.log(f"❌ Erro ao calcular comissões: {e}", "ERROR", excecao=e)
+            return None
+    
+    def rastrear_receitas_alteradas(self):
+        """Cria gatilhos temporários que anotam (profissional, dia) de cada receita
+        inserida, atualizada ou removida nesta conexão em _receitas_alteradas
+        
+        Os gatilhos e a tabela são TEMP: existem só nesta conexão e não mudam o
+        esquema do banco (o dashboard e os relatórios não são afetados).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _receitas_alteradas (
+                profissional TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                PRIMARY KEY (profissional, dia)
+            ) WITHOUT ROWID
+        """)
+        for evento, linhas in (('INSERT', ['NEW']), ('UPDATE', ['OLD', 'NEW']), ('DELETE', ['OLD'])):
+            # NOT EXISTS em vez de OR IGNORE: dentro de um gatilho a política de
+            # conflito é a do comando externo (o upsert), não a do gatilho
+            acoes = ''.join(
+                f"INSERT INTO _receitas_alteradas "
+                f"SELECT p.nome, date({linha}.data) FROM main.dim_profissional p "
+                f"WHERE p.id = {linha}.profissional_id AND date({linha}.data) IS NOT NULL "
+                f"AND NOT EXISTS (SELECT 1 FROM _receitas_alteradas "
+                f"WHERE profissional = p.nome AND dia = date({linha}.data)); "
+                for linha in linhas
+            )
+            cursor.execute(f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS _rastrear_receitas_{evento.lower()}
+                AFTER {evento} ON main.fato_receitas
+                BEGIN {acoes} END
+            """)
+    
+    def rastrear_dias_alterados(self):
+        """Cria gatilhos temporários que anotam em _dias_alterados cada dia com
+        receita ou despesa inserida, atualizada ou removida nesta conexão
+        
+        Como em rastrear_receitas_alteradas, tabela e gatilhos são TEMP.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _dias_alterados (
+                tabela TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                PRIMARY KEY (tabela, dia)
+            ) WITHOUT ROWID
+        """)
+        for tabela, fato in self.TABELAS_FATO.items():
+            for evento, linhas in (('INSERT', ['NEW']), ('UPDATE', ['OLD', 'NEW']), ('DELETE', ['OLD'])):
+                acoes = ''.join(
+                    f"INSERT INTO _dias_alterados "
+                    f"SELECT '{tabela}', date({linha}.data) WHERE date({linha}.data) IS NOT NULL "
+                    f"AND NOT EXISTS (SELECT 1 FROM _dias_alterados "
+                    f"WHERE tabela = '{tabela}' AND dia = date({linha}.data)); "
+                    for linha in linhas
+                )
+                cursor.execute(f"""
+                    CREATE TEMP TRIGGER IF NOT EXISTS _rastrear_dias_{tabela}_{evento.lower()}
+                    AFTER {evento} ON main.{fato}
+                    BEGIN {acoes} END
+                """)
+    
+    def reconstruir_resumo_diario(self, tabela):
+        """Marca todos os dias da tabela como alterados e refaz o resumo inteiro"""
+        self.conn.execute(f"DELETE FROM {self.RESUMOS_DIARIOS[tabela]}")
+        self.conn.execute(f"""
+            INSERT OR IGNORE INTO _dias_alterados (tabela, dia)
+            SELECT DISTINCT '{tabela}', date(data) FROM {self.TABELAS_FATO[tabela]}
+            WHERE date(data) IS NOT NULL
+        """)
+        return self.atualizar_resumos_diarios()
+    
+    def atualizar_resumos_diarios(self):
+        """Refaz os resumos diários só dos dias alterados nesta execução
+        
+        Cada dia é recalculado por inteiro a partir da tabela fato (apaga e
+        insere), na mesma transação da carga: o resumo nunca fica à frente ou
+        atrás das linhas. Retorna a quantidade de dias atualizados.
+        """
+        try:
+            self.escritor.abrir_savepoint('resumos')
+            cursor = self.conn.cursor()
+            qtd_dias = 0
+            for tabela, resumo in self.RESUMOS_DIARIOS.items():
+                dias = cursor.execute(
+                    "SELECT COUNT(*) FROM _dias_alterados WHERE tabela = ?", (tabela,)
+                ).fetchone()[0]
+                if not dias:
+                    continue
                 
-                if valor_comissao > 0 or salario_fixo > 0:
-                    self.log(f"  💵 {profissional}: Vendas R$ {total_vendas:,.2f} | "
-                           f"Comissão ({percentual}%) R$ {valor_comissao:,.2f} | "
-                           f"Fixo R$ {salario_fixo:,.2f} | Total R$ {total_pagar:,.2f}")
-                    
-                    total_comissoes += total_pagar
-                    
-                    # Preparar despesa de comissão
-                    despesas_comissao.append({
-                        'data': data_fim,
-                        'categoria': 'Folha de Pagamento',
-                        'descricao': f'Salário + Comissão - {profissional}',
-                        'valor': total_pagar,
-                        'forma_pagamento': 'Transferência',
-                        'fornecedor': profissional,
-                        'observacoes': f'Vendas: R$ {total_vendas:,.2f} | Comissão {percentual}%: R$ {valor_comissao:,.2f} | Fixo: R$ {salario_fixo:,.2f}',
-                        'tipo_despesa': 'Comissão Calculada'
-                    })
-            
-            # Inserir despesas de comissão
-            if despesas_comissao:
-                df_despesas = pd.DataFrame(despesas_comissao)
-                df_despesas.to_sql('despesas', self.conn, if_exists='append', index=False)
-                self.log(f"✅ {len(despesas_comissao)} comissões registradas como despesas. Total: R$ {total_comissoes:,.2f}", "SUCCESS")
-            
-            return len(despesas_comissao)
+                codigos = [f"{coluna}_id" for coluna in self.DIMENSOES[tabela]]
+                cursor.execute(f"""
+                    DELETE FROM {resumo}
+                    WHERE dia IN (SELECT dia FROM _dias_alterados WHERE tabela = ?)
+                """, (tabela,))
+                # Datas gravadas como 'YYYY-MM-DD': igualdade direta, pelo índice por data
+                cursor.execute(f"""
+                    INSERT INTO {resumo} (dia, {', '.join(codigos)}, qtd, total)
+                    SELECT f.data, {', '.join(f'f.{codigo}' for codigo in codigos)},
+                           COUNT(*), SUM(f.{self.COLUNA_VALOR[tabela]})
+                    FROM _dias_alterados d
+                    JOIN {self.TABELAS_FATO[tabela]} f ON f.data = d.dia
+                    WHERE d.tabela = ?
+                    GROUP BY f.data, {', '.join(f'f.{codigo}' for codigo in codigos)}
+                """, (tabela,))
+                cursor.execute("DELETE FROM _dias_alterados WHERE tabela = ?", (tabela,))
+                self.log(f"🧮 {resumo}: {dias} dias atualizados", "DEBUG")
+                qtd_dias += dias
+            
+            self.escritor.liberar_savepoint('resumos')
+            self.metricas.contar_linhas(entrada=qtd_dias)
+            return qtd_dias
             
         except Exception as e:
-            self.log(f"❌ Erro ao calcular comissões: {e}", "ERROR")
-            import traceback
-            self.log(traceback.format_exc(), "ERROR")
+            self.escritor.desfazer_savepoint('resumos')
+            self.log(f"❌ Erro ao atualizar os resumos diários: {e}", "ERROR", excecao=e)
             return 0
     
+    def recalcular_comissoes_alteradas(self):
+        """Recalcula só os buckets (profissional, período) do ledger afetados pelas
+        receitas alteradas nesta execução e atualiza as despesas correspondentes
+        
+        Um bucket é afetado quando o profissional teve receita inserida, alterada
+        ou removida num dia coberto por um período já presente no ledger (receitas
+        atrasadas ou corrigidas de meses anteriores). _receitas_alteradas só é
+        esvaziada depois que o recálculo foi gravado. Retorna a quantidade de
+        buckets recalculados, ou None se o recálculo falhou.
+        """
+        self.iniciar_etapa('comissoes')
+        try:
+            buckets = self.conn.execute("""
+                SELECT DISTINCT c.periodo_inicio, c.periodo_fim, a.profissional
+                FROM _receitas_alteradas a
+                JOIN comissoes_calculadas c
+                    ON a.dia BETWEEN c.periodo_inicio AND c.periodo_fim
+            """).fetchall()
+            if not buckets:
+                self.conn.execute("DELETE FROM _receitas_alteradas")
+                return 0
+            
+            self.log(f"🔁 Recalculando {len(buckets)} comissões afetadas por receitas alteradas")
+            self.escritor.abrir_savepoint('comissoes')
+            contagens = self.atualizar_comissoes(buckets)
+            self.escritor.liberar_savepoint('comissoes')
+            self.conn.execute("DELETE FROM _receitas_alteradas")
+            
+            self.log(f"✅ Comissões recalculadas: {contagens['inseridas']} novas, "
+                     f"{contagens['atualizadas']} atualizadas, {contagens['inalteradas']} inalteradas, "
+                     f"{contagens['removidas']} removidas", "SUCCESS")
+            return len(buckets)
+            
+        except Exception as e:
+            self.escritor.desfazer_savepoint('comissoes')
+            self.log(f"❌ Erro ao recalcular comissões: {e}", "ERROR", excecao=e)
+            return None
+    
+    def recalcular_comissoes_historico(self, data_inicio=None, data_fim=None, granularidade='mes'):
+        """Backfill: recalcula as comissões de todos os períodos de um intervalo de uma vez
+        
+        granularidade: 'mes', 'quinzena' (1-15 e 16-fim do mês) ou 'semana'
+        (segunda a domingo). Sem intervalo, usa da primeira à última receita.
+        Todos os períodos são calculados numa única agregação SQL e gravados
+        no mesmo savepoint. Retorna a quantidade de comissões do intervalo, ou
+        None se o recálculo falhou.
+        """
+        self.iniciar_etapa('comissoes')
+        try:
+            if not data_inicio or not data_fim:
+                primeira, ultima = self.conn.execute(
+                    "SELECT MIN(data), MAX(data) FROM fato_receitas"
+                ).fetchone()
+                if primeira is None:
+                    self.log("⚠️ Nenhuma receita encontrada para calcular comissões", "WARNING")
+                    return 0
+                data_inicio = data_inicio or primeira
+                data_fim = data_fim or ultima
+            
+            periodos = gerar_periodos(data_inicio, data_fim, granularidade)
+            self.log(f"💰 Recalculando comissões de {data_inicio} a {data_fim}: "
+                     f"{len(periodos)} períodos ({granularidade})")
+            
+            self.escritor.abrir_savepoint('comissoes')
+            contagens = self.atualizar_comissoes(periodos)
+            self.escritor.liberar_savepoint('comissoes')
+            
+            qtd, total = self.conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(total_pagar), 0)
+                FROM comissoes_calculadas
+                WHERE periodo_inicio >= ? AND periodo_fim <= ?
+            """, (periodos[0][0], periodos[-1][1])).fetchone() if periodos else (0, 0)
+            
+            self.log(f"✅ {qtd} comissões no ledger ({contagens['inseridas']} novas, "
+                     f"{contagens['atualizadas']} atualizadas, {contagens['inalteradas']} inalteradas, "
+                     f"{contagens['removidas']} removidas). Total: R$ {total:,.2f}", "SUCCESS")
+            return qtd
+            
+        except Exception as e:
+            self.escritor.desfazer_savepoint('comissoes')
+            self.log(f"❌ Erro ao recalcular comissões: {e}", "ERROR", excecao=e)
+            return None
+    
+    def atualizar_comissoes(self, periodos):
+        """Recalcula o ledger de comissões dos períodos informados e as despesas derivadas
+        
+        periodos: lista de (data_inicio, data_fim) em 'YYYY-MM-DD', ou de
+        (data_inicio, data_fim, profissional) para recalcular só o bucket daquele
+        profissional no período. Tudo é feito em SQL, de uma vez para todos os
+        períodos: agregação das receitas por
+        (profissional, período), upsert em comissoes_calculadas, remoção de linhas
+        que deixaram de existir (ou de períodos sobrepostos) e sincronização das
+        despesas 'Comissão Calculada'.
+        Retorna as contagens de linhas do ledger inseridas/atualizadas/inalteradas/removidas.
+        """
+        cursor = self.conn.cursor()
+        
+        cursor.execute("DROP TABLE IF EXISTS temp._periodos_comissao")
+        cursor.execute("""
+            CREATE TEMP TABLE _periodos_comissao (
+                periodo_inicio TEXT NOT NULL,
+                periodo_fim TEXT NOT NULL,
+                profissional TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (periodo_inicio, periodo_fim, profissional)
+            )
+        """)
+        # profissional '' = todos os profissionais do período
+        cursor.executemany(
+            "INSERT OR IGNORE INTO _periodos_comissao VALUES (?, ?, ?)",
+            [(periodo[0], periodo[1], periodo[2] if len(periodo) > 2 else '') for periodo in periodos]
+        )
+        
+        # Despesas de comissão gravadas pelo append antigo (sem ledger): os meses
+        # delas entram no recálculo e as linhas antigas são substituídas
+        legadas = cursor.execute("""
+            SELECT COUNT(*) FROM despesas
+            WHERE tipo_despesa = 'Comissão Calculada' AND comissao_id IS NULL
+        """).fetchone()[0]
+        if legadas:
+            cursor.execute("""
+                INSERT OR IGNORE INTO _periodos_comissao (periodo_inicio, periodo_fim)
+                SELECT DISTINCT date(data, 'start of month'), date(data)
+                FROM despesas
+                WHERE tipo_despesa = 'Comissão Calculada' AND comissao_id IS NULL
+                AND date(data) IS NOT NULL
+            """)
+            cursor.execute("""
+                DELETE FROM fato_despesas WHERE id IN (
+                    SELECT id FROM despesas
+                    WHERE tipo_despesa = 'Comissão Calculada' AND comissao_id IS NULL
+                )
+            """)
+            self.log(f"🧹 {legadas} despesas de comissão de execuções anteriores substituídas pelo ledger")
+        
+        # Bucket de um profissional já coberto pelo período inteiro: não somar duas vezes
+        cursor.execute("""
+            DELETE FROM _periodos_comissao
+            WHERE profissional <> '' AND EXISTS (
+                SELECT 1 FROM _periodos_comissao t
+                WHERE t.profissional = '' AND t.periodo_inicio = _periodos_comissao.periodo_inicio
+                AND t.periodo_fim = _periodos_comissao.periodo_fim
+            )
+        """)
+        
+        # Comissões calculadas agora (uma linha por profissional e período).
+        # Datas gravadas como 'YYYY-MM-DD': o BETWEEN é uma faixa do índice por data.
+        # Cada venda usa a versão do profissional vigente na data dela (join por
+        # intervalo no histórico); o fixo é o da versão vigente no fim do período.
+        cursor.execute("DROP TABLE IF EXISTS temp._comissoes_novas")
+        cursor.execute("""
+            CREATE TEMP TABLE _comissoes_novas AS
+            SELECT profissional, periodo_inicio, periodo_fim, total_vendas,
+                   percentual_comissao, valor_comissao, salario_fixo,
+                   valor_comissao + salario_fixo AS total_pagar
+            FROM (
+                SELECT
+                    p.nome AS profissional,
+                    pe.periodo_inicio,
+                    pe.periodo_fim,
+                    SUM(r.valor_servico) AS total_vendas,
+                    CASE WHEN MIN(h.id) = MAX(h.id) THEN COALESCE(MAX(h.percentual_comissao), 0)
+                         ELSE ROUND(SUM(CASE WHEN h.tipo_contrato = 'Percentual'
+                                             THEN r.valor_servico * COALESCE(h.percentual_comissao, 0)
+                                             ELSE 0 END) / SUM(r.valor_servico), 2)
+                         END AS percentual_comissao,
+                    SUM(CASE WHEN h.tipo_contrato = 'Percentual' AND COALESCE(h.percentual_comissao, 0) > 0
+                             THEN r.valor_servico * h.percentual_comissao / 100.0
+                             ELSE 0 END) AS valor_comissao,
+                    COALESCE((
+                        SELECT f.salario_fixo FROM profissionais_historico f
+                        WHERE f.nome_profissional = p.nome AND f.status = 'Ativo'
+                        AND f.valid_from <= pe.periodo_fim
+                        AND (f.valid_to IS NULL OR f.valid_to > pe.periodo_fim)
+                    ), MAX(h.salario_fixo), 0) AS salario_fixo
+                FROM _periodos_comissao pe
+                JOIN fato_receitas r
+                    ON r.data BETWEEN pe.periodo_inicio AND pe.periodo_fim
+                JOIN dim_profissional p
+                    ON p.id = r.profissional_id
+                    AND (pe.profissional = '' OR p.nome = pe.profissional)
+                JOIN profissionais_historico h
+                    ON h.nome_profissional = p.nome AND h.status = 'Ativo'
+                    AND r.data >= h.valid_from AND (h.valid_to IS NULL OR r.data < h.valid_to)
+                GROUP BY p.nome, pe.periodo_inicio, pe.periodo_fim
+            )
+            WHERE valor_comissao > 0 OR salario_fixo > 0
+        """)
+        
+        contagens = {'inseridas': 0, 'atualizadas': 0, 'inalteradas': 0, 'removidas': 0}
+        contagens['inseridas'] = cursor.execute("""
+            SELECT COUNT(*) FROM _comissoes_novas n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM comissoes_calculadas c
+                WHERE c.profissional = n.profissional
+                AND c.periodo_inicio = n.periodo_inicio AND c.periodo_fim = n.periodo_fim
+            )
+        """).fetchone()[0]
+        
+        # Linhas do ledger que não têm mais comissão, inclusive de períodos de outra
+        # granularidade que se sobrepõem aos recalculados (não pagar a mesma venda duas vezes)
+        cursor.execute("""
+            DELETE FROM comissoes_calculadas
+            WHERE EXISTS (
+                SELECT 1 FROM _periodos_comissao pe
+                WHERE comissoes_calculadas.periodo_inicio <= pe.periodo_fim
+                AND comissoes_calculadas.periodo_fim >= pe.periodo_inicio
+                AND (pe.profissional = '' OR pe.profissional = comissoes_calculadas.profissional)
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM _comissoes_novas n
+                WHERE n.profissional = comissoes_calculadas.profissional
+                AND n.periodo_inicio = comissoes_calculadas.periodo_inicio
+                AND n.periodo_fim = comissoes_calculadas.periodo_fim
+            )
+        """)
+        contagens['removidas'] = cursor.rowcount
+        
+        cursor.execute("""
+            INSERT INTO comissoes_calculadas (
+                profissional, periodo_inicio, periodo_fim, total_vendas, percentual_comissao,
+                valor_comissao, salario_fixo, total_pagar
+            )
+            SELECT profissional, periodo_inicio, periodo_fim, total_vendas, percentual_comissao,
+                   valor_comissao, salario_fixo, total_pagar
+            FROM _comissoes_novas WHERE true
+            ON CONFLICT (profissional, periodo_inicio, periodo_fim) DO UPDATE SET
+                total_vendas = excluded.total_vendas,
+                percentual_comissao = excluded.percentual_comissao,
+                valor_comissao = excluded.valor_comissao,
+                salario_fixo = excluded.salario_fixo,
+                total_pagar = excluded.total_pagar,
+                data_calculo = CURRENT_TIMESTAMP
+            WHERE total_vendas IS NOT excluded.total_vendas
+            OR percentual_comissao IS NOT excluded.percentual_comissao
+            OR valor_comissao IS NOT excluded.valor_comissao
+            OR salario_fixo IS NOT excluded.salario_fixo
+            OR total_pagar IS NOT excluded.total_pagar
+        """)
+        contagens['atualizadas'] = cursor.rowcount - contagens['inseridas']
+        contagens['inalteradas'] = cursor.execute(
+            "SELECT COUNT(*) FROM _comissoes_novas"
+        ).fetchone()[0] - contagens['inseridas'] - contagens['atualizadas']
+        
+        # Despesas derivadas do ledger (uma por linha de comissão)
+        cursor.execute("""
+            INSERT INTO fato_despesas (
+                data, categoria_id, descricao, valor, forma_pagamento_id, fornecedor,
+                observacoes, tipo_despesa_id, comissao_id
+            )
+            SELECT
+                c.periodo_fim,
+                :categoria,
+                'Salário + Comissão - ' || c.profissional,
+                c.total_pagar,
+                :forma_pagamento,
+                c.profissional,
+                printf('Vendas: R$ %.2f | Comissão %s%%: R$ %.2f | Fixo: R$ %.2f',
+                       c.total_vendas, c.percentual_comissao, c.valor_comissao, c.salario_fixo),
+                :tipo_despesa,
+                c.id
+            FROM comissoes_calculadas c
+            JOIN _periodos_comissao pe
+                ON c.periodo_inicio = pe.periodo_inicio AND c.periodo_fim = pe.periodo_fim
+                AND (pe.profissional = '' OR pe.profissional = c.profissional)
+            WHERE true
+            ON CONFLICT (comissao_id) DO UPDATE SET
+                data = excluded.data,
+                valor = excluded.valor,
+                observacoes = excluded.observacoes
+            WHERE data IS NOT excluded.data
+            OR valor IS NOT excluded.valor
+            OR observacoes IS NOT excluded.observacoes
+        """, {
+            'categoria': self.codigo_dimensao('dim_categoria', 'Folha de Pagamento'),
+            'forma_pagamento': self.codigo_dimensao('dim_forma_pagamento', 'Transferência'),
+            'tipo_despesa': self.codigo_dimensao('dim_tipo_despesa', 'Comissão Calculada'),
+        })
+        cursor.execute("""
+            DELETE FROM fato_despesas
+            WHERE comissao_id IS NOT NULL
+            AND comissao_id NOT IN (SELECT id FROM comissoes_calculadas)
+        """)
+        
+        cursor.execute("DROP TABLE temp._comissoes_novas")
+        cursor.execute("DROP TABLE temp._periodos_comissao")
+        self.metricas.contar_linhas(entrada=len(periodos),
+                                    saida=contagens['inseridas'] + contagens['atualizadas'])
+        return contagens
+    
     def gerar_relatorio_importacao(self):
         """Gera resumo dos dados importados"""
+        self.iniciar_etapa('relatorio')
         try:
             cursor = self.conn.cursor()
             
@@ -448,15 +2072,16 @@ class DataProcessor:
             print("="*60)
             
             # Total de receitas
-            cursor.execute("SELECT COUNT(*), SUM(valor_servico) FROM receitas")
+            cursor.execute("SELECT COUNT(*), SUM(valor_servico) FROM fato_receitas")
             qtd_receitas, total_receitas = cursor.fetchone()
             total_receitas = total_receitas or 0
             print(f"📊 Receitas: {qtd_receitas} registros | Total: R$ {total_receitas:,.2f}")
             
             # Total de despesas
-            cursor.execute("SELECT COUNT(*), SUM(valor) FROM despesas")
+            cursor.execute("SELECT COUNT(*), SUM(valor) FROM fato_despesas")
             qtd_despesas, total_despesas = cursor.fetchone()
             total_despesas = total_despesas or 0
+            self.metricas.contar_linhas(entrada=qtd_receitas + qtd_despesas)
             print(f"📊 Despesas: {qtd_despesas} registros | Total: R$ {total_despesas:,.2f}")
             
             # Despesas por tipo
@@ -496,68 +2121,257 @@ class DataProcessor:
             print("="*60 + "\n")
             
         except Exception as e:
-            self.log(f"❌ Erro ao gerar relatório: {e}", "ERROR")
+            self.log(f"❌ Erro ao gerar relatório: {e}", "ERROR", excecao=e)
     
-    def salvar_log(self, arquivo_log='logs/importacao.log'):
-        """Salva log de importação em arquivo"""
+    def registrar_execucao(self, resumo, parametros=None):
+        """Grava as métricas da execução em pipeline_runs/pipeline_stage_metrics
+        
+        Chamado depois do fim (ou da reversão) da transação da execução, para
+        que uma execução que falhou também fique registrada.
+        """
+        self.metricas.finalizar()
+        self.etapa = None
         try:
-            os.makedirs(os.path.dirname(arquivo_log), exist_ok=True)
-            with open(arquivo_log, 'a', encoding='utf-8') as f:
-                f.write("\n" + "="*60 + "\n")
-                f.write(f"IMPORTAÇÃO - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*60 + "\n")
-                for linha in self.log_importacao:
-                    f.write(linha + "\n")
-            print(f"📝 Log salvo em: {arquivo_log}")
+            linhas = sum(qtd or 0 for qtd in resumo['linhas'].values())
+            self.metricas.gravar(self.conn, self.run_id, resumo['sucesso'], self.qtd_erros,
+                                 linhas, parametros)
         except Exception as e:
-            print(f"⚠️ Não foi possível salvar log: {e}")
+            self.log(f"⚠️ Não foi possível gravar as métricas da execução: {e}", "WARNING", excecao=e)
+            return False
+        
+        self.log("⏱️ Tempo por etapa (pipeline_stage_metrics):")
+        for etapa, medicao in self.metricas.etapas.items():
+            linhas = f" | {medicao['linhas_saida']} linhas" if medicao['linhas_saida'] else ""
+            self.log(f"  - {etapa}: {medicao['tempo_s']:.2f}s (CPU {medicao['cpu_s']:.2f}s){linhas}",
+                     "INFO" if '.' not in etapa else "DEBUG")
+        
+        destino = self.metricas.salvar_perfis(self.run_id)
+        if destino:
+            self.log(f"🔬 Perfis (cProfile) por etapa salvos em: {destino}")
+        return True
     
     def fechar_conexao(self):
         """Fecha conexão com banco"""
         if self.conn:
-            self.conn.close()
+            self.escritor.fechar()
             self.log("✅ Conexão com banco fechada", "SUCCESS")
 
-def main():
-    """Função principal de processamento"""
-    print("\n🚀 DATAOPS LOCAL - PROCESSAMENTO DE DADOS v2.0")
-    print("="*60 + "\n")
+def gerar_periodos(data_inicio, data_fim, granularidade='mes'):
+    """Lista de (inicio, fim) em 'YYYY-MM-DD' dos períodos que cobrem o intervalo
     
-    # Inicializar processador
-    processor = DataProcessor()
+    Os períodos são sempre completos (o mês, a quinzena ou a semana inteira em
+    que caem data_inicio e data_fim), para casar com o ledger de comissões.
+    """
+    inicio = pd.Timestamp(data_inicio).normalize()
+    fim = pd.Timestamp(data_fim).normalize()
     
-    # Conectar ao banco
-    if not processor.conectar_banco():
-        sys.exit(1)
+    if granularidade == 'mes':
+        meses = pd.period_range(inicio, fim, freq='M')
+        inicios, fins = meses.start_time, meses.end_time.normalize()
+    elif granularidade == 'semana':
+        semanas = pd.period_range(inicio, fim, freq='W-SUN')
+        inicios, fins = semanas.start_time, semanas.end_time.normalize()
+    elif granularidade == 'quinzena':
+        meses = pd.period_range(inicio, fim, freq='M')
+        primeiras = meses.start_time
+        segundas = primeiras + pd.Timedelta(days=15)
+        inicios = primeiras.append(segundas).sort_values()
+        fins = pd.DatetimeIndex([*(segundas - pd.Timedelta(days=1)), *meses.end_time.normalize()]).sort_values()
+        manter = (fins >= inicio) & (inicios <= fim)
+        inicios, fins = inicios[manter], fins[manter]
+    else:
+        raise ValueError(f"Granularidade inválida: {granularidade} (use mes, quinzena ou semana)")
     
-    # Criar tabelas
-    if not processor.criar_tabelas():
-        sys.exit(1)
+    return list(zip(inicios.strftime('%Y-%m-%d'), fins.strftime('%Y-%m-%d')))
+
+def _preparar_planilha_em_processo(tipo_dados, arquivo_excel, tamanho_lote=None,
+                                   db_path='dados/dataops.db', usar_cache=True, verbosidade='INFO',
+                                   run_id=None, dir_perfil=None, rastrear_memoria=False):
+    """Executado no pool de processos: lê e valida a planilha, sem banco
     
-    # Processar arquivos
-    print("\n📂 Processando arquivos Excel...\n")
+    Retorna os lotes, as mensagens do log e as métricas das subetapas
+    (leitura, preparação...), que o processo principal soma às da execução.
+    """
+    # Só terminal: o arquivo de log é escrito pelo processo principal
+    configurar_log(arquivo_log=None, verbosidade=verbosidade)
+    processor = DataProcessor(db_path=db_path, usar_cache=usar_cache,
+                              metricas=MetricasExecucao(dir_perfil, rastrear_memoria))
+    processor.iniciar_etapa(tipo_dados)
+    lotes = processor.preparar_planilha(tipo_dados, arquivo_excel, tamanho_lote)
+    processor.metricas.finalizar()
+    processor.metricas.salvar_perfis(run_id or processor.run_id, prefixo='processo_')
+    return lotes, list(processor.log_importacao), processor.metricas.etapas
+
+def executar_processamento(raiz='.', force=False, tamanho_lote=None, usar_cache=True,
+                           paralelo=False, max_processos=None, tipos=None, backfill=False,
+                           inicio=None, fim=None, granularidade='mes', verbosidade='INFO',
+                           perfil=False, rastrear_memoria=False):
+    """Executa o pipeline completo de um projeto (1-coleta/ → dados/dataops.db)
     
-    base_path = '1-coleta/'
+    raiz: pasta do projeto (contém 1-coleta/, dados/ e logs/). Usado pelo
+    main, pelo modo --watch e pelo processamento em lote de vários clientes.
+    tipos: processa só essas planilhas (padrão: todas). backfill: recalcula
+    as comissões de todos os períodos de inicio a fim (padrão: todo o
+    histórico) na granularidade informada, em vez do mês atual. verbosidade:
+    nível mínimo das mensagens no terminal (o arquivo de log recebe todas).
+    perfil: salva um cProfile por etapa em logs/perfil/<run_id>/.
+    rastrear_memoria: mede o pico de alocação Python por etapa (tracemalloc).
+    Retorna um resumo com sucesso, linhas importadas por planilha e quantidade de erros.
+    """
+    resumo = {'sucesso': False, 'linhas': {}, 'erros': 0}
     
-    # Processar cada tipo de arquivo
-    processor.processar_profissionais(f'{base_path}Template_Profissionais.xlsx')
-    processor.processar_servicos(f'{base_path}Template_Servicos.xlsx')
-    processor.processar_receitas(f'{base_path}Template_Receitas.xlsx')
-    processor.processar_despesas(f'{base_path}Template_Despesas.xlsx')
+    # Log estruturado da execução (logs/importacao.jsonl), escrito em segundo plano
+    arquivo_log = os.path.normpath(os.path.join(raiz, ARQUIVO_LOG))
+    configurar_log(arquivo_log, verbosidade)
     
-    # Calcular comissões do período (NOVO)
-    print("\n" + "="*60)
-    processor.calcular_comissoes_periodo()
-    print("="*60)
+    # Inicializar processador (com as métricas de cada etapa)
+    metricas = MetricasExecucao(
+        dir_perfil=os.path.normpath(os.path.join(raiz, 'logs', 'perfil')) if perfil else None,
+        rastrear_memoria=rastrear_memoria
+    )
+    processor = DataProcessor(db_path=os.path.normpath(os.path.join(raiz, 'dados', 'dataops.db')),
+                              force=force, usar_cache=usar_cache, metricas=metricas)
+    parametros = {
+        'force': force, 'tamanho_lote': tamanho_lote, 'usar_cache': usar_cache, 'paralelo': paralelo,
+        'tipos': tipos, 'backfill': backfill, 'perfil': perfil, 'rastrear_memoria': rastrear_memoria,
+    }
+    
+    # Conectar ao banco
+    if not processor.conectar_banco():
+        resumo['erros'] = 1
+        encerrar_log()
+        return resumo
+    
+    try:
+        # Uma única transação para toda a execução (savepoint por planilha)
+        processor.escritor.iniciar_execucao()
+        
+        # Criar tabelas
+        if not processor.criar_tabelas():
+            resumo['erros'] = 1
+            return resumo
+        
+        # Processar arquivos
+        print("\n📂 Processando arquivos de entrada...\n")
+        
+        base_path = os.path.normpath(os.path.join(raiz, '1-coleta'))
+        
+        arquivos = {tipo: localizar_arquivo(base_path, tipo, planilha['arquivo'])
+                    for tipo, planilha in PLANILHAS.items()
+                    if tipos is None or tipo in tipos}
+        
+        # Processar cada tipo de arquivo
+        if paralelo:
+            resumo['linhas'] = processor.processar_em_paralelo(
+                arquivos, tamanho_lote=tamanho_lote, max_processos=max_processos
+            )
+        else:
+            for tipo_dados, arquivo_excel in arquivos.items():
+                resumo['linhas'][tipo_dados] = processor.processar_planilha(
+                    tipo_dados, arquivo_excel, tamanho_lote=tamanho_lote
+                )
+        
+        # Calcular comissões do período (NOVO) - só dependem de receitas e profissionais.
+        # Se o cálculo falhar a execução inteira é desfeita: as planilhas não entram
+        # no manifesto e são reprocessadas na próxima execução
+        if backfill:
+            print("\n" + "="*60)
+            comissoes_ok = processor.recalcular_comissoes_historico(inicio, fim, granularidade) is not None
+            print("="*60)
+        elif tipos is None or {'receitas', 'profissionais'} & set(tipos):
+            print("\n" + "="*60)
+            comissoes_ok = (processor.recalcular_comissoes_alteradas() is not None
+                            and processor.calcular_comissoes_periodo() is not None)
+            print("="*60)
+        else:
+            comissoes_ok = True
+        if not comissoes_ok:
+            return resumo
+        
+        # Resumos diários dos dias alterados (receitas, despesas e comissões)
+        processor.iniciar_etapa('resumos')
+        processor.atualizar_resumos_diarios()
+        
+        # Estatísticas do planejador (ANALYZE) das tabelas que receberam carga
+        processor.iniciar_etapa('estatisticas')
+        carregadas = [tipo for tipo, qtd in resumo['linhas'].items() if qtd]
+        if {'receitas', 'profissionais'} & set(carregadas) or backfill:
+            carregadas += ['despesas', 'comissoes_calculadas']
+        if 'profissionais' in carregadas:
+            carregadas.append('profissionais_historico')
+        processor.atualizar_estatisticas(list(dict.fromkeys(carregadas)))
+        
+        # Confirmar a transação da execução
+        processor.escritor.finalizar_execucao()
+        
+        # Gerar relatório
+        processor.gerar_relatorio_importacao()
+        
+        resumo['sucesso'] = True
+        return resumo
+    finally:
+        # Desfaz a execução se não foi finalizada e registra as métricas (inclusive de falhas)
+        processor.escritor.abortar_execucao()
+        processor.registrar_execucao(resumo, parametros)
+        
+        # Fechar conexão
+        processor.fechar_conexao()
+        resumo['erros'] = processor.qtd_erros
+        
+        # Gravar o que ainda está na fila do log
+        encerrar_log()
+        print(f"📝 Log salvo em: {arquivo_log}")
+
+def main(argv=None):
+    """Função principal de processamento"""
+    parser = argparse.ArgumentParser(description="DataOps Local - Processamento de Dados")
+    parser.add_argument('--force', action='store_true',
+                        help="Reprocessa todas as planilhas, ignorando o manifesto de ingestão")
+    parser.add_argument('--tamanho-lote', type=int, default=None, metavar='N',
+                        help="Lê receitas e despesas em lotes de N linhas (memória constante em planilhas grandes)")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Não usa o cache de planilhas já lidas (dados/cache/)")
+    parser.add_argument('--paralelo', action='store_true',
+                        help="Lê as planilhas em paralelo (um processo por planilha) com um único gravador")
+    parser.add_argument('--processos', type=int, default=None, metavar='N',
+                        help="Número máximo de processos no modo --paralelo (padrão: nº de CPUs)")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Recalcula as comissões de todos os períodos (do histórico ou de --inicio a --fim)")
+    parser.add_argument('--inicio', default=None, metavar='AAAA-MM-DD',
+                        help="Início do intervalo do --backfill (padrão: primeira receita)")
+    parser.add_argument('--fim', default=None, metavar='AAAA-MM-DD',
+                        help="Fim do intervalo do --backfill (padrão: última receita)")
+    parser.add_argument('--granularidade', choices=['mes', 'quinzena', 'semana'], default='mes',
+                        help="Períodos de comissão do --backfill (padrão: mes)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Fica observando 1-coleta/ e reprocessa cada planilha assim que ela é salva")
+    parser.add_argument('--intervalo', type=float, default=1.0, metavar='SEG',
+                        help="Intervalo entre verificações no modo --watch (padrão: 1s)")
+    parser.add_argument('--verbosidade', choices=list(NIVEIS), default='INFO',
+                        help="Mensagens exibidas no terminal a partir deste nível (o arquivo de log recebe todas)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Salva um perfil do cProfile por etapa em logs/perfil/<run_id>/")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Mede o pico de memória alocada pelo Python em cada etapa (mais lento)")
+    args = parser.parse_args(argv)
     
-    # Gerar relatório
-    processor.gerar_relatorio_importacao()
+    print("\n🚀 DATAOPS LOCAL - PROCESSAMENTO DE DADOS v2.0")
+    print("="*60 + "\n")
     
-    # Salvar log
-    processor.salvar_log()
+    if args.watch:
+        from observar_coleta import observar_coleta
+        observar_coleta(intervalo=args.intervalo, force=args.force, tamanho_lote=args.tamanho_lote,
+                        usar_cache=not args.sem_cache, verbosidade=args.verbosidade)
+        return
     
-    # Fechar conexão
-    processor.fechar_conexao()
+    resumo = executar_processamento(force=args.force, tamanho_lote=args.tamanho_lote,
+                                    usar_cache=not args.sem_cache, paralelo=args.paralelo,
+                                    max_processos=args.processos, backfill=args.backfill,
+                                    inicio=args.inicio, fim=args.fim,
+                                    granularidade=args.granularidade, verbosidade=args.verbosidade,
+                                    perfil=args.profile, rastrear_memoria=args.tracemalloc)
+    if not resumo['sucesso']:
+        sys.exit(1)
     
     print("\n✅ Processamento concluído com sucesso!")
     print("="*60 + "\n")
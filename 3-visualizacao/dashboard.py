@@ -11,6 +11,7 @@ MELHORIAS NESTA VERSÃO:
 - ✅ Análise detalhada por forma de pagamento
 - ✅ Indicadores de margem e lucratividade
 - ✅ Alertas visuais para despesas sem categoria
+- ✅ Comissão pelo percentual vigente na data de cada venda (histórico de profissionais)
 """
 
 import streamlit as st
@@ -20,35 +21,7 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import sqlite3
 
-# Função para formatar valores em Real brasileiro
-def formatar_real(valor):
-    """Formata valor para moeda brasileira (R$ 1.234,56)"""
-    if pd.isna(valor) or valor is None:
-        return "R$ 0,00"
-    try:
-        return f"R$ {float(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "R$ 0,00"
-
-def formatar_real_compacto(valor):
-    """Formata valor de forma compacta para métricas (77,2 mil)"""
-    if pd.isna(valor) or valor is None:
-        return "R$ 0"
-    
-    try:
-        valor = float(valor)
-        
-        # Milhões
-        if abs(valor) >= 1000000:
-            return f"R$ {valor/1000000:.1f}M".replace(".", ",")
-        # Milhares
-        elif abs(valor) >= 1000:
-            return f"R$ {valor/1000:.1f}k".replace(".", ",")
-        # Centenas
-        else:
-            return f"R$ {valor:.0f}"
-    except:
-        return "R$ 0"
+from formatacao import formatar_real, formatar_real_compacto, formatar_real_coluna
 
 # Configuração da página
 st.set_page_config(
@@ -63,57 +36,352 @@ st.set_page_config(
 def get_database_connection():
     return sqlite3.connect('dados/dataops.db', check_same_thread=False)
 
-# Função para carregar dados
-@st.cache_data(ttl=60)
-def carregar_receitas():
+# Entradas guardadas por função em cache: versões antigas dos dados nunca
+# mais são pedidas e saem primeiro
+MAX_ENTRADAS_CACHE = 32
+
+def versao_dados():
+    """Token que muda sempre que outra conexão grava no banco
+    
+    PRAGMA data_version da conexão do dashboard muda a cada COMMIT de outra
+    conexão (importação, atualizar_banco.py) e não custa uma consulta às
+    tabelas. O id da conexão separa os valores de uma conexão recriada.
+    Os carregadores recebem o token como argumento: o cache vale até os
+    dados mudarem e uma importação aparece já na próxima interação.
+    """
     conn = get_database_connection()
-    query = """
-        SELECT 
-            data,
-            tipo_servico,
-            profissional,
-            cliente,
-            valor_servico,
-            forma_pagamento
-        FROM receitas
-        ORDER BY data DESC
+    return id(conn), conn.execute("PRAGMA data_version").fetchone()[0]
+
+# Colunas gravadas como código de uma tabela de dimensão (id, nome)
+DIMENSOES_RECEITAS = {
+    'tipo_servico': 'dim_servico',
+    'profissional': 'dim_profissional',
+    'forma_pagamento': 'dim_forma_pagamento',
+}
+DIMENSOES_DESPESAS = {
+    'categoria': 'dim_categoria',
+    'forma_pagamento': 'dim_forma_pagamento',
+    'tipo_despesa': 'dim_tipo_despesa',
+}
+
+def decodificar_dimensoes(df, dimensoes, conn):
+    """Troca as colunas <coluna>_id por Categoricals com os nomes das dimensões
+    
+    Os códigos do banco viram diretamente os códigos do Categorical: os nomes
+    não são lidos linha a linha e os agrupamentos trabalham com inteiros.
     """
-    df = pd.read_sql_query(query, conn)
-    df['data'] = pd.to_datetime(df['data'], format='mixed', errors='coerce')
+    for coluna, dimensao in dimensoes.items():
+        nomes = pd.read_sql_query(f"SELECT id, nome FROM {dimensao} ORDER BY nome", conn)
+        posicoes = pd.Index(nomes['id']).get_indexer(df[f"{coluna}_id"])
+        df[f"{coluna}_id"] = pd.Categorical.from_codes(posicoes, categories=pd.Index(nomes['nome']))
+    return df.rename(columns={f"{coluna}_id": coluna for coluna in dimensoes})
+
+def filtro_sql(data_inicio=None, filtros=None, dimensoes=None, coluna_data='data'):
+    """Monta o WHERE parametrizado dos filtros da barra lateral
+    
+    data_inicio: 'AAAA-MM-DD' inclusivo. filtros: {coluna: nome ou lista de
+    nomes}; filtros com valor None são ignorados. Colunas de `dimensoes` são
+    filtradas pelo código (<coluna>_id), que é o que os índices cobrem.
+    Retorna (cláusula WHERE, parâmetros).
+    """
+    condicoes, parametros = [], []
+    if data_inicio:
+        condicoes.append(f"{coluna_data} >= ?")
+        parametros.append(data_inicio)
+    for coluna, valores in (filtros or {}).items():
+        if valores is None:
+            continue
+        valores = [valores] if isinstance(valores, str) else list(valores)
+        marcadores = ', '.join('?' * len(valores))
+        if dimensoes and coluna in dimensoes:
+            condicoes.append(f"{coluna}_id IN (SELECT id FROM {dimensoes[coluna]} WHERE nome IN ({marcadores}))")
+        else:
+            condicoes.append(f"{coluna} IN ({marcadores})")
+        parametros += valores
+    return ("WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+# Funções para carregar dados: os filtros vão para o SQL e cada combinação
+# de filtros (e versão dos dados, ver versao_dados) tem a sua entrada no cache
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_receitas(versao, data_inicio=None, profissional=None):
+    """Receitas a partir de data_inicio, de um profissional (None = todos)"""
+    conn = get_database_connection()
+    filtros = {'profissional': profissional}
+    try:
+        where, parametros = filtro_sql(data_inicio, filtros, DIMENSOES_RECEITAS)
+        query = f"""
+            SELECT 
+                data,
+                tipo_servico_id,
+                profissional_id,
+                cliente,
+                valor_servico,
+                forma_pagamento_id
+            FROM fato_receitas
+            {where}
+            ORDER BY data DESC
+        """
+        df = decodificar_dimensoes(pd.read_sql_query(query, conn, params=parametros), DIMENSOES_RECEITAS, conn)
+    except pd.errors.DatabaseError:
+        # Banco anterior às tabelas de dimensão: nomes gravados como texto
+        where, parametros = filtro_sql(data_inicio, filtros)
+        query = f"""
+            SELECT data, tipo_servico, profissional, cliente, valor_servico, forma_pagamento
+            FROM receitas
+            {where}
+            ORDER BY data DESC
+        """
+        df = pd.read_sql_query(query, conn, params=parametros).astype(
+            {coluna: 'category' for coluna in DIMENSOES_RECEITAS}
+        )
+    # Datas gravadas como 'YYYY-MM-DD' pelo processamento: conversão direta, sem detectar formato
+    df['data'] = pd.to_datetime(df['data'], format='ISO8601', errors='coerce')
     return df
 
-@st.cache_data(ttl=60)
-def carregar_despesas():
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_despesas(versao, data_inicio=None, tipos_despesa=None):
+    """Despesas a partir de data_inicio, dos tipos informados (None = todos)"""
     conn = get_database_connection()
-    query = """
-        SELECT 
-            data,
-            categoria,
-            descricao,
-            valor,
-            forma_pagamento,
-            fornecedor,
-            tipo_despesa,
-            observacoes
-        FROM despesas
-        ORDER BY data DESC
-    """
-    df = pd.read_sql_query(query, conn)
-    df['data'] = pd.to_datetime(df['data'], format='mixed', errors='coerce')
+    filtros = {'tipo_despesa': tipos_despesa}
+    try:
+        where, parametros = filtro_sql(data_inicio, filtros, DIMENSOES_DESPESAS)
+        query = f"""
+            SELECT 
+                data,
+                categoria_id,
+                descricao,
+                valor,
+                forma_pagamento_id,
+                fornecedor,
+                tipo_despesa_id,
+                observacoes
+            FROM fato_despesas
+            {where}
+            ORDER BY data DESC
+        """
+        df = decodificar_dimensoes(pd.read_sql_query(query, conn, params=parametros), DIMENSOES_DESPESAS, conn)
+    except pd.errors.DatabaseError:
+        # Banco anterior às tabelas de dimensão: nomes gravados como texto
+        where, parametros = filtro_sql(data_inicio, filtros)
+        query = f"""
+            SELECT data, categoria, descricao, valor, forma_pagamento, fornecedor,
+                   tipo_despesa, observacoes
+            FROM despesas
+            {where}
+            ORDER BY data DESC
+        """
+        df = pd.read_sql_query(query, conn, params=parametros).astype(
+            {coluna: 'category' for coluna in DIMENSOES_DESPESAS}
+        )
+    df['data'] = pd.to_datetime(df['data'], format='ISO8601', errors='coerce')
     return df
 
-@st.cache_data(ttl=60)
-def carregar_profissionais():
+def agregar_por_dia(df, colunas, coluna_valor):
+    """Soma e quantidade por dia e pelas colunas informadas (mesmo formato dos resumos diários)"""
+    return (
+        df.groupby(['data'] + colunas, observed=True, dropna=False)[coluna_valor]
+        .agg(qtd='size', total='sum')
+        .reset_index()
+        .rename(columns={'total': coluna_valor})
+    )
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_receitas_por_dia(versao, data_inicio=None, profissional=None):
+    """Resumo diário de receitas (dia x profissional x serviço x forma de pagamento)
+    
+    Mantido pelo processamento a cada carga: os gráficos e indicadores agregam
+    algumas linhas por dia em vez de todas as vendas.
+    """
+    conn = get_database_connection()
+    try:
+        where, parametros = filtro_sql(data_inicio, {'profissional': profissional},
+                                       DIMENSOES_RECEITAS, coluna_data='dia')
+        query = f"""
+            SELECT dia AS data, tipo_servico_id, profissional_id, forma_pagamento_id,
+                   qtd, total AS valor_servico
+            FROM receitas_por_dia
+            {where}
+        """
+        df = decodificar_dimensoes(pd.read_sql_query(query, conn, params=parametros), DIMENSOES_RECEITAS, conn)
+        df['data'] = pd.to_datetime(df['data'], format='ISO8601', errors='coerce')
+        return df
+    except pd.errors.DatabaseError:
+        # Banco anterior aos resumos diários: agrega as receitas aqui
+        return agregar_por_dia(carregar_receitas(versao, data_inicio, profissional),
+                               list(DIMENSOES_RECEITAS), 'valor_servico')
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_despesas_por_dia(versao, data_inicio=None, tipos_despesa=None):
+    """Resumo diário de despesas (dia x categoria x tipo x forma de pagamento)"""
+    conn = get_database_connection()
+    try:
+        where, parametros = filtro_sql(data_inicio, {'tipo_despesa': tipos_despesa},
+                                       DIMENSOES_DESPESAS, coluna_data='dia')
+        query = f"""
+            SELECT dia AS data, categoria_id, tipo_despesa_id, forma_pagamento_id,
+                   qtd, total AS valor
+            FROM despesas_por_dia
+            {where}
+        """
+        df = decodificar_dimensoes(pd.read_sql_query(query, conn, params=parametros), DIMENSOES_DESPESAS, conn)
+        df['data'] = pd.to_datetime(df['data'], format='ISO8601', errors='coerce')
+        return df
+    except pd.errors.DatabaseError:
+        # Banco anterior aos resumos diários: agrega as despesas aqui
+        return agregar_por_dia(carregar_despesas(versao, data_inicio, tipos_despesa),
+                               list(DIMENSOES_DESPESAS), 'valor')
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def contar_registros(versao):
+    """Quantidade total de receitas e despesas no banco (sem carregar as linhas)"""
+    conn = get_database_connection()
+    return conn.execute(
+        "SELECT (SELECT COUNT(*) FROM receitas), (SELECT COUNT(*) FROM despesas)"
+    ).fetchone()
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_nomes_profissionais(versao):
+    """Profissionais com receitas (opções do filtro)"""
+    conn = get_database_connection()
+    try:
+        query = """
+            SELECT nome FROM dim_profissional
+            WHERE id IN (SELECT profissional_id FROM receitas_por_dia)
+            ORDER BY nome
+        """
+        return pd.read_sql_query(query, conn)['nome'].tolist()
+    except pd.errors.DatabaseError:
+        # Banco anterior aos resumos diários
+        query = "SELECT DISTINCT profissional FROM receitas WHERE profissional IS NOT NULL ORDER BY profissional"
+        return pd.read_sql_query(query, conn)['profissional'].tolist()
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_profissionais(versao):
     conn = get_database_connection()
     query = "SELECT * FROM profissionais WHERE status = 'Ativo'"
     return pd.read_sql_query(query, conn)
 
-@st.cache_data(ttl=60)
-def carregar_servicos():
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_historico_profissionais(versao):
+    """Versões do cadastro de profissionais com o período de vigência de cada uma"""
+    conn = get_database_connection()
+    try:
+        query = """
+            SELECT nome_profissional, tipo_contrato, percentual_comissao, status,
+                   valid_from, valid_to
+            FROM profissionais_historico
+        """
+        df = pd.read_sql_query(query, conn)
+    except pd.errors.DatabaseError:
+        # Banco anterior ao histórico: o cadastro atual vale para todo o período
+        query = """
+            SELECT nome_profissional, tipo_contrato, percentual_comissao, status,
+                   '1900-01-01' AS valid_from, NULL AS valid_to
+            FROM profissionais
+        """
+        df = pd.read_sql_query(query, conn)
+    df['valid_from'] = pd.to_datetime(df['valid_from'], format='ISO8601', errors='coerce')
+    df['valid_to'] = pd.to_datetime(df['valid_to'], format='ISO8601', errors='coerce')
+    return df.sort_values('valid_from')
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def carregar_servicos(versao):
     conn = get_database_connection()
     query = "SELECT * FROM servicos WHERE status = 'Ativo'"
     return pd.read_sql_query(query, conn)
 
+def agregar_conjuntos(df, conjuntos, agregacoes):
+    """Aplica as mesmas agregações a cada conjunto de colunas (como GROUPING SETS)
+
+    conjuntos: {nome: coluna ou lista de colunas}. Retorna {nome: DataFrame}.
+    """
+    return {
+        nome: df.groupby(chaves, observed=True).agg(**agregacoes).reset_index()
+        for nome, chaves in conjuntos.items()
+    }
+
+def calcular_comissoes(resumo_receitas, df_historico_prof):
+    """Comissão de cada profissional com o percentual vigente em cada dia de venda
+
+    As-of join das vendas com o histórico de profissionais. Retorna uma
+    Series indexada pelo profissional.
+    """
+    if len(resumo_receitas) == 0:
+        return pd.Series(dtype=float)
+    # Chaves do as-of join com o mesmo tipo (profissional é Categorical)
+    historico_vendas = df_historico_prof[
+        df_historico_prof['nome_profissional'].isin(resumo_receitas['profissional'].cat.categories)
+    ].astype({
+        'valid_from': resumo_receitas['data'].dtype,
+        'nome_profissional': resumo_receitas['profissional'].dtype,
+    })
+    vendas = pd.merge_asof(
+        resumo_receitas.dropna(subset=['data']).sort_values('data'),
+        historico_vendas,
+        left_on='data',
+        right_on='valid_from',
+        left_by='profissional',
+        right_by='nome_profissional',
+        direction='backward'
+    )
+    vigente = (
+        (vendas['valid_to'].isna() | (vendas['data'] < vendas['valid_to']))
+        & (vendas['status'] == 'Ativo')
+        & (vendas['tipo_contrato'] == 'Percentual')
+    )
+    vendas['comissao'] = vendas['valor_servico'] * vendas['percentual_comissao'].where(vigente, 0).fillna(0) / 100
+    return vendas.groupby('profissional', observed=True)['comissao'].sum()
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE)
+def calcular_agregados(versao, data_inicio=None, profissional=None, tipos_despesa=None):
+    """Todos os totais e agrupamentos do dashboard, calculados em uma única etapa
+
+    O resumo diário já é o cubo no grão mais fino (dia x dimensões); cada
+    agrupamento é uma soma sobre ele. O resultado tem poucas linhas e fica em
+    cache por versão dos dados e filtros: gráficos, indicadores e tabelas só
+    leem daqui, e uma nova interação na página não refaz nenhum groupby.
+    """
+    resumo_receitas = carregar_receitas_por_dia(versao, data_inicio, profissional)
+    resumo_despesas = carregar_despesas_por_dia(versao, data_inicio, tipos_despesa)
+
+    receitas = agregar_conjuntos(resumo_receitas, {
+        'profissional': 'profissional',
+        'tipo_servico': 'tipo_servico',
+        'forma_pagamento': 'forma_pagamento',
+        'dia': 'data',
+    }, {'valor_servico': ('valor_servico', 'sum'), 'qtd': ('qtd', 'sum')})
+    despesas = agregar_conjuntos(resumo_despesas, {
+        'categoria': 'categoria',
+        'tipo_despesa': 'tipo_despesa',
+        'forma_pagamento': 'forma_pagamento',
+        'dia': 'data',
+    }, {'valor': ('valor', 'sum'), 'qtd': ('qtd', 'sum')})
+    receitas['dia']['data'] = receitas['dia']['data'].dt.date
+    despesas['dia']['data'] = despesas['dia']['data'].dt.date
+
+    # Fluxo de caixa: receitas e despesas de cada dia
+    fluxo = pd.merge(
+        receitas['dia'][['data', 'valor_servico']].rename(columns={'valor_servico': 'receitas'}),
+        despesas['dia'][['data', 'valor']].rename(columns={'valor': 'despesas'}),
+        on='data', how='outer'
+    ).fillna(0)
+    fluxo['saldo_dia'] = fluxo['receitas'] - fluxo['despesas']
+    fluxo['saldo_acumulado'] = fluxo['saldo_dia'].cumsum()
+
+    datas = pd.concat([resumo_receitas['data'], resumo_despesas['data']])
+    return {
+        'total_receitas': resumo_receitas['valor_servico'].sum(),
+        'qtd_servicos': int(resumo_receitas['qtd'].sum()),
+        'total_despesas': resumo_despesas['valor'].sum(),
+        'qtd_despesas': int(resumo_despesas['qtd'].sum()),
+        'data_min': datas.min(),
+        'data_max': datas.max(),
+        'receitas': receitas,
+        'despesas': despesas,
+        'comissoes': calcular_comissoes(resumo_receitas, carregar_historico_profissionais(versao)),
+        'fluxo': fluxo.sort_values('data'),
+    }
+
 # Título principal
 st.title("📊 DataOps Local - Dashboard Gerencial")
 st.markdown("### - Com Análise de Comissões")
@@ -122,22 +390,6 @@ st.markdown("---")
 # Sidebar - Filtros
 st.sidebar.header("🔍 Filtros")
 
-# Carregar dados
-try:
-    df_receitas = carregar_receitas()
-    df_despesas = carregar_despesas()
-    df_profissionais = carregar_profissionais()
-    df_servicos = carregar_servicos()
-except Exception as e:
-    st.error(f"❌ Erro ao carregar dados: {e}")
-    st.info("💡 Execute primeiro o script de processamento: python 2-processamento/processar_dados.py")
-    st.stop()
-
-# Verificar se há dados
-if len(df_receitas) == 0 and len(df_despesas) == 0:
-    st.warning("⚠️ Nenhum dado encontrado no banco. Importe os dados primeiro!")
-    st.stop()
-
 # Filtro de período
 periodo_opcoes = {
     "Últimos 7 dias": 7,
@@ -147,34 +399,28 @@ periodo_opcoes = {
     "Tudo": None
 }
 periodo_selecionado = st.sidebar.selectbox("📅 Período", list(periodo_opcoes.keys()), index=2)
+faixa_datas = st.sidebar.empty()
 
-# Aplicar filtro de período
+# Data inicial do período ('AAAA-MM-DD', inclusiva): vai para o SQL e para a chave do cache
 if periodo_opcoes[periodo_selecionado]:
-    data_limite = datetime.now() - timedelta(days=periodo_opcoes[periodo_selecionado])
-    df_receitas_filtrado = df_receitas[df_receitas['data'] >= data_limite]
-    df_despesas_filtrado = df_despesas[df_despesas['data'] >= data_limite]
+    data_inicio = (datetime.now() - timedelta(days=periodo_opcoes[periodo_selecionado])).strftime('%Y-%m-%d')
 else:
-    df_receitas_filtrado = df_receitas
-    df_despesas_filtrado = df_despesas
+    data_inicio = None
 
-# Mostrar range de datas
-if len(df_receitas_filtrado) > 0 or len(df_despesas_filtrado) > 0:
-    datas_todas = pd.concat([df_receitas_filtrado['data'], df_despesas_filtrado['data']])
-    data_min = datas_todas.min()
-    data_max = datas_todas.max()
-    st.sidebar.info(f"📆 {data_min.strftime('%d/%m/%Y')} até {data_max.strftime('%d/%m/%Y')}")
+# Versão dos dados: depois de uma importação os carregadores consultam o banco de novo
+versao = versao_dados()
 
 # Filtro de profissional
-profissionais_lista = ['Todos'] + sorted(df_receitas['profissional'].unique().tolist())
+try:
+    profissionais_lista = ['Todos'] + carregar_nomes_profissionais(versao)
+except Exception:
+    profissionais_lista = ['Todos']
 profissional_selecionado = st.sidebar.selectbox("👤 Profissional", profissionais_lista)
-
-if profissional_selecionado != 'Todos':
-    df_receitas_filtrado = df_receitas_filtrado[df_receitas_filtrado['profissional'] == profissional_selecionado]
+profissional_filtro = None if profissional_selecionado == 'Todos' else profissional_selecionado
 
 # Filtro de tipo de despesa (NOVO)
 st.sidebar.markdown("---")
 st.sidebar.subheader("💸 Tipos de Despesa")
-tipos_despesa = df_despesas_filtrado['tipo_despesa'].unique().tolist() if 'tipo_despesa' in df_despesas_filtrado.columns else ['Manual']
 mostrar_manuais = st.sidebar.checkbox("Despesas Manuais", value=True)
 mostrar_comissoes = st.sidebar.checkbox("Comissões Calculadas", value=True)
 
@@ -184,9 +430,39 @@ if mostrar_manuais:
     filtro_tipos.append('Manual')
 if mostrar_comissoes:
     filtro_tipos.append('Comissão Calculada')
+# Nenhum tipo marcado: mostra todos
+tipos_filtro = tuple(filtro_tipos) or None
 
-if filtro_tipos:
-    df_despesas_filtrado = df_despesas_filtrado[df_despesas_filtrado['tipo_despesa'].isin(filtro_tipos)]
+# Carregar só as linhas do período e dos filtros selecionados
+try:
+    qtd_receitas_total, qtd_despesas_total = contar_registros(versao)
+    df_receitas_filtrado = carregar_receitas(versao, data_inicio, profissional_filtro)
+    df_despesas_filtrado = carregar_despesas(versao, data_inicio, tipos_filtro)
+    agregados = calcular_agregados(versao, data_inicio, profissional_filtro, tipos_filtro)
+    df_profissionais = carregar_profissionais(versao)
+    df_servicos = carregar_servicos(versao)
+except Exception as e:
+    st.error(f"❌ Erro ao carregar dados: {e}")
+    st.info("💡 Execute primeiro o script de processamento: python 2-processamento/processar_dados.py")
+    st.stop()
+
+# Verificar se há dados
+if qtd_receitas_total == 0 and qtd_despesas_total == 0:
+    st.warning("⚠️ Nenhum dado encontrado no banco. Importe os dados primeiro!")
+    st.stop()
+
+total_receitas = agregados['total_receitas']
+total_despesas = agregados['total_despesas']
+qtd_servicos = agregados['qtd_servicos']
+qtd_despesas = agregados['qtd_despesas']
+receitas_agg = agregados['receitas']
+despesas_agg = agregados['despesas']
+
+# Mostrar range de datas
+if qtd_servicos > 0 or qtd_despesas > 0:
+    data_min = agregados['data_min']
+    data_max = agregados['data_max']
+    faixa_datas.info(f"📆 {data_min.strftime('%d/%m/%Y')} até {data_max.strftime('%d/%m/%Y')}")
 
 # ============================================
 # MÉTRICAS PRINCIPAIS
@@ -196,10 +472,8 @@ st.header("💰 Indicadores Financeiros")
 # Usar 3 colunas em vez de 5 para dar mais espaço
 col1, col2, col3 = st.columns(3)
 
-total_receitas = df_receitas_filtrado['valor_servico'].sum()
-total_despesas = df_despesas_filtrado['valor'].sum()
 saldo = total_receitas - total_despesas
-ticket_medio = df_receitas_filtrado['valor_servico'].mean() if len(df_receitas_filtrado) > 0 else 0
+ticket_medio = total_receitas / qtd_servicos if qtd_servicos > 0 else 0
 margem = (saldo / total_receitas * 100) if total_receitas > 0 else 0
 
 with col1:
@@ -236,14 +510,12 @@ with col4:
     )
 
 with col5:
-    qtd_servicos = len(df_receitas_filtrado)
     st.metric(
         label="📊 Quantidade Serviços", 
         value=f"{qtd_servicos}"
     )
 
 with col6:
-    qtd_despesas = len(df_despesas_filtrado)
     st.metric(
         label="📝 Quantidade Despesas", 
         value=f"{qtd_despesas}"
@@ -255,8 +527,9 @@ st.subheader("📊 Composição das Despesas")
 
 col1, col2, col3 = st.columns(3)
 
-despesas_manuais = df_despesas_filtrado[df_despesas_filtrado['tipo_despesa'] == 'Manual']['valor'].sum() if 'tipo_despesa' in df_despesas_filtrado.columns else total_despesas
-despesas_comissoes = df_despesas_filtrado[df_despesas_filtrado['tipo_despesa'] == 'Comissão Calculada']['valor'].sum() if 'tipo_despesa' in df_despesas_filtrado.columns else 0
+despesas_por_tipo = despesas_agg['tipo_despesa'].set_index('tipo_despesa')['valor']
+despesas_manuais = despesas_por_tipo.get('Manual', 0)
+despesas_comissoes = despesas_por_tipo.get('Comissão Calculada', 0)
 outras_despesas = total_despesas - despesas_manuais - despesas_comissoes
 
 with col1:
@@ -283,9 +556,8 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Receitas por profissional
-    if len(df_receitas_filtrado) > 0:
-        receitas_prof = df_receitas_filtrado.groupby('profissional')['valor_servico'].sum().reset_index()
-        receitas_prof = receitas_prof.sort_values('valor_servico', ascending=False)
+    if qtd_servicos > 0:
+        receitas_prof = receitas_agg['profissional'].sort_values('valor_servico', ascending=False)
         
         fig_prof = px.bar(
             receitas_prof,
@@ -305,9 +577,8 @@ with col1:
 
 with col2:
     # Receitas por tipo de serviço
-    if len(df_receitas_filtrado) > 0:
-        receitas_servico = df_receitas_filtrado.groupby('tipo_servico')['valor_servico'].sum().reset_index()
-        receitas_servico = receitas_servico.sort_values('valor_servico', ascending=False)
+    if qtd_servicos > 0:
+        receitas_servico = receitas_agg['tipo_servico'].sort_values('valor_servico', ascending=False)
         
         fig_servico = px.pie(
             receitas_servico,
@@ -322,12 +593,10 @@ with col2:
         st.info("Nenhuma receita no período selecionado")
 
 # Evolução temporal
-if len(df_receitas_filtrado) > 0:
+if qtd_servicos > 0:
     st.subheader("📊 Evolução das Receitas")
     
-    # Agrupar por dia
-    receitas_diarias = df_receitas_filtrado.groupby(df_receitas_filtrado['data'].dt.date)['valor_servico'].sum().reset_index()
-    receitas_diarias.columns = ['data', 'valor']
+    receitas_diarias = receitas_agg['dia'].rename(columns={'valor_servico': 'valor'})
     
     fig_evolucao = px.line(
         receitas_diarias,
@@ -351,9 +620,8 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Despesas por categoria
-    if len(df_despesas_filtrado) > 0:
-        despesas_cat = df_despesas_filtrado.groupby('categoria')['valor'].sum().reset_index()
-        despesas_cat = despesas_cat.sort_values('valor', ascending=False)
+    if qtd_despesas > 0:
+        despesas_cat = despesas_agg['categoria'].sort_values('valor', ascending=False)
         
         fig_desp = px.bar(
             despesas_cat,
@@ -373,7 +641,7 @@ with col1:
 
 with col2:
     # Distribuição de despesas
-    if len(df_despesas_filtrado) > 0:
+    if qtd_despesas > 0:
         fig_desp_pie = px.pie(
             despesas_cat,
             values='valor',
@@ -388,13 +656,13 @@ with col2:
         st.info("Nenhuma despesa no período selecionado")
 
 # Análise de despesas por tipo (NOVO)
-if 'tipo_despesa' in df_despesas_filtrado.columns and len(df_despesas_filtrado) > 0:
+if qtd_despesas > 0:
     st.subheader("🔍 Despesas: Manual vs Comissões")
     
     col1, col2 = st.columns(2)
     
     with col1:
-        despesas_tipo = df_despesas_filtrado.groupby('tipo_despesa')['valor'].sum().reset_index()
+        despesas_tipo = despesas_agg['tipo_despesa']
         
         fig_tipo = px.bar(
             despesas_tipo,
@@ -430,14 +698,14 @@ st.markdown("---")
 # ============================================
 st.header("👥 Desempenho por Profissional")
 
-if len(df_receitas_filtrado) > 0:
+if qtd_servicos > 0:
     # Calcular métricas por profissional
-    analise_prof = df_receitas_filtrado.groupby('profissional').agg({
-        'valor_servico': ['sum', 'count', 'mean']
-    }).round(2)
-    
-    analise_prof.columns = ['Total Vendas (R$)', 'Qtd Serviços', 'Ticket Médio (R$)']
-    analise_prof = analise_prof.reset_index()
+    analise_prof = receitas_agg['profissional'].rename(columns={
+        'valor_servico': 'Total Vendas (R$)',
+        'qtd': 'Qtd Serviços',
+    })
+    analise_prof['Ticket Médio (R$)'] = analise_prof['Total Vendas (R$)'] / analise_prof['Qtd Serviços']
+    analise_prof = analise_prof.round(2)
     
     # Adicionar informações de comissão
     analise_prof = analise_prof.merge(
@@ -447,11 +715,10 @@ if len(df_receitas_filtrado) > 0:
         how='left'
     )
     
-    # Calcular comissão
-    analise_prof['Comissão (R$)'] = analise_prof.apply(
-        lambda x: x['Total Vendas (R$)'] * (x['percentual_comissao'] / 100) if x['tipo_contrato'] == 'Percentual' and pd.notna(x['percentual_comissao']) else 0,
-        axis=1
-    ).round(2)
+    # Comissão com o percentual vigente em cada dia de venda
+    analise_prof['Comissão (R$)'] = analise_prof['profissional'].map(
+        agregados['comissoes']
+    ).fillna(0).round(2)
     
     # Adicionar salário fixo
     analise_prof['Salário Fixo (R$)'] = analise_prof['salario_fixo'].fillna(0)
@@ -470,7 +737,7 @@ if len(df_receitas_filtrado) > 0:
     
     for col in colunas_moeda:
         if col in analise_prof_display.columns:
-            analise_prof_display[col] = analise_prof_display[col].apply(formatar_real)
+            analise_prof_display[col] = formatar_real_coluna(analise_prof_display[col])
     
     # Exibir tabela
     st.dataframe(
@@ -514,8 +781,8 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Receitas")
-    if len(df_receitas_filtrado) > 0 and 'forma_pagamento' in df_receitas_filtrado.columns:
-        pagto_receitas = df_receitas_filtrado.groupby('forma_pagamento')['valor_servico'].agg(['sum', 'count']).reset_index()
+    if qtd_servicos > 0:
+        pagto_receitas = receitas_agg['forma_pagamento'].copy()
         pagto_receitas.columns = ['Forma', 'Total', 'Quantidade']
         
         fig_pagto_rec = px.pie(
@@ -531,7 +798,7 @@ with col1:
         
         # Tabela detalhada com formatação
         pagto_receitas_display = pagto_receitas.copy()
-        pagto_receitas_display['Total'] = pagto_receitas_display['Total'].apply(formatar_real)
+        pagto_receitas_display['Total'] = formatar_real_coluna(pagto_receitas_display['Total'])
         st.dataframe(
             pagto_receitas_display.sort_values('Quantidade', ascending=False),
             hide_index=True,
@@ -542,12 +809,11 @@ with col1:
 
 with col2:
     st.subheader("Despesas")
-    if len(df_despesas_filtrado) > 0 and 'forma_pagamento' in df_despesas_filtrado.columns:
-        # Filtrar apenas despesas com forma de pagamento preenchida
-        despesas_com_pagto = df_despesas_filtrado[df_despesas_filtrado['forma_pagamento'].notna()]
+    if qtd_despesas > 0:
+        # Apenas despesas com forma de pagamento preenchida (o agrupamento ignora as vazias)
+        pagto_despesas = despesas_agg['forma_pagamento'].copy()
         
-        if len(despesas_com_pagto) > 0:
-            pagto_despesas = despesas_com_pagto.groupby('forma_pagamento')['valor'].agg(['sum', 'count']).reset_index()
+        if len(pagto_despesas) > 0:
             pagto_despesas.columns = ['Forma', 'Total', 'Quantidade']
             
             fig_pagto_desp = px.pie(
@@ -563,7 +829,7 @@ with col2:
             
             # Tabela detalhada com formatação
             pagto_despesas_display = pagto_despesas.copy()
-            pagto_despesas_display['Total'] = pagto_despesas_display['Total'].apply(formatar_real)
+            pagto_despesas_display['Total'] = formatar_real_coluna(pagto_despesas_display['Total'])
             st.dataframe(
                 pagto_despesas_display.sort_values('Quantidade', ascending=False),
                 hide_index=True,
@@ -571,7 +837,7 @@ with col2:
             )
             
             # Alerta para despesas sem forma de pagamento
-            sem_forma = len(df_despesas_filtrado) - len(despesas_com_pagto)
+            sem_forma = qtd_despesas - int(pagto_despesas['Quantidade'].sum())
             if sem_forma > 0:
                 st.warning(f"⚠️ {sem_forma} despesas sem forma de pagamento definida")
         else:
@@ -586,20 +852,8 @@ st.markdown("---")
 # ============================================
 st.header("💰 Fluxo de Caixa")
 
-if len(df_receitas_filtrado) > 0 or len(df_despesas_filtrado) > 0:
-    # Preparar dados de receitas
-    receitas_fluxo = df_receitas_filtrado.groupby(df_receitas_filtrado['data'].dt.date)['valor_servico'].sum().reset_index()
-    receitas_fluxo.columns = ['data', 'receitas']
-    
-    # Preparar dados de despesas
-    despesas_fluxo = df_despesas_filtrado.groupby(df_despesas_filtrado['data'].dt.date)['valor'].sum().reset_index()
-    despesas_fluxo.columns = ['data', 'despesas']
-    
-    # Merge
-    fluxo = pd.merge(receitas_fluxo, despesas_fluxo, on='data', how='outer').fillna(0)
-    fluxo['saldo_dia'] = fluxo['receitas'] - fluxo['despesas']
-    fluxo['saldo_acumulado'] = fluxo['saldo_dia'].cumsum()
-    fluxo = fluxo.sort_values('data')
+if qtd_servicos > 0 or qtd_despesas > 0:
+    fluxo = agregados['fluxo']
     
     # Gráfico
     fig_fluxo = go.Figure()
@@ -657,7 +911,7 @@ with tab1:
     if len(df_receitas_filtrado) > 0:
         # Formatar valores antes de exibir
         df_receitas_display = df_receitas_filtrado.copy()
-        df_receitas_display['valor_servico'] = df_receitas_display['valor_servico'].apply(formatar_real)
+        df_receitas_display['valor_servico'] = formatar_real_coluna(df_receitas_display['valor_servico'])
         
         st.dataframe(
             df_receitas_display.sort_values('data', ascending=False),
@@ -680,7 +934,7 @@ with tab2:
     if len(df_despesas_filtrado) > 0:
         # Formatar valores antes de exibir
         df_despesas_display = df_despesas_filtrado.copy()
-        df_despesas_display['valor'] = df_despesas_display['valor'].apply(formatar_real)
+        df_despesas_display['valor'] = formatar_real_coluna(df_despesas_display['valor'])
         
         st.dataframe(
             df_despesas_display.sort_values('data', ascending=False),
@@ -713,8 +967,8 @@ st.sidebar.markdown("---")
 st.sidebar.subheader("ℹ️ Informações do Sistema")
 st.sidebar.info(f"""
 **Total de Registros:**
-- Receitas: {len(df_receitas)}
-- Despesas: {len(df_despesas)}
+- Receitas: {qtd_receitas_total}
+- Despesas: {qtd_despesas_total}
 - Profissionais: {len(df_profissionais)}
 - Serviços: {len(df_servicos)}
 
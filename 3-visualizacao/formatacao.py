@@ -0,0 +1,76 @@
+"""
+DataOps Local - Formatação de Valores
+Autor: Sistema DataOps
+Descrição: Formatação de moeda em Real brasileiro para o dashboard, de um
+valor (indicadores) ou de uma coluna inteira de uma vez (tabelas)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Textos prontos usados por formatar_real_coluna
+_GRUPOS_MILHAR = np.array([f"{i:03d}" for i in range(1000)])
+_GRUPOS_INICIAIS = np.array([str(i) for i in range(1000)])
+_CENTAVOS = np.array([f",{i:02d}" for i in range(100)])
+
+
+def formatar_real(valor):
+    """Formata valor para moeda brasileira (R$ 1.234,56)"""
+    if pd.isna(valor) or valor is None:
+        return "R$ 0,00"
+    try:
+        return f"R$ {float(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except:
+        return "R$ 0,00"
+
+
+def formatar_real_compacto(valor):
+    """Formata valor de forma compacta para métricas (77,2 mil)"""
+    if pd.isna(valor) or valor is None:
+        return "R$ 0"
+
+    try:
+        valor = float(valor)
+
+        # Milhões
+        if abs(valor) >= 1000000:
+            return f"R$ {valor/1000000:.1f}M".replace(".", ",")
+        # Milhares
+        elif abs(valor) >= 1000:
+            return f"R$ {valor/1000:.1f}k".replace(".", ",")
+        # Centenas
+        else:
+            return f"R$ {valor:.0f}"
+    except:
+        return "R$ 0"
+
+
+def formatar_real_coluna(valores):
+    """formatar_real para uma coluna inteira, com operações sobre o array todo
+
+    Mesmo texto de formatar_real, sem chamar uma função Python por linha:
+    os centavos são calculados com numpy, os grupos de milhar saem de
+    tabelas prontas ('000'..'999') e os pedaços são concatenados com
+    np.char. Só os valores exatamente no meio de dois centavos (2,675)
+    passam pela formatação do Python, para arredondar como '%.2f'.
+    """
+    numeros = pd.to_numeric(valores, errors='coerce')
+    x = np.nan_to_num(numeros.to_numpy(dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+    escala = np.abs(x) * 100
+    centavos = np.rint(escala).astype(np.int64)
+    empate = np.abs(escala - np.floor(escala) - 0.5) <= 4 * np.spacing(escala)
+    if empate.any():
+        centavos[empate] = [int(f"{v:.2f}".replace('.', '')) for v in np.abs(x[empate])]
+    inteiro, resto = np.divmod(centavos, 100)
+
+    # Grupos de milhar da direita para a esquerda; só o primeiro grupo não tem zeros à esquerda
+    grupo, inteiro = inteiro % 1000, inteiro // 1000
+    texto = np.where(inteiro > 0, _GRUPOS_MILHAR[grupo], _GRUPOS_INICIAIS[grupo])
+    while inteiro.any():
+        tem_grupo = inteiro > 0
+        grupo, inteiro = inteiro % 1000, inteiro // 1000
+        anterior = np.where(inteiro > 0, _GRUPOS_MILHAR[grupo], _GRUPOS_INICIAIS[grupo])
+        texto = np.where(tem_grupo, np.char.add(np.char.add(anterior, '.'), texto), texto)
+
+    texto = np.char.add(np.char.add(np.where(np.signbit(x), 'R$ -', 'R$ '), texto), _CENTAVOS[resto])
+    return pd.Series(texto, index=numeros.index, dtype=object)
@@ -51,30 +51,54 @@ class RelatorioGerador:
             print(f"❌ Erro ao conectar ao banco: {e}")
             return False
     
+    def consultar(self, query, query_sem_resumos):
+        """Executa a consulta sobre os resumos diários
+        
+        Banco anterior aos resumos diários (e às tabelas de dimensão): usa
+        query_sem_resumos, que agrega direto das receitas/despesas.
+        """
+        try:
+            return pd.read_sql_query(query, self.conn)
+        except pd.errors.DatabaseError:
+            return pd.read_sql_query(query_sem_resumos, self.conn)
+    
     def obter_metricas_periodo(self, dias=30):
-        """Obtém métricas do período"""
+        """Obtém métricas do período (a partir dos resumos diários)"""
         data_inicio = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
         
         # Receitas
         query_receitas = f"""
+            SELECT 
+                SUM(qtd) as qtd,
+                SUM(total) as total,
+                SUM(total) / SUM(qtd) as media
+            FROM receitas_por_dia
+            WHERE dia >= '{data_inicio}'
+        """
+        df_rec = self.consultar(query_receitas, f"""
             SELECT 
                 COUNT(*) as qtd,
                 SUM(valor_servico) as total,
                 AVG(valor_servico) as media
             FROM receitas
             WHERE data >= '{data_inicio}'
-        """
-        df_rec = pd.read_sql_query(query_receitas, self.conn)
+        """)
         
         # Despesas
         query_despesas = f"""
+            SELECT 
+                SUM(qtd) as qtd,
+                SUM(total) as total
+            FROM despesas_por_dia
+            WHERE dia >= '{data_inicio}'
+        """
+        df_desp = self.consultar(query_despesas, f"""
             SELECT 
                 COUNT(*) as qtd,
                 SUM(valor) as total
             FROM despesas
             WHERE data >= '{data_inicio}'
-        """
-        df_desp = pd.read_sql_query(query_despesas, self.conn)
+        """)
         
         return {
             'receitas': {
@@ -89,10 +113,23 @@ class RelatorioGerador:
         }
     
     def obter_top_profissionais(self, dias=30, limite=5):
-        """Obtém ranking de profissionais"""
+        """Obtém ranking de profissionais (agrupado pelo código da dimensão, não pelo nome)"""
         data_inicio = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
         
         query = f"""
+            SELECT 
+                d.nome as profissional,
+                SUM(r.qtd) as qtd_servicos,
+                SUM(r.total) as total_receita,
+                SUM(r.total) / SUM(r.qtd) as ticket_medio
+            FROM receitas_por_dia r
+            JOIN dim_profissional d ON d.id = r.profissional_id
+            WHERE r.dia >= '{data_inicio}'
+            GROUP BY r.profissional_id
+            ORDER BY total_receita DESC
+            LIMIT {limite}
+        """
+        return self.consultar(query, f"""
             SELECT 
                 profissional,
                 COUNT(*) as qtd_servicos,
@@ -103,14 +140,25 @@ class RelatorioGerador:
             GROUP BY profissional
             ORDER BY total_receita DESC
             LIMIT {limite}
-        """
-        return pd.read_sql_query(query, self.conn)
+        """)
     
     def obter_servicos_mais_vendidos(self, dias=30, limite=5):
         """Obtém serviços mais realizados"""
         data_inicio = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
         
         query = f"""
+            SELECT 
+                d.nome as tipo_servico,
+                SUM(r.qtd) as quantidade,
+                SUM(r.total) as receita_total
+            FROM receitas_por_dia r
+            JOIN dim_servico d ON d.id = r.tipo_servico_id
+            WHERE r.dia >= '{data_inicio}'
+            GROUP BY r.tipo_servico_id
+            ORDER BY quantidade DESC
+            LIMIT {limite}
+        """
+        return self.consultar(query, f"""
             SELECT 
                 tipo_servico,
                 COUNT(*) as quantidade,
@@ -120,14 +168,24 @@ class RelatorioGerador:
             GROUP BY tipo_servico
             ORDER BY quantidade DESC
             LIMIT {limite}
-        """
-        return pd.read_sql_query(query, self.conn)
+        """)
     
     def obter_despesas_por_categoria(self, dias=30):
         """Obtém despesas agrupadas por categoria"""
         data_inicio = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
         
         query = f"""
+            SELECT 
+                d.nome as categoria,
+                SUM(r.qtd) as qtd,
+                SUM(r.total) as total
+            FROM despesas_por_dia r
+            JOIN dim_categoria d ON d.id = r.categoria_id
+            WHERE r.dia >= '{data_inicio}'
+            GROUP BY r.categoria_id
+            ORDER BY total DESC
+        """
+        return self.consultar(query, f"""
             SELECT 
                 categoria,
                 COUNT(*) as qtd,
@@ -136,8 +194,7 @@ class RelatorioGerador:
             WHERE data >= '{data_inicio}'
             GROUP BY categoria
             ORDER BY total DESC
-        """
-        return pd.read_sql_query(query, self.conn)
+        """)
     
     def gerar_relatorio_mensal(self, nome_arquivo=None):
         """Gera relatório mensal completo"""
@@ -12,6 +12,13 @@ print("🔄 Conectando ao banco de dados...")
 conn = sqlite3.connect('dados/dataops.db')
 cursor = conn.cursor()
 
+# Bancos no formato atual (despesas é uma view sobre fato_despesas) já estão atualizados
+cursor.execute("SELECT type FROM sqlite_master WHERE name = 'despesas'")
+if cursor.fetchone() == ('view',):
+    print("✅ Banco de dados já está no formato atual (nada a fazer)")
+    conn.close()
+    exit()
+
 # Adicionar coluna tipo_despesa
 try:
     cursor.execute("ALTER TABLE despesas ADD COLUMN tipo_despesa TEXT DEFAULT 'Manual'")
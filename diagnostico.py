@@ -8,6 +8,26 @@ import pandas as pd
 from datetime import datetime
 import os
 
+# Consultas frequentes (dashboard, relatórios e comissões) e os índices que
+# devem atendê-las: (descrição, SQL, parâmetros, índices aceitos)
+CONSULTAS_FREQUENTES = [
+    ("Receitas do período (dashboard/relatório)",
+     "SELECT COUNT(*), SUM(valor_servico) FROM receitas WHERE data >= ?",
+     ('2000-01-01',), ['idx_receitas_data', 'idx_receitas_profissional_data']),
+    ("Vendas de um profissional no período (comissões)",
+     "SELECT SUM(valor_servico) FROM receitas WHERE profissional = ? AND data >= ? AND data < ?",
+     ('', '2000-01-01', '2000-02-01'), ['idx_receitas_profissional_data']),
+    ("Despesas do período por tipo",
+     "SELECT SUM(valor) FROM despesas WHERE data >= ? AND tipo_despesa = ?",
+     ('2000-01-01', 'Manual'), ['idx_despesas_data_tipo']),
+    ("Despesas de uma categoria no período",
+     "SELECT SUM(valor) FROM despesas WHERE categoria = ? AND data >= ?",
+     ('', '2000-01-01'), ['idx_despesas_categoria_data']),
+    ("Cadastro de um profissional",
+     "SELECT * FROM profissionais WHERE nome_profissional = ?",
+     ('',), ['idx_profissionais_nome', 'sqlite_autoindex_profissionais_1']),
+]
+
 class DiagnosticoDataOps:
     def __init__(self, db_path='dados/dataops.db'):
         self.db_path = db_path
@@ -40,7 +60,7 @@ class DiagnosticoDataOps:
         print("="*70)
         
         cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
         tabelas = [row[0] for row in cursor.fetchall()]
         
         tabelas_esperadas = ['receitas', 'despesas', 'profissionais', 'servicos']
@@ -193,6 +213,19 @@ class DiagnosticoDataOps:
                 "Verifique se as datas estão corretas"
             )
         
+        # Verificar datas fora do formato AAAA-MM-DD (com hora ou em outro formato)
+        for tabela in ['receitas', 'despesas']:
+            query = f"SELECT COUNT(*) as fora FROM {tabela} WHERE data IS NOT date(data)"
+            df = pd.read_sql_query(query, self.conn)
+            
+            if df['fora'].iloc[0] > 0:
+                print(f"\n⚠️  {df['fora'].iloc[0]} {tabela} com data fora do formato AAAA-MM-DD")
+                self.adicionar_problema(
+                    "MEDIO",
+                    f"{df['fora'].iloc[0]} {tabela} com data fora do formato AAAA-MM-DD",
+                    "Execute o processamento (ele converte as datas dos bancos antigos)"
+                )
+        
         print()
     
     def verificar_comissoes(self):
@@ -331,6 +364,75 @@ class DiagnosticoDataOps:
         
         print()
     
+    def verificar_indices(self):
+        """Verifica se as consultas frequentes usam os índices (EXPLAIN QUERY PLAN)"""
+        print("="*70)
+        print("8️⃣  VERIFICANDO ÍNDICES E PLANOS DE CONSULTA")
+        print("="*70)
+        
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            print("⚠️  Banco sem estatísticas do planejador (ANALYZE nunca executado)")
+            self.adicionar_problema(
+                "INFO",
+                "Banco sem estatísticas do planejador de consultas",
+                "Execute o processamento (ele roda ANALYZE após as cargas)"
+            )
+        
+        for descricao, sql, parametros, indices in CONSULTAS_FREQUENTES:
+            try:
+                plano = [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+            except sqlite3.Error as e:
+                print(f"❌ {descricao}: {e}")
+                continue
+            
+            usados = [indice for indice in indices if any(indice in passo for passo in plano)]
+            if usados:
+                print(f"✅ {descricao}: usa {usados[0]}")
+            else:
+                print(f"⚠️  {descricao}: {' | '.join(plano)}")
+                self.adicionar_problema(
+                    "MEDIO",
+                    f"Consulta sem índice: {descricao} (esperado: {', '.join(indices)})",
+                    "Execute o processamento para criar os índices e atualizar as estatísticas"
+                )
+        
+        print()
+    
+    def verificar_resumos_diarios(self):
+        """Confere se os resumos diários batem com as receitas/despesas"""
+        print("="*70)
+        print("9️⃣  VERIFICANDO RESUMOS DIÁRIOS")
+        print("="*70)
+        
+        cursor = self.conn.cursor()
+        for tabela, resumo, coluna_valor in (('receitas', 'receitas_por_dia', 'valor_servico'),
+                                             ('despesas', 'despesas_por_dia', 'valor')):
+            try:
+                qtd, total = cursor.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM({coluna_valor}), 0) FROM {tabela} WHERE date(data) IS NOT NULL"
+                ).fetchone()
+                qtd_resumo, total_resumo = cursor.execute(
+                    f"SELECT COALESCE(SUM(qtd), 0), COALESCE(SUM(total), 0) FROM {resumo}"
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️  {resumo}: {e}")
+                continue
+            
+            if qtd == qtd_resumo and abs(total - total_resumo) < 0.01:
+                print(f"✅ {resumo}: {qtd_resumo} lançamentos, R$ {total_resumo:,.2f}")
+            else:
+                print(f"❌ {resumo}: {qtd_resumo} lançamentos (R$ {total_resumo:,.2f}), "
+                      f"{tabela}: {qtd} (R$ {total:,.2f})")
+                self.adicionar_problema(
+                    "MEDIO",
+                    f"Resumo diário {resumo} diferente da tabela {tabela}",
+                    f"Apague o resumo (DROP TABLE {resumo}) e execute o processamento; ele é refeito com todo o histórico"
+                )
+        
+        print()
+    
     def gerar_relatorio_problemas(self):
         """Gera relatório final com todos os problemas"""
         print("\n")
@@ -394,6 +496,8 @@ class DiagnosticoDataOps:
         self.verificar_comissoes()
         self.verificar_profissionais()
         self.verificar_valores_zerados()
+        self.verificar_indices()
+        self.verificar_resumos_diarios()
         
         self.gerar_relatorio_problemas()
         
@@ -0,0 +1,42 @@
+"""
+DataOps Local - Configuração dos Testes
+Autor: Sistema DataOps
+Descrição: Torna os módulos de 2-processamento/ e 3-visualizacao/ importáveis
+e fornece um processador ligado a um banco temporário
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for pasta in ('2-processamento', '3-visualizacao'):
+    sys.path.insert(0, os.path.join(RAIZ, pasta))
+
+from processar_dados import DataProcessor  # noqa: E402
+
+
+@pytest.fixture
+def processador(tmp_path):
+    """DataProcessor com as tabelas criadas num banco vazio (sem cache de planilhas)
+    
+    Como em executar_processamento, tudo roda dentro da transação da execução.
+    """
+    processor = DataProcessor(db_path=str(tmp_path / 'dados' / 'dataops.db'), force=True, usar_cache=False)
+    assert processor.conectar_banco()
+    processor.escritor.iniciar_execucao()
+    assert processor.criar_tabelas()
+    yield processor
+    processor.fechar_conexao()
+
+
+@pytest.fixture
+def gravar_planilha(tmp_path):
+    """Grava as linhas informadas como planilha Excel na aba de receitas ou despesas"""
+    def gravar(tipo_dados, linhas, nome=None):
+        caminho = tmp_path / (nome or f"Template_{tipo_dados.capitalize()}.xlsx")
+        pd.DataFrame(linhas).to_excel(caminho, sheet_name=tipo_dados.capitalize(), index=False)
+        return str(caminho)
+    return gravar
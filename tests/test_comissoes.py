@@ -0,0 +1,118 @@
+"""
+DataOps Local - Testes do Ledger de Comissões
+Autor: Sistema DataOps
+Descrição: Comissões calculadas em SQL (comissoes_calculadas) comparadas com
+o cálculo linha a linha da versão original, reexecução sem duplicatas e
+percentual vigente na data de cada venda
+"""
+
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from conftest import RAIZ
+
+COLETA = os.path.join(RAIZ, '1-coleta')
+
+
+@pytest.fixture
+def processador_com_exemplo(processador):
+    """Processador com profissionais e receitas das planilhas de exemplo de 1-coleta/"""
+    processador.processar_profissionais(os.path.join(COLETA, 'Template_Profissionais.xlsx'))
+    processador.processar_receitas(os.path.join(COLETA, 'Template_Receitas.xlsx'))
+    return processador
+
+
+def comissoes_por_loop(conn, data_inicio, data_fim):
+    """Cálculo da versão original: uma consulta e um laço por profissional ativo"""
+    df = pd.read_sql_query("""
+        SELECT r.profissional, SUM(r.valor_servico) as total_vendas,
+               p.percentual_comissao, p.salario_fixo, p.tipo_contrato
+        FROM receitas r
+        LEFT JOIN profissionais p ON r.profissional = p.nome_profissional
+        WHERE r.data BETWEEN ? AND ? AND p.status = 'Ativo'
+        GROUP BY r.profissional
+    """, conn, params=(data_inicio, data_fim))
+
+    esperadas = {}
+    for _, row in df.iterrows():
+        percentual = row['percentual_comissao'] or 0
+        salario_fixo = row['salario_fixo'] or 0
+        valor_comissao = 0
+        if row['tipo_contrato'] == 'Percentual' and percentual > 0:
+            valor_comissao = row['total_vendas'] * (percentual / 100)
+        if valor_comissao > 0 or salario_fixo > 0:
+            esperadas[row['profissional']] = (round(row['total_vendas'], 2), round(valor_comissao, 2),
+                                              round(salario_fixo + valor_comissao, 2))
+    return esperadas
+
+
+def comissoes_do_ledger(conn, data_inicio, data_fim):
+    return {
+        profissional: (round(vendas, 2), round(comissao, 2), round(total, 2))
+        for profissional, vendas, comissao, total in conn.execute("""
+            SELECT profissional, total_vendas, valor_comissao, total_pagar
+            FROM comissoes_calculadas WHERE periodo_inicio = ? AND periodo_fim = ?
+        """, (data_inicio, data_fim))
+    }
+
+
+def test_ledger_igual_ao_calculo_por_profissional(processador_com_exemplo):
+    conn = processador_com_exemplo.conn
+    assert processador_com_exemplo.recalcular_comissoes_historico('2026-01-01', '2026-02-28') > 0
+
+    for data_inicio, data_fim in (('2026-01-01', '2026-01-31'), ('2026-02-01', '2026-02-28')):
+        esperadas = comissoes_por_loop(conn, data_inicio, data_fim)
+        assert esperadas
+        assert comissoes_do_ledger(conn, data_inicio, data_fim) == esperadas
+
+
+def test_recalcular_o_mesmo_periodo_nao_duplica(processador_com_exemplo):
+    conn = processador_com_exemplo.conn
+    processador_com_exemplo.calcular_comissoes_periodo('2026-01-01', '2026-01-31')
+    antes = conn.execute("SELECT COUNT(*), SUM(valor) FROM despesas WHERE tipo_despesa = 'Comissão Calculada'").fetchone()
+
+    processador_com_exemplo.calcular_comissoes_periodo('2026-01-01', '2026-01-31')
+
+    assert conn.execute(
+        "SELECT COUNT(*), SUM(valor) FROM despesas WHERE tipo_despesa = 'Comissão Calculada'"
+    ).fetchone() == antes
+    assert conn.execute("SELECT COUNT(*) FROM comissoes_calculadas").fetchone()[0] == antes[0]
+
+
+def test_venda_usa_o_percentual_vigente_na_data(processador_com_exemplo):
+    conn = processador_com_exemplo.conn
+    profissional, percentual = conn.execute("""
+        SELECT nome_profissional, percentual_comissao FROM profissionais
+        WHERE tipo_contrato = 'Percentual' AND status = 'Ativo' AND percentual_comissao > 0
+        ORDER BY nome_profissional LIMIT 1
+    """).fetchone()
+    # Percentual novo a partir de 20/01: vendas anteriores continuam com o antigo
+    conn.execute("UPDATE profissionais SET percentual_comissao = ? WHERE nome_profissional = ?",
+                 (percentual + 10, profissional))
+    processador_com_exemplo.atualizar_historico_profissionais(vigencia='2026-01-20')
+
+    processador_com_exemplo.calcular_comissoes_periodo('2026-01-01', '2026-01-31')
+
+    antes, depois = conn.execute("""
+        SELECT COALESCE(SUM(CASE WHEN data < '2026-01-20' THEN valor_servico END), 0),
+               COALESCE(SUM(CASE WHEN data >= '2026-01-20' THEN valor_servico END), 0)
+        FROM receitas WHERE profissional = ? AND data BETWEEN '2026-01-01' AND '2026-01-31'
+    """, (profissional,)).fetchone()
+    assert antes > 0 and depois > 0
+    valor_comissao = conn.execute("""
+        SELECT valor_comissao FROM comissoes_calculadas
+        WHERE profissional = ? AND periodo_inicio = '2026-01-01' AND periodo_fim = '2026-01-31'
+    """, (profissional,)).fetchone()[0]
+    assert valor_comissao == pytest.approx(antes * percentual / 100 + depois * (percentual + 10) / 100)
+
+
+def test_historico_tem_uma_versao_aberta_por_profissional(processador_com_exemplo):
+    conn = processador_com_exemplo.conn
+    profissional = conn.execute("SELECT nome_profissional FROM profissionais LIMIT 1").fetchone()[0]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO profissionais_historico (nome_profissional, valid_from) VALUES (?, '2026-03-01')",
+                     (profissional,))
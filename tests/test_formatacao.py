@@ -0,0 +1,30 @@
+"""
+DataOps Local - Testes da Formatação de Moeda
+Autor: Sistema DataOps
+Descrição: formatar_real_coluna produz o mesmo texto de formatar_real
+"""
+
+import numpy as np
+import pandas as pd
+
+from formatacao import formatar_real, formatar_real_coluna
+
+
+def test_coluna_igual_a_formatacao_valor_a_valor():
+    gerador = np.random.default_rng(42)
+    valores = pd.Series(np.concatenate([
+        gerador.uniform(-1e7, 1e7, 20000).round(3),
+        gerador.uniform(0, 1000, 20000),
+        [0.0, -0.0, 0.005, 0.015, 2.675, 1.005, 999.995, 1000.0, 999999.999, -1234.565, 1e12],
+    ]))
+
+    assert formatar_real_coluna(valores).tolist() == [formatar_real(v) for v in valores]
+
+
+def test_coluna_com_valores_ausentes_e_texto():
+    valores = pd.Series([1234.5, None, np.nan, 'abc'], index=[10, 11, 12, 13])
+
+    resultado = formatar_real_coluna(valores)
+
+    assert resultado.index.tolist() == [10, 11, 12, 13]
+    assert resultado.tolist() == [formatar_real(v) for v in valores]
@@ -0,0 +1,69 @@
+"""
+DataOps Local - Testes da Quarentena
+Autor: Sistema DataOps
+Descrição: Linhas inválidas vão para a quarentena com o texto original da
+planilha e a versão já gravada delas sai da tabela fato
+"""
+
+from test_upsert import linhas_receitas, receita
+
+
+def quarentena_receitas(processador):
+    return processador.conn.execute(
+        "SELECT linha, motivo, data, cliente, valor_servico FROM receitas_quarentena ORDER BY linha"
+    ).fetchall()
+
+
+def test_linhas_invalidas_vao_para_a_quarentena(processador, gravar_planilha):
+    arquivo = gravar_planilha('receitas', [
+        receita('Carla'),
+        receita('Bruno', data='31/02/2026'),
+        receita('Davi', valor='abc'),
+        receita('Elisa', valor=-10.0),
+    ])
+
+    assert processador.processar_receitas(arquivo) == 1
+    assert linhas_receitas(processador) == [('Carla', 50.0)]
+    assert quarentena_receitas(processador) == [
+        (3, 'data inválida', '31/02/2026', 'Bruno', 50.0),
+        (4, 'valor_servico não numérico', '2026-01-05', 'Davi', 'abc'),
+        (5, 'valor_servico menor ou igual a zero', '2026-01-05', 'Elisa', -10.0),
+    ]
+
+
+def test_linha_que_fica_invalida_sai_da_tabela_fato(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)]))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 'abc')]))
+
+    assert linhas_receitas(processador) == [('Carla', 50.0)]
+    assert [row[3] for row in quarentena_receitas(processador)] == ['Bruno']
+
+
+def test_linha_sem_origem_que_fica_invalida_sai_da_tabela_fato(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)]))
+    # Linha gravada antes da coluna arquivo (remover_linhas_ausentes não a toca)
+    processador.conn.execute("UPDATE fato_receitas SET arquivo = NULL WHERE cliente = 'Bruno'")
+
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 'abc')]))
+
+    assert linhas_receitas(processador) == [('Carla', 50.0)]
+
+
+def test_linha_corrigida_sai_da_quarentena(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 'abc')]))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 50.0)]))
+
+    assert quarentena_receitas(processador) == []
+    assert linhas_receitas(processador) == [('Carla', 50.0)]
+
+
+def test_despesa_com_data_invalida_guarda_o_texto_original(processador, gravar_planilha):
+    arquivo = gravar_planilha('despesas', [
+        {'Data': '10/01/2026', 'Categoria': 'Produtos', 'Descricao': 'Shampoo', 'Valor': 120.0},
+        {'Data': '32/01/2026', 'Categoria': 'Produtos', 'Descricao': 'Condicionador', 'Valor': 'doze'},
+    ])
+
+    assert processador.processar_despesas(arquivo) == 1
+    assert processador.conn.execute(
+        "SELECT linha, motivo, data, descricao, valor FROM despesas_quarentena"
+    ).fetchall() == [(3, 'data inválida; valor não numérico', '32/01/2026', 'Condicionador', 'doze')]
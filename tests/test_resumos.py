@@ -0,0 +1,51 @@
+"""
+DataOps Local - Testes dos Resumos Diários
+Autor: Sistema DataOps
+Descrição: receitas_por_dia/despesas_por_dia batem com as tabelas fato depois
+de cargas, correções e remoções
+"""
+
+import os
+
+from conftest import RAIZ
+
+COLETA = os.path.join(RAIZ, '1-coleta')
+
+
+def totais_por_dia(conn, fato, coluna_valor, resumo):
+    """(dia, quantidade, total) calculados da tabela fato e lidos do resumo"""
+    da_tabela = conn.execute(f"""
+        SELECT data, COUNT(*), ROUND(SUM({coluna_valor}), 2) FROM {fato} GROUP BY data ORDER BY data
+    """).fetchall()
+    do_resumo = conn.execute(f"""
+        SELECT dia, SUM(qtd), ROUND(SUM(total), 2) FROM {resumo} GROUP BY dia ORDER BY dia
+    """).fetchall()
+    return da_tabela, do_resumo
+
+
+def test_resumos_batem_com_as_tabelas_fato(processador):
+    processador.processar_receitas(os.path.join(COLETA, 'Template_Receitas.xlsx'))
+    processador.processar_despesas(os.path.join(COLETA, 'Template_Despesas.xlsx'))
+    processador.atualizar_resumos_diarios()
+
+    for fato, coluna_valor, resumo in (('fato_receitas', 'valor_servico', 'receitas_por_dia'),
+                                       ('fato_despesas', 'valor', 'despesas_por_dia')):
+        da_tabela, do_resumo = totais_por_dia(processador.conn, fato, coluna_valor, resumo)
+        assert da_tabela
+        assert do_resumo == da_tabela
+
+
+def test_resumo_acompanha_correcao_e_remocao(processador, gravar_planilha):
+    def receita(cliente, valor, data):
+        return {'Data': data, 'Tipo Servico': 'Barba', 'Profissional': 'Pedro Oliveira',
+                'Cliente': cliente, 'Valor Servico': valor}
+
+    processador.processar_receitas(gravar_planilha('receitas', [
+        receita('Carla', 40.0, '05/01/2026'), receita('Bruno', 30.0, '06/01/2026'),
+    ]))
+    processador.atualizar_resumos_diarios()
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 45.0, '05/01/2026')]))
+    processador.atualizar_resumos_diarios()
+
+    da_tabela, do_resumo = totais_por_dia(processador.conn, 'fato_receitas', 'valor_servico', 'receitas_por_dia')
+    assert do_resumo == da_tabela == [('2026-01-05', 1, 45.0)]
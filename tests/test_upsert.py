@@ -0,0 +1,92 @@
+"""
+DataOps Local - Testes do Upsert de Receitas e Despesas
+Autor: Sistema DataOps
+Descrição: Reimportação idempotente pela chave natural e remoção das linhas
+que saíram da planilha (ou mudaram de chave)
+"""
+
+
+def receita(cliente, valor=50.0, data='05/01/2026', profissional='Ana Costa'):
+    return {
+        'Data': data, 'Tipo Servico': 'Corte Feminino', 'Profissional': profissional,
+        'Cliente': cliente, 'Valor Servico': valor, 'Forma Pagamento': 'PIX',
+    }
+
+
+def linhas_receitas(processador):
+    return processador.conn.execute(
+        "SELECT cliente, valor_servico FROM receitas ORDER BY cliente, valor_servico"
+    ).fetchall()
+
+
+def test_reimportar_a_mesma_planilha_nao_duplica(processador, gravar_planilha):
+    arquivo = gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)])
+    assert processador.processar_receitas(arquivo) == 2
+    assert processador.processar_receitas(arquivo) == 2
+
+    assert linhas_receitas(processador) == [('Bruno', 80.0), ('Carla', 50.0)]
+    mensagens = [mensagem for _, mensagem in processador.log_importacao]
+    assert any('0 inseridas | 0 atualizadas | 2 inalteradas' in mensagem for mensagem in mensagens)
+
+
+def test_valor_corrigido_atualiza_a_linha(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 50.0)]))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 55.0)]))
+
+    assert linhas_receitas(processador) == [('Carla', 55.0)]
+
+
+def test_chave_corrigida_remove_a_versao_antiga(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)]))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Karla'), receita('Bruno', 80.0)]))
+
+    assert linhas_receitas(processador) == [('Bruno', 80.0), ('Karla', 50.0)]
+    processador.atualizar_resumos_diarios()
+    assert processador.conn.execute("SELECT SUM(total) FROM receitas_por_dia").fetchone()[0] == 130.0
+
+
+def test_linha_removida_da_planilha_sai_do_banco(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)]))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Bruno', 80.0)]))
+
+    assert linhas_receitas(processador) == [('Bruno', 80.0)]
+
+
+def test_remocao_nao_afeta_outra_planilha(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla')], nome='loja_1.xlsx'))
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Bruno')], nome='loja_2.xlsx'))
+
+    assert linhas_receitas(processador) == [('Bruno', 50.0), ('Carla', 50.0)]
+
+
+def test_linha_repetida_em_quarentena_nao_desloca_as_outras(processador, gravar_planilha):
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla'), receita('Carla')]))
+    ids = [row[0] for row in processador.conn.execute("SELECT id FROM fato_receitas ORDER BY id")]
+
+    # A primeira das duas linhas idênticas fica inválida: a segunda continua a mesma linha
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Carla', 'abc'), receita('Carla')]))
+
+    assert [row[0] for row in processador.conn.execute("SELECT id FROM fato_receitas")] == [ids[1]]
+    assert linhas_receitas(processador) == [('Carla', 50.0)]
+
+
+def test_despesas_corrigidas_nao_deixam_versao_antiga(processador, gravar_planilha):
+    despesa = {'Data': '10/01/2026', 'Categoria': 'Produtos', 'Descricao': 'Shampoo',
+               'Valor': 120.0, 'Fornecedor': 'Distribuidora A'}
+    processador.processar_despesas(gravar_planilha('despesas', [despesa]))
+    processador.processar_despesas(gravar_planilha('despesas', [{**despesa, 'Fornecedor': 'Distribuidora B'}]))
+
+    assert processador.conn.execute("SELECT fornecedor, valor FROM despesas").fetchall() == [
+        ('Distribuidora B', 120.0)
+    ]
+
+
+def test_linhas_de_banco_antigo_recebem_a_planilha_do_manifesto(processador, gravar_planilha):
+    arquivo = gravar_planilha('receitas', [receita('Carla'), receita('Bruno', 80.0)])
+    processador.processar_receitas(arquivo)
+    # Banco anterior à coluna arquivo: linhas sem origem
+    processador.conn.execute("UPDATE fato_receitas SET arquivo = NULL")
+
+    assert processador.migrar_arquivo_origem('receitas') == 2
+    processador.processar_receitas(gravar_planilha('receitas', [receita('Karla'), receita('Bruno', 80.0)]))
+    assert linhas_receitas(processador) == [('Bruno', 80.0), ('Karla', 50.0)]